@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark link extraction for download_pdfs.py: the old BeautifulSoup
+(html.parser) tree vs. the incremental lxml LinkExtractor.
+
+Point it at a saved copy of the LAC index pages, e.g.
+
+    wget -r -l 2 -A html -P lac_pages \
+        https://epe.lac-bac.gc.ca/100/201/301/public_accounts_can/pdf/index.html
+    python bench_link_extraction.py lac_pages
+
+Without a directory it runs on synthetic pages shaped like the LAC
+year indexes (Canada.ca template boilerplate plus a list of PDF links).
+"""
+import argparse
+import os
+import time
+
+from bs4 import BeautifulSoup
+
+from download_pdfs import LinkExtractor
+
+def soup_links(html):
+    """The extraction parse_page used to do."""
+    soup = BeautifulSoup(html, 'html.parser')
+    return [(tag.get('href'), tag.get_text(strip=True))
+            for tag in soup.find_all('a') if tag.get('href')]
+
+def lxml_links(html, chunk_size=65536):
+    """LinkExtractor fed the way parse_page streams a response."""
+    extractor = LinkExtractor()
+    links = []
+    for i in range(0, len(html), chunk_size):
+        links.extend(extractor.feed(html[i:i + chunk_size]))
+    links.extend(extractor.close())
+    return links
+
+def synthetic_pages():
+    """Thirty year pages of roughly the size and shape of the LAC originals."""
+    boilerplate = "".join(
+        '<li><a href="/en/menu/{0}.html"><span>Menu item {0}</span></a></li>'.format(i)
+        for i in range(300))
+    scripts = "<script>var x = {};</script>".format("[" + ",".join(str(i) for i in range(2000)) + "]")
+    pages = []
+    for year in range(1995, 2025):
+        docs = "".join(
+            '<tr><td><a href="{0}/vol{1}.pdf" title="PDF">Volume {1} <span class="wb-inv">'
+            '(PDF, {2} MB)</span></a></td><td>&nbsp;</td></tr>'.format(year, i, i * 3)
+            for i in range(40))
+        pages.append(
+            '<!DOCTYPE html><html lang="en"><head><title>Public Accounts {0}</title>{1}</head>'
+            '<body><header><nav><ul>{2}</ul></nav></header><main><h1>{0}</h1>'
+            '<table>{3}</table></main><footer><ul>{2}</ul></footer></body></html>'
+            .format(year, scripts, boilerplate, docs))
+    return pages
+
+def load_pages(directory):
+    pages = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.lower().endswith((".html", ".htm")):
+                with open(os.path.join(root, name), encoding="utf-8", errors="replace") as f:
+                    pages.append(f.read())
+    return pages
+
+def best_of(fn, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pages", nargs="?", help="Directory of saved LAC index pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages) if args.pages else synthetic_pages()
+    if not pages:
+        parser.error("no .html files under {}".format(args.pages))
+    total_bytes = sum(len(html.encode("utf-8")) for html in pages)
+
+    mismatched = sum(soup_links(html) != lxml_links(html) for html in pages)
+    soup_time = best_of(soup_links, pages, args.repeat)
+    lxml_time = best_of(lxml_links, pages, args.repeat)
+
+    print("{} pages, {:.1f} KB".format(len(pages), total_bytes / 1024))
+    print("BeautifulSoup html.parser: {:8.2f} ms/page".format(soup_time / len(pages) * 1000))
+    print("lxml LinkExtractor:        {:8.2f} ms/page".format(lxml_time / len(pages) * 1000))
+    print("Speedup: {:.1f}x".format(soup_time / lxml_time))
+    print("Pages with differing links: {}".format(mismatched))
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,20 @@
 #!/usr/bin/env python3
 import os
+import argparse
+import asyncio
+import bisect
+import codecs
+import hashlib
+import json
 import logging
+import random
+import shutil
+import sqlite3
+import time
 import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse
+from email.utils import parsedate_to_datetime
+from lxml import etree
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse, urlunparse
 import re  # Added for sanitizing file names
 
 # Setup basic logging
@@ -12,26 +23,16 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-# Global set to avoid revisiting URLs
-visited_urls = set()
-
 def sanitize_filename(name):
     """Remove or replace characters that are invalid in filenames."""
     return re.sub(r'[\\/*?:"<>|]', "", name)
 
-def download_pdf(pdf_url, dest_base, file_name=None):
+def local_pdf_path(pdf_url, dest_base, file_name=None):
     """
-    Downloads a PDF from pdf_url and saves it under dest_base.
-    If file_name is provided, it is sanitized and used for the saved file.
-    Otherwise, the URL's path is used.
+    Returns the local path a PDF is saved to: <dest_base>/<year>/<name>.pdf.
+    The year folder is taken from the URL path (or "misc"), and the
+    directory is created if needed.
     """
-    try:
-        response = requests.get(pdf_url, stream=True)
-        response.raise_for_status()
-    except Exception as e:
-        logging.error("Failed to download {}: {}".format(pdf_url, e))
-        return
-
     parsed = urlparse(pdf_url)
     # Extract a year folder from the URL path if available
     path_parts = parsed.path.lstrip("/").split("/")
@@ -54,81 +55,1367 @@ def download_pdf(pdf_url, dest_base, file_name=None):
         # Use the original file name from URL's last segment as a fallback
         original_name = os.path.basename(parsed.path)
         local_path = os.path.join(full_directory, original_name)
+    return local_path
+
+# Responses worth retrying: throttling and server-side hiccups.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# (connect, read) timeouts for the sync crawler
+REQUEST_TIMEOUT = (30, 120)
+
+class TransientError(Exception):
+    """A request failed in a way that may succeed later (5xx, 429, dropped connection)."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
-    logging.info("Downloading PDF: {} -> {}".format(pdf_url, local_path))
+def parse_retry_after(value):
+    """Returns a Retry-After header (seconds or HTTP date) as seconds, or None."""
+    if not value:
+        return None
     try:
-        with open(local_path, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-    except Exception as e:
-        logging.error("Error writing file {}: {}".format(local_path, e))
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
 
-def parse_page(url, dest_base, depth=0, base_domain=None):
+def backoff_delay(attempt, retry_after=None, base=1.0, cap=60.0):
     """
-    Parses an HTML page for links. Downloads PDFs and recursively
-    follows further HTML links.
-    
-    Logs a warning if a link is followed at a deeper more than one level.
+    Exponential backoff with full jitter for the given (0-based) retry
+    attempt, never shorter than a server-supplied Retry-After.
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, cap))
+    return delay
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus style."""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """Returns [(le, count)] with le as a string, ending with "+Inf"."""
+        total = 0
+        buckets = []
+        for bound, count in zip(list(LATENCY_BUCKETS) + ["+Inf"], self.counts):
+            total += count
+            buckets.append((str(bound), total))
+        return buckets
+
+class CrawlTelemetry:
+    """
+    Counters and latency histograms for one crawl run, per host:
+    requests, bytes, responses by status, errors, retries, time to first
+    byte and total request latency.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.hosts = {}
+
+    def host(self, url):
+        host = urlparse(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = {
+                "requests": 0,
+                "bytes": 0,
+                "retries": 0,
+                "statuses": {},
+                "errors": {},
+                "ttfb": Histogram(),
+                "latency": Histogram(),
+            }
+        return self.hosts[host]
+
+    def record_response(self, url, status, ttfb):
+        stats = self.host(url)
+        stats["requests"] += 1
+        stats["statuses"][str(status)] = stats["statuses"].get(str(status), 0) + 1
+        stats["ttfb"].observe(ttfb)
+
+    def record_complete(self, url, latency, nbytes):
+        stats = self.host(url)
+        stats["latency"].observe(latency)
+        stats["bytes"] += nbytes
+
+    def record_error(self, url, reason):
+        stats = self.host(url)
+        stats["errors"][reason] = stats["errors"].get(reason, 0) + 1
+
+    def record_retry(self, url):
+        self.host(url)["retries"] += 1
+
+    def report(self, manifest):
+        """Builds the JSON run report, including per-year totals from the manifest."""
+        duration = max(time.time() - self.started, 1e-9)
+        years = {}
+        for key, entry in manifest.items():
+            if not entry.get("sha256"):
+                continue
+            year = key.replace(os.sep, "/").partition("/")[0]
+            totals = years.setdefault(year, {"documents": 0, "bytes": 0})
+            totals["documents"] += 1
+            totals["bytes"] += entry.get("size") or 0
+        hosts = {}
+        for host, stats in sorted(self.hosts.items()):
+            hosts[host] = {
+                "requests": stats["requests"],
+                "bytes": stats["bytes"],
+                "requests_per_second": stats["requests"] / duration,
+                "bytes_per_second": stats["bytes"] / duration,
+                "retries": stats["retries"],
+                "statuses": stats["statuses"],
+                "errors": stats["errors"],
+                "ttfb_seconds": {"buckets": dict(stats["ttfb"].cumulative()),
+                                 "sum": stats["ttfb"].sum, "count": stats["ttfb"].count},
+                "latency_seconds": {"buckets": dict(stats["latency"].cumulative()),
+                                    "sum": stats["latency"].sum, "count": stats["latency"].count},
+            }
+        requests_total = sum(stats["requests"] for stats in self.hosts.values())
+        bytes_total = sum(stats["bytes"] for stats in self.hosts.values())
+        return {
+            "started": self.started,
+            "duration_seconds": duration,
+            "requests": requests_total,
+            "bytes": bytes_total,
+            "requests_per_second": requests_total / duration,
+            "bytes_per_second": bytes_total / duration,
+            "retries": sum(stats["retries"] for stats in self.hosts.values()),
+            "hosts": hosts,
+            "years": dict(sorted(years.items())),
+        }
+
+    def write(self, dest_base, manifest, prom_path=None):
+        """
+        Writes <dest_base>/crawl_report.json and a Prometheus textfile
+        (<dest_base>/crawl.prom unless prom_path is given), each via a temp
+        file and an atomic rename.
+        """
+        report = self.report(manifest)
+        report_path = os.path.join(dest_base, "crawl_report.json")
+        with open(report_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        os.replace(report_path + ".tmp", report_path)
+
+        prom_path = prom_path or os.path.join(dest_base, "crawl.prom")
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(prometheus_text(report))
+        os.replace(prom_path + ".tmp", prom_path)
+        logging.info("Crawl: {} requests, {:.1f} MB in {:.1f}s ({:.1f} req/s, {:.1f} KB/s), {} retries".format(
+            report["requests"], report["bytes"] / 1e6, report["duration_seconds"],
+            report["requests_per_second"], report["bytes_per_second"] / 1024, report["retries"]))
+
+def prometheus_text(report):
+    """Renders a run report in the Prometheus text exposition format."""
+    prefix = "public_accounts_crawl"
+
+    def label(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    lines = []
+
+    def metric(name, kind, help_text, samples):
+        lines.append("# HELP {}_{} {}".format(prefix, name, help_text))
+        lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+        for suffix, labels, value in samples:
+            rendered = ",".join('{}="{}"'.format(k, label(v)) for k, v in labels)
+            lines.append("{}_{}{}{} {}".format(prefix, name, suffix, "{" + rendered + "}" if rendered else "", value))
+
+    hosts = report["hosts"]
+    metric("duration_seconds", "gauge", "Wall time of the last crawl run.",
+           [("", [], report["duration_seconds"])])
+    metric("last_run_timestamp_seconds", "gauge", "Start time of the last crawl run.",
+           [("", [], report["started"])])
+    metric("requests_total", "counter", "HTTP requests sent.",
+           [("", [("host", h)], v["requests"]) for h, v in hosts.items()])
+    metric("bytes_total", "counter", "Response bytes received.",
+           [("", [("host", h)], v["bytes"]) for h, v in hosts.items()])
+    metric("retries_total", "counter", "Requests scheduled for a retry.",
+           [("", [("host", h)], v["retries"]) for h, v in hosts.items()])
+    metric("responses_total", "counter", "HTTP responses by status.",
+           [("", [("host", h), ("status", code)], n)
+            for h, v in hosts.items() for code, n in sorted(v["statuses"].items())])
+    metric("errors_total", "counter", "Requests that failed without a response.",
+           [("", [("host", h), ("reason", reason)], n)
+            for h, v in hosts.items() for reason, n in sorted(v["errors"].items())])
+    for name, field, help_text in (("ttfb_seconds", "ttfb_seconds", "Time to first byte."),
+                                   ("latency_seconds", "latency_seconds", "Total request latency.")):
+        samples = []
+        for h, v in hosts.items():
+            for le, count in v[field]["buckets"].items():
+                samples.append(("_bucket", [("host", h), ("le", le)], count))
+            samples.append(("_sum", [("host", h)], v[field]["sum"]))
+            samples.append(("_count", [("host", h)], v[field]["count"]))
+        metric(name, "histogram", help_text, samples)
+    metric("year_documents", "gauge", "PDFs mirrored per fiscal year.",
+           [("", [("year", y)], v["documents"]) for y, v in report["years"].items()])
+    metric("year_bytes", "gauge", "Bytes of PDFs mirrored per fiscal year.",
+           [("", [("year", y)], v["bytes"]) for y, v in report["years"].items()])
+    return "\n".join(lines) + "\n"
+
+class TimedRequest:
+    """
+    Context manager returned by CrawlSession.get. Records time to first
+    byte, total latency and bytes in the session's telemetry, and turns
+    retryable statuses and connection errors into TransientError.
+    """
+
+    def __init__(self, session, url, kwargs):
+        self.session = session
+        self.url = url
+        self.kwargs = kwargs
+        self.response = None
+
+    def __enter__(self):
+        telemetry = self.session.telemetry
+        self.started = time.monotonic()
+        try:
+            self.response = self.session.session.get(
+                self.url, stream=True, timeout=REQUEST_TIMEOUT, **self.kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            telemetry.record_error(self.url, type(e).__name__)
+            raise TransientError(str(e))
+        telemetry.record_response(self.url, self.response.status_code, time.monotonic() - self.started)
+        if self.response.status_code in RETRY_STATUSES:
+            self.__exit__(None, None, None)
+            raise TransientError("HTTP {}".format(self.response.status_code),
+                                 parse_retry_after(self.response.headers.get("Retry-After")))
+        return self.response
+
+    def __exit__(self, exc_type, exc, tb):
+        nbytes = self.response.raw.tell() if self.response.raw is not None else 0
+        self.response.close()
+        self.session.telemetry.record_complete(self.url, time.monotonic() - self.started, nbytes)
+        if exc_type is not None and issubclass(exc_type, (requests.ConnectionError, requests.Timeout,
+                                                          requests.exceptions.ChunkedEncodingError)):
+            self.session.telemetry.record_error(self.url, exc_type.__name__)
+            raise TransientError(str(exc)) from exc
+        return False
+
+class CrawlSession:
+    """
+    Shared keep-alive requests.Session for the sync crawler. get() streams
+    the response and is used as a context manager, like aiohttp's.
+    """
+
+    def __init__(self, telemetry=None):
+        self.session = requests.Session()
+        self.telemetry = telemetry or CrawlTelemetry()
+
+    def get(self, url, **kwargs):
+        return TimedRequest(self, url, kwargs)
+
+    def close(self):
+        self.session.close()
+
+MANIFEST_NAME = "manifest.json"
+
+def load_manifest(dest_base):
+    """
+    Loads the download manifest from <dest_base>/manifest.json.
+    Entries are keyed by the PDF's path relative to dest_base and hold
+    url, path, size, etag, last_modified and sha256.
+    """
+    manifest_path = os.path.join(dest_base, MANIFEST_NAME)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        logging.warning("Ignoring unreadable manifest {}: {}".format(manifest_path, e))
+        return {}
+
+def save_manifest(dest_base, manifest):
+    """Writes the manifest to a temp file and atomically renames it into place."""
+    os.makedirs(dest_base, exist_ok=True)
+    manifest_path = os.path.join(dest_base, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+def update_digest(digest, path):
+    """Feeds a file to a hashlib object in 1 MB blocks and returns it."""
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest
+
+def file_sha256(path):
+    """Returns the hex SHA-256 of a file."""
+    return update_digest(hashlib.sha256(), path).hexdigest()
+
+def parse_content_range(value):
+    """Parses 'bytes START-END/TOTAL' into (start, total); total may be None."""
+    match = re.match(r'^bytes (\d+)-\d+/(\d+|\*)$', (value or "").strip())
+    if not match:
+        return None, None
+    total = None if match.group(2) == "*" else int(match.group(2))
+    return int(match.group(1)), total
+
+BLOB_DIR = "blobs"
+
+def blob_path(dest_base, sha256):
+    """Returns the content-addressed path of a blob: <dest_base>/blobs/ab/<sha256>.pdf."""
+    return os.path.join(dest_base, BLOB_DIR, sha256[:2], sha256 + ".pdf")
+
+def store_blob(dest_base, src_path, sha256):
     """
-    global visited_urls
-    if base_domain is None:
-        base_domain = urlparse(url).netloc
+    Moves src_path into the blob store under its SHA-256. If the blob is
+    already stored, src_path is discarded, so identical bytes are kept once.
+    """
+    target = blob_path(dest_base, sha256)
+    if os.path.exists(target):
+        os.remove(src_path)
+        return target
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    os.replace(src_path, target)
+    return target
 
-    if url in visited_urls:
+def link_from_store(dest_base, sha256, local_path):
+    """
+    Points local_path at a stored blob with a hardlink, falling back to a
+    copy on filesystems without hardlinks. The link is made under a temp
+    name and renamed into place.
+    """
+    target = blob_path(dest_base, sha256)
+    if os.path.exists(local_path) and os.path.samefile(local_path, target):
         return
-    visited_urls.add(url)
+    tmp_path = local_path + ".link"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        os.link(target, tmp_path)
+    except OSError:
+        shutil.copy2(target, tmp_path)
+    os.replace(tmp_path, local_path)
+
+def restore_copy(pdf_url, local_path, dest_base, manifest, entry):
+    """
+    Called when the server reports a PDF unchanged: makes sure its bytes
+    are in the blob store and linked at local_path, and records local_path
+    in the manifest (it may be a new name for a URL saved before).
+    """
+    target = blob_path(dest_base, entry["sha256"])
+    if not os.path.exists(target):
+        # Copy saved before the blob store existed; adopt it.
+        tmp_path = local_path + ".ingest"
+        shutil.copy2(local_path, tmp_path)
+        store_blob(dest_base, tmp_path, entry["sha256"])
+    link_from_store(dest_base, entry["sha256"], local_path)
+    key = os.path.relpath(local_path, dest_base)
+    if key not in manifest or manifest[key].get("sha256") != entry["sha256"]:
+        manifest[key] = dict(entry, path=key)
+        save_manifest(dest_base, manifest)
+
+def find_entry(manifest, dest_base, local_path, pdf_url):
+    """
+    Returns the manifest entry for local_path, or failing that a complete
+    entry for the same URL saved under another name.
+    """
+    entry = manifest.get(os.path.relpath(local_path, dest_base))
+    if entry:
+        return entry
+    for other in manifest.values():
+        if other.get("url") == pdf_url and other.get("sha256"):
+            return other
+    return None
+
+def have_copy(dest_base, local_path, entry):
+    """True if the bytes described by a complete manifest entry are on disk."""
+    if not entry or not entry.get("sha256"):
+        return False
+    for path in (blob_path(dest_base, entry["sha256"]), local_path):
+        if os.path.exists(path) and os.path.getsize(path) == entry.get("size"):
+            return True
+    return False
+
+def partial_path(pdf_url, local_path):
+    """
+    Returns where an unfinished download of pdf_url to local_path is kept:
+    <name>.pdf.<url hash>.part. Links with the same name on different
+    URLs save to the same local_path, so in async mode they can be in
+    flight at once; keying on the URL keeps their bytes apart.
+    """
+    return "{}.{}.part".format(local_path, hashlib.sha256(pdf_url.encode("utf-8")).hexdigest()[:16])
+
+def prepare_request(pdf_url, local_path, entry, dest_base):
+    """
+    Builds the request headers for a PDF download.
+
+    A complete, unchanged copy (in the blob store or at local_path) gets a
+    conditional request (If-None-Match / If-Modified-Since). A leftover
+    .part file from an interrupted transfer is resumed with Range +
+    If-Range, so the server sends the full file again if it changed in
+    the meantime.
+
+    Returns (headers, resume_from).
+    """
+    headers = {}
+    if entry and entry.get("url") == pdf_url and have_copy(dest_base, local_path, entry):
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers, 0
+
+    part_path = partial_path(pdf_url, local_path)
+    partial = (entry or {}).get("partial") or {}
+    validator = partial.get("etag") or partial.get("last_modified")
+    if validator and partial.get("url") == pdf_url and os.path.exists(part_path):
+        resume_from = os.path.getsize(part_path)
+        if resume_from:
+            headers["Range"] = "bytes={}-".format(resume_from)
+            headers["If-Range"] = validator
+            return headers, resume_from
+    return headers, 0
+
+def begin_transfer(pdf_url, local_path, dest_base, manifest, status, response_headers, resume_from):
+    """
+    Records the validators of the transfer that is about to start, so an
+    interrupted download can be resumed by the next run.
+
+    Returns the mode to open the .part file with, or None if the response
+    does not line up with the bytes already on disk.
+    """
+    if status == 206:
+        start, _ = parse_content_range(response_headers.get("Content-Range"))
+        if start != resume_from:
+            logging.error("Unexpected Content-Range for {}: {}".format(
+                pdf_url, response_headers.get("Content-Range")))
+            return None
+        mode = "ab"
+        logging.info("Resuming PDF at byte {}: {} -> {}".format(resume_from, pdf_url, local_path))
+    else:
+        mode = "wb"
+        logging.info("Downloading PDF: {} -> {}".format(pdf_url, local_path))
+
+    key = os.path.relpath(local_path, dest_base)
+    entry = manifest.setdefault(key, {"url": pdf_url, "path": key})
+    entry["partial"] = {
+        "url": pdf_url,
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+    }
+    save_manifest(dest_base, manifest)
+    return mode
+
+def finish_transfer(pdf_url, local_path, dest_base, manifest, status, response_headers, sha256=None):
+    """
+    Verifies the .part file against the advertised length, then hashes it
+    (unless the caller hashed it while writing), atomically renames it
+    over local_path and records it in the manifest. A short file is left
+    in place so the next run can resume it.
+    """
+    part_path = partial_path(pdf_url, local_path)
+    size = os.path.getsize(part_path)
+    if status == 206:
+        _, expected = parse_content_range(response_headers.get("Content-Range"))
+    elif response_headers.get("Content-Length") and not response_headers.get("Content-Encoding"):
+        expected = int(response_headers["Content-Length"])
+    else:
+        expected = None
+    if expected is not None and size != expected:
+        logging.error("Incomplete download of {}: {} of {} bytes".format(pdf_url, size, expected))
+        return False
+
+    sha256 = sha256 or file_sha256(part_path)
+    store_blob(dest_base, part_path, sha256)
+    link_from_store(dest_base, sha256, local_path)
+    key = os.path.relpath(local_path, dest_base)
+    manifest[key] = {
+        "url": pdf_url,
+        "path": key,
+        "size": size,
+        "etag": response_headers.get("ETag"),
+        "last_modified": response_headers.get("Last-Modified"),
+        "sha256": sha256,
+    }
+    save_manifest(dest_base, manifest)
+    return True
+
+def download_pdf(pdf_url, dest_base, file_name=None, manifest=None, session=None):
+    """
+    Downloads a PDF from pdf_url and saves it under dest_base.
+    If file_name is provided, it is sanitized and used for the saved file.
+    Otherwise, the URL's path is used.
+
+    Unchanged files are skipped with a conditional request, interrupted
+    transfers are resumed, and data is written to a .part file (see
+    partial_path) and renamed into place only once complete. Returns True
+    if the PDF is on disk and current; raises TransientError when a retry
+    may succeed.
+    """
+    if manifest is None:
+        manifest = load_manifest(dest_base)
+    if session is None:
+        session = CrawlSession()
+    local_path = local_pdf_path(pdf_url, dest_base, file_name)
+    part_path = partial_path(pdf_url, local_path)
+    entry = find_entry(manifest, dest_base, local_path, pdf_url)
+    headers, resume_from = prepare_request(pdf_url, local_path, entry, dest_base)
 
     try:
-        logging.info("Processing URL (depth {}): {}".format(depth, url))
-        response = requests.get(url)
-        response.raise_for_status()
+        with session.get(pdf_url, headers=headers) as response:
+            if response.status_code == 304:
+                logging.info("Unchanged, skipping: {}".format(local_path))
+                restore_copy(pdf_url, local_path, dest_base, manifest, entry)
+                return True
+            if response.status_code == 416 and resume_from:
+                # The .part file is already as long as the remote file; start over.
+                os.remove(part_path)
+            else:
+                response.raise_for_status()
+                mode = begin_transfer(pdf_url, local_path, dest_base, manifest,
+                                      response.status_code, response.headers, resume_from)
+                if mode is None:
+                    return False
+                # On a dropped connection the .part file is kept and the
+                # retry resumes it with a Range request.
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
+                return finish_transfer(pdf_url, local_path, dest_base, manifest,
+                                       response.status_code, response.headers)
+    except TransientError:
+        raise
     except Exception as e:
-        logging.error("Failed to fetch {}: {}".format(url, e))
-        return
+        logging.error("Failed to download {}: {}".format(pdf_url, e))
+        return False
+    return download_pdf(pdf_url, dest_base, file_name, manifest, session)
 
-    # Only parse HTML pages
-    content_type = response.headers.get('Content-Type', '')
-    if 'text/html' not in content_type:
-        logging.info("Skipping non-HTML content at {} (Content-Type: {})".format(url, content_type))
-        return
+REPORT_NAME = "supersession.json"
+
+# Dash variants seen in the LAC file names (including the C1 controls
+# \x96/\x97 left over from cp1252 en/em dashes).
+DASHES = re.compile('[\u0096\u0097\u2013\u2014]')
+# "(Revised)", "(Rev. No. 2 - March 20, 2009)", "(Erratum No. 3 - September 5, 2017" ...
+REVISION_NOTE = re.compile(r'\([^()]*\b(?:rev|revised|revision|erratum)\b[^()]*(?:\)|$)', re.I)
+MONTHS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+DATE = re.compile(r'\b(' + "|".join(MONTHS) + r')[a-z]*\.?\s+(\d{1,2})(?:st|nd|rd|th)?,?\s+(\d{4})', re.I)
+
+def logical_document(name):
+    """
+    Reduces a PDF file name to the document it is a version of, e.g.
+    "Section 6 (Rev. No. 2 - March 20, 2009) - Transfer payments.pdf" and
+    "Section 6 - Transfer payments.pdf" both give "section 6 - transfer payments".
+    """
+    text = DASHES.sub("-", re.sub(r'\.pdf$', "", name, flags=re.I))
+    text = re.sub(r'^erratum no\.?\s*\d+\s*-\s*', "", text, flags=re.I)
+    text = REVISION_NOTE.sub("", text)
+    text = re.sub(r'\s*--\s*(original|revised).*$', "", text, flags=re.I)
+    text = re.sub(r'\s*-\s*(original|revised) pag\w*$', "", text, flags=re.I)
+    text = re.sub(r'\s*-\s*', " - ", text)
+    return re.sub(r'\s+', " ", text).strip(" -").lower()
+
+def revision_rank(name):
+    """
+    Sort key for versions of one logical document: explicit "original"
+    pages rank lowest, then by revision/erratum number, then "revised"
+    over unmarked, then by the date in the name.
+    """
+    text = DASHES.sub("-", name)
+    if re.search(r'-\s*original\b', text, re.I):
+        return (0, 0, ())
+    match = re.search(r'\b(?:revision|rev\.?|erratum)\s*no\.?\s*(\d+)', text, re.I)
+    revised = bool(re.search(r'\brev(?:ised|ision)?\b|--\s*revised', text, re.I))
+    number = int(match.group(1)) if match else int(revised)
+    date = DATE.search(text)
+    date_key = ()
+    if date:
+        date_key = (int(date.group(3)), MONTHS.index(date.group(1).lower()[:3]) + 1, int(date.group(2)))
+    return (number, int(revised), date_key)
+
+def write_supersession_report(dest_base, manifest):
+    """
+    Writes <dest_base>/supersession.json: for every year, each logical
+    document with its current version, the versions it supersedes and
+    the names that are byte-identical to another version. Each year also
+    lists groups of identical files across documents and the distinct
+    blobs, so downstream extraction parses each one once.
+    """
+    years = {}
+    for key, entry in manifest.items():
+        if not entry.get("sha256"):
+            continue
+        year, _, name = key.replace(os.sep, "/").partition("/")
+        if not name:
+            continue
+        docs = years.setdefault(year, {})
+        docs.setdefault(logical_document(name), []).append((revision_rank(name), name, entry["sha256"]))
+
+    report = {}
+    for year in sorted(years):
+        documents = []
+        for document, versions in sorted(years[year].items()):
+            versions.sort(reverse=True)
+            _, current, current_sha = versions[0]
+            kept = {current_sha}
+            supersedes = []
+            duplicates = []
+            for _, name, sha256 in versions[1:]:
+                if sha256 in kept:
+                    duplicates.append("{}/{}".format(year, name))
+                else:
+                    kept.add(sha256)
+                    supersedes.append("{}/{}".format(year, name))
+            documents.append({
+                "document": document,
+                "current": "{}/{}".format(year, current),
+                "sha256": current_sha,
+                "supersedes": supersedes,
+                "duplicates": duplicates,
+            })
+        names_by_sha = {}
+        for versions in years[year].values():
+            for _, name, sha256 in versions:
+                names_by_sha.setdefault(sha256, []).append("{}/{}".format(year, name))
+        report[year] = {
+            "documents": documents,
+            "identical": sorted(sorted(names) for names in names_by_sha.values() if len(names) > 1),
+            "unique_sha256": sorted(names_by_sha),
+        }
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    report_path = os.path.join(dest_base, REPORT_NAME)
+    tmp_path = report_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, report_path)
+    logging.info("Wrote supersession report for {} years to {}".format(len(report), report_path))
 
-    for tag in soup.find_all('a'):
-        href = tag.get('href')
-        if not href:
+def ingest_tree(dest_base, manifest):
+    """
+    Adopts PDFs already saved under <dest_base>/<year>/ into the blob
+    store. Byte-identical files end up as hardlinks to a single blob.
+    """
+    for year in sorted(os.listdir(dest_base)):
+        year_dir = os.path.join(dest_base, year)
+        if year == BLOB_DIR or not os.path.isdir(year_dir):
             continue
+        for name in sorted(os.listdir(year_dir)):
+            local_path = os.path.join(year_dir, name)
+            if not name.lower().endswith(".pdf") or not os.path.isfile(local_path):
+                continue
+            key = os.path.relpath(local_path, dest_base)
+            entry = manifest.get(key)
+            sha256 = entry.get("sha256") if entry else None
+            if not sha256 or not os.path.exists(blob_path(dest_base, sha256)):
+                sha256 = file_sha256(local_path)
+                target = blob_path(dest_base, sha256)
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    try:
+                        os.link(local_path, target)
+                    except OSError:
+                        shutil.copy2(local_path, target)
+            link_from_store(dest_base, sha256, local_path)
+            if not entry or entry.get("sha256") != sha256:
+                manifest[key] = {
+                    "url": None,
+                    "path": key,
+                    "size": os.path.getsize(local_path),
+                    "etag": None,
+                    "last_modified": None,
+                    "sha256": sha256,
+                }
+    save_manifest(dest_base, manifest)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+def canonicalize_url(url):
+    """
+    Normalizes a URL for duplicate detection: lowercases the scheme and
+    host, drops default ports, fragments and trailing slashes, and sorts
+    the query parameters. Only used as a key; pages are still fetched by
+    the URL they were linked with, since a trailing slash changes how
+    relative links resolve. Raises ValueError for a URL urlparse cannot
+    split; page_links skips those.
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    if parsed.port and parsed.port != DEFAULT_PORTS.get(scheme):
+        host = "{}:{}".format(host, parsed.port)
+    path = parsed.path.rstrip("/") or "/"
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, host, path, "", query, ""))
+
+class Frontier:
+    """
+    Crawl frontier persisted in SQLite (<dest>/frontier.sqlite3).
+
+    Every discovered page or PDF link is a row with its state (pending,
+    in_progress, done, failed, or retry for transient failures still
+    owed another attempt), depth and the page it was discovered from.
+    Rows are unique per canonical URL and PDF name, so a killed crawl
+    resumes from the pending rows without refetching finished ones.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS frontier (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                canonical TEXT NOT NULL,
+                name TEXT NOT NULL DEFAULT '',
+                url TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                depth INTEGER NOT NULL,
+                discovered_from TEXT,
+                UNIQUE (canonical, name)
+            )
+        """)
+        # Anything in flight when the last run died goes back in the queue.
+        self.conn.execute("UPDATE frontier SET state = 'pending' WHERE state = 'in_progress'")
+
+    def has_pending(self):
+        row = self.conn.execute(
+            "SELECT 1 FROM frontier WHERE state IN ('pending', 'retry') LIMIT 1").fetchone()
+        return row is not None
+
+    def requeue_retries(self):
+        """Moves every row awaiting a retry back to pending and returns them."""
+        rows = self.conn.execute(
+            "SELECT id, url, kind, depth, name FROM frontier WHERE state = 'retry' ORDER BY id").fetchall()
+        self.conn.execute("UPDATE frontier SET state = 'pending' WHERE state = 'retry'")
+        return rows
+
+    def reset(self):
+        self.conn.execute("DELETE FROM frontier")
+
+    def add(self, url, kind, depth, discovered_from=None, name=""):
+        """Adds a link; returns its row id, or None if it was already known."""
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO frontier (canonical, name, url, kind, depth, discovered_from) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (canonicalize_url(url), name or "", url, kind, depth, discovered_from))
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def pending(self):
+        """Returns all pending rows as (id, url, kind, depth, name), in discovery order."""
+        return self.conn.execute(
+            "SELECT id, url, kind, depth, name FROM frontier WHERE state = 'pending' ORDER BY id").fetchall()
+
+    def claim(self):
+        """Marks the oldest pending row in_progress and returns it, or None."""
+        row = self.conn.execute(
+            "SELECT id, url, kind, depth, name FROM frontier WHERE state = 'pending' "
+            "ORDER BY id LIMIT 1").fetchone()
+        if row is not None:
+            self.mark(row[0], "in_progress")
+        return row
+
+    def mark(self, row_id, state):
+        self.conn.execute("UPDATE frontier SET state = ? WHERE id = ?", (state, row_id))
+
+    def close(self):
+        self.conn.close()
+
+def open_frontier(start_url, dest_base, fresh=False):
+    """
+    Opens <dest_base>/frontier.sqlite3. An unfinished crawl is resumed;
+    a finished one (or fresh=True) is cleared and reseeded with start_url.
+    """
+    os.makedirs(dest_base, exist_ok=True)
+    frontier = Frontier(os.path.join(dest_base, "frontier.sqlite3"))
+    if fresh or not frontier.has_pending():
+        frontier.reset()
+        frontier.add(start_url, "page", 0)
+    else:
+        logging.info("Resuming crawl from {}".format(os.path.join(dest_base, "frontier.sqlite3")))
+        frontier.requeue_retries()
+    return frontier
+
+class LinkExtractor:
+    """
+    Incremental <a> extractor on lxml's HTML pull parser. Feed it the page
+    text chunk by chunk as it arrives; each call returns the (href,
+    link_text) pairs completed so far. link_text matches BeautifulSoup's
+    get_text(strip=True), so PDFs keep the names they were saved under.
+    """
+
+    def __init__(self):
+        self.parser = etree.HTMLPullParser(events=("end",), tag="a")
 
-        # Resolve the URL relative to the current page
-        new_url = urljoin(url, href)
-        # Remove any URL fragment (#anchor)
-        new_url = new_url.split("#")[0]
+    def feed(self, text):
+        self.parser.feed(text)
+        return self._drain()
 
-        parsed_new = urlparse(new_url)
+    def close(self):
+        self.parser.close()
+        return self._drain()
+
+    def _drain(self):
+        links = []
+        for _, tag in self.parser.read_events():
+            href = tag.get("href")
+            if href:
+                links.append((href, "".join(t.strip() for t in tag.itertext())))
+            # The anchor's subtree is no longer needed
+            tag.clear(keep_tail=True)
+        return links
+
+def page_links(url, links, base_domain):
+    """
+    Yields (link_url, link_text) for the same-domain links among the
+    (href, text) pairs from a page, resolved against url with fragments
+    removed. link_text is None for links that are not PDFs. Links that
+    do not parse (e.g. "//[bad/b.html", a port out of range) are skipped.
+    """
+    for href, text in links:
+        try:
+            # Resolve the URL relative to the current page
+            new_url = urljoin(url, href)
+            # Remove any URL fragment (#anchor)
+            new_url = new_url.split("#")[0]
+
+            parsed_new = urlparse(new_url)
+            # canonicalize_url needs the port too
+            parsed_new.port
+        except ValueError as e:
+            logging.warning("Skipping unparsable link {!r} on {}: {}".format(href, url, e))
+            continue
         # Skip links that point to an external domain
         if parsed_new.netloc and parsed_new.netloc != base_domain:
             logging.info("Skipping external link: {}".format(new_url))
             continue
 
-        if new_url in visited_urls:
-            continue
-
         if new_url.lower().endswith('.pdf'):
-            link_text = tag.get_text(strip=True)
-            download_pdf(new_url, dest_base, file_name=link_text)
+            yield new_url, text
         else:
-            if depth >= 1:
-                logging.warning("Following nested HTML link (depth {}): {}".format(depth+1, new_url))
-            parse_page(new_url, dest_base, depth + 1, base_domain)
+            yield new_url, None
+
+def add_links(frontier, url, links, depth, base_domain):
+    """
+    Records the (href, text) links found on a page in the frontier and
+    returns the rows that were new, as (id, url, kind, depth, name).
+    """
+    added = []
+    for new_url, link_text in page_links(url, links, base_domain):
+        if link_text is not None:
+            row_id = frontier.add(new_url, "pdf", depth, url, link_text)
+            if row_id:
+                added.append((row_id, new_url, "pdf", depth, link_text))
+        else:
+            row_id = frontier.add(new_url, "page", depth + 1, url)
+            if row_id:
+                if depth >= 1:
+                    logging.warning("Following nested HTML link (depth {}): {}".format(depth+1, new_url))
+                added.append((row_id, new_url, "page", depth + 1, ""))
+    return added
+
+def parse_page(url, dest_base, depth, base_domain, frontier, session):
+    """
+    Fetches one HTML page and adds its links to the frontier.
+    Returns False if the page could not be fetched; raises
+    TransientError when a retry may succeed.
+
+    The body is streamed: a non-HTML response is dropped after its
+    headers, and links are extracted while the page downloads.
+    """
+    try:
+        logging.info("Processing URL (depth {}): {}".format(depth, url))
+        with session.get(url) as response:
+            response.raise_for_status()
+
+            # Only parse HTML pages
+            content_type = response.headers.get('Content-Type', '')
+            if 'text/html' not in content_type:
+                logging.info("Skipping non-HTML content at {} (Content-Type: {})".format(url, content_type))
+                return True
+
+            response.encoding = response.encoding or "utf-8"
+            extractor = LinkExtractor()
+            links = []
+            for chunk in response.iter_content(chunk_size=65536, decode_unicode=True):
+                links.extend(extractor.feed(chunk))
+            links.extend(extractor.close())
+    except TransientError:
+        raise
+    except Exception as e:
+        logging.error("Failed to fetch {}: {}".format(url, e))
+        return False
+
+    add_links(frontier, url, links, depth, base_domain)
+    return True
+
+def crawl(start_url, dest_base, fresh=False, max_retries=3, retry_passes=2, telemetry=None):
+    """
+    Crawls from start_url one request at a time, draining the persistent
+    frontier: pages are parsed for links, PDFs are downloaded.
+
+    Transient failures are retried up to max_retries times with jittered
+    exponential backoff, then parked in the retry queue, which is drained
+    again (up to retry_passes times) once everything else is done.
+
+    Logs a warning if a link is followed at a deeper more than one level.
+    """
+    base_domain = urlparse(start_url).netloc
+    manifest = load_manifest(dest_base)
+    frontier = open_frontier(start_url, dest_base, fresh)
+    session = CrawlSession(telemetry)
+    try:
+        for retry_pass in range(retry_passes + 1):
+            if retry_pass:
+                retries = frontier.requeue_retries()
+                if not retries:
+                    break
+                logging.info("Retrying {} failed items".format(len(retries)))
+            while True:
+                row = frontier.claim()
+                if row is None:
+                    break
+                row_id, url, kind, depth, name = row
+                for attempt in range(max_retries + 1):
+                    try:
+                        if kind == "pdf":
+                            ok = download_pdf(url, dest_base, file_name=name, manifest=manifest,
+                                              session=session)
+                        else:
+                            ok = parse_page(url, dest_base, depth, base_domain, frontier, session)
+                        state = "done" if ok else "failed"
+                        break
+                    except TransientError as e:
+                        state = "retry"
+                        if attempt < max_retries:
+                            delay = backoff_delay(attempt, e.retry_after)
+                            logging.warning("Retrying {} in {:.1f}s after {}".format(url, delay, e))
+                            session.telemetry.record_retry(url)
+                            time.sleep(delay)
+                        else:
+                            logging.error("Giving up on {} for now: {}".format(url, e))
+                frontier.mark(row_id, state)
+    finally:
+        session.close()
+        frontier.close()
+
+class HostLimiter:
+    """
+    Adaptive admission control for one host.
+
+    A token bucket caps the request rate, and an AIMD window caps the
+    requests in flight: every fast success grows the window by about one
+    request per window's worth of responses, while errors, throttling and
+    latency spikes shrink the window (and the rate) multiplicatively.
+    Retry-After pauses the host entirely.
+    """
+
+    def __init__(self, max_concurrency, rate):
+        self.max_concurrency = max_concurrency
+        self.window = min(2.0, float(max_concurrency))
+        self.max_rate = rate
+        self.rate = rate
+        self.tokens = float(max_concurrency)
+        self.refilled = time.monotonic()
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.best_latency = None
+        self.cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self.cond:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(float(self.max_concurrency),
+                                  self.tokens + (now - self.refilled) * self.rate)
+                self.refilled = now
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.in_flight >= int(self.window):
+                    wait = None
+                elif self.tokens < 1:
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+                try:
+                    await asyncio.wait_for(self.cond.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, latency=None, error=False, retry_after=None):
+        async with self.cond:
+            self.in_flight -= 1
+            if error:
+                self.window = max(1.0, self.window / 2)
+                self.rate = max(0.1, self.rate / 2)
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif latency is not None:
+                if self.best_latency is None or latency < self.best_latency:
+                    self.best_latency = latency
+                if latency > 4 * self.best_latency + 0.05:
+                    # Queueing at the server: back off before it starts failing.
+                    self.window = max(1.0, self.window * 0.8)
+                else:
+                    self.window = min(float(self.max_concurrency), self.window + 1 / self.window)
+                    self.rate = min(self.max_rate, self.rate + 1 / self.window)
+            self.cond.notify_all()
+
+def is_transient_async(exc):
+    """
+    True for aiohttp failures a retry may fix: dropped connections,
+    timeouts and responses with a status in RETRY_STATUSES. Other HTTP
+    errors (404, 403, ...) are permanent, as in the sync crawler.
+    """
+    import aiohttp
+
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status in RETRY_STATUSES
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+class ScheduledRequest:
+    """
+    Async context manager returned by AdaptiveSession.get. Waits for the
+    host's limiter, records time to first byte, total latency and bytes,
+    and turns retryable statuses and connection errors into TransientError.
+    Other HTTP errors pass through and do not slow the host down.
+    """
+
+    def __init__(self, session, url, kwargs):
+        self.session = session
+        self.url = url
+        self.kwargs = kwargs
+        self.limiter = session.limiter(url)
+        self.request = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        telemetry = self.session.telemetry
+        await self.limiter.acquire()
+        self.started = time.monotonic()
+        try:
+            self.request = self.session.session.get(self.url, **self.kwargs)
+            self.response = await self.request.__aenter__()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            telemetry.record_error(self.url, type(e).__name__)
+            if not is_transient_async(e):
+                await self.limiter.release()
+                raise
+            await self.limiter.release(error=True)
+            raise TransientError(str(e) or type(e).__name__)
+        self.latency = time.monotonic() - self.started
+        telemetry.record_response(self.url, self.response.status, self.latency)
+        if self.response.status in RETRY_STATUSES:
+            retry_after = parse_retry_after(self.response.headers.get("Retry-After"))
+            await self.request.__aexit__(None, None, None)
+            telemetry.record_complete(self.url, time.monotonic() - self.started,
+                                      self.response.content.total_bytes)
+            await self.limiter.release(error=True, retry_after=retry_after)
+            raise TransientError("HTTP {}".format(self.response.status), retry_after)
+        return self.response
+
+    async def __aexit__(self, exc_type, exc, tb):
+        failed = exc is not None and is_transient_async(exc)
+        try:
+            await self.request.__aexit__(exc_type, exc, tb)
+        finally:
+            self.session.telemetry.record_complete(self.url, time.monotonic() - self.started,
+                                                   self.response.content.total_bytes)
+            if failed:
+                self.session.telemetry.record_error(self.url, exc_type.__name__)
+            await self.limiter.release(latency=self.latency, error=failed)
+        if failed:
+            raise TransientError(str(exc) or exc_type.__name__) from exc
+        return False
+
+class AdaptiveSession:
+    """
+    Wraps an aiohttp session so every GET goes through a per-host
+    HostLimiter and is recorded in the run's telemetry. Exposes the same
+    session.get(...) context manager the download functions already use.
+    """
+
+    def __init__(self, session, max_concurrency, rate, telemetry=None):
+        self.session = session
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.telemetry = telemetry or CrawlTelemetry()
+        self.limiters = {}
+
+    def limiter(self, url):
+        host = urlparse(url).netloc
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(self.max_concurrency, self.rate)
+        return self.limiters[host]
+
+    def get(self, url, **kwargs):
+        return ScheduledRequest(self, url, kwargs)
+
+async def fetch_page_async(session, url):
+    """
+    Fetches an HTML page with the shared aiohttp session and extracts
+    its links while the body streams in. Returns the (href, text) pairs,
+    or None if the request failed. Non-HTML responses are dropped after
+    their headers and yield no links.
+    """
+    try:
+        async with session.get(url) as response:
+            response.raise_for_status()
+            content_type = response.headers.get('Content-Type', '')
+            if 'text/html' not in content_type:
+                logging.info("Skipping non-HTML content at {} (Content-Type: {})".format(url, content_type))
+                return []
+            decoder = codecs.getincrementaldecoder(response.charset or "utf-8")(errors="replace")
+            extractor = LinkExtractor()
+            links = []
+            async for chunk in response.content.iter_chunked(65536):
+                links.extend(extractor.feed(decoder.decode(chunk)))
+            links.extend(extractor.feed(decoder.decode(b"", final=True)))
+            links.extend(extractor.close())
+            return links
+    except TransientError:
+        raise
+    except Exception as e:
+        logging.error("Failed to fetch {}: {}".format(url, e))
+        return None
+
+# Bytes of a PDF body gathered before each write in async mode
+WRITE_BUFFER = 1 << 20
+
+def write_and_hash(f, digest, data):
+    f.write(data)
+    digest.update(data)
+
+async def write_part_async(response, part_path, mode):
+    """
+    Streams a response body into the .part file and returns the file's
+    SHA-256. Opening, writing (in WRITE_BUFFER batches) and hashing run in
+    worker threads, so a large PDF does not stall the event loop; a
+    resumed file's existing bytes are hashed first. Whatever arrived is
+    written even if the transfer breaks off, so it can be resumed.
+    """
+    digest = hashlib.sha256()
+    if mode == "ab":
+        await asyncio.to_thread(update_digest, digest, part_path)
+    f = await asyncio.to_thread(open, part_path, mode)
+    buffer = bytearray()
+    try:
+        async for chunk in response.content.iter_chunked(65536):
+            buffer += chunk
+            if len(buffer) >= WRITE_BUFFER:
+                data = bytes(buffer)
+                buffer.clear()
+                await asyncio.to_thread(write_and_hash, f, digest, data)
+    finally:
+        if buffer:
+            await asyncio.to_thread(write_and_hash, f, digest, bytes(buffer))
+        await asyncio.to_thread(f.close)
+    return digest.hexdigest()
+
+async def download_pdf_async(session, pdf_url, dest_base, file_name=None, manifest=None):
+    """
+    Streams a PDF to disk with the shared aiohttp session.
+    Uses the same <dest_base>/<year>/<name>.pdf layout, manifest and
+    conditional/resumable transfer rules as download_pdf.
+    """
+    if manifest is None:
+        manifest = load_manifest(dest_base)
+    local_path = local_pdf_path(pdf_url, dest_base, file_name)
+    part_path = partial_path(pdf_url, local_path)
+    entry = find_entry(manifest, dest_base, local_path, pdf_url)
+    headers, resume_from = prepare_request(pdf_url, local_path, entry, dest_base)
+
+    try:
+        async with session.get(pdf_url, headers=headers) as response:
+            if response.status == 304:
+                logging.info("Unchanged, skipping: {}".format(local_path))
+                restore_copy(pdf_url, local_path, dest_base, manifest, entry)
+                return True
+            if response.status == 416 and resume_from:
+                # The .part file is already as long as the remote file; start over.
+                os.remove(part_path)
+            else:
+                response.raise_for_status()
+                mode = begin_transfer(pdf_url, local_path, dest_base, manifest,
+                                      response.status, response.headers, resume_from)
+                if mode is None:
+                    return False
+                sha256 = await write_part_async(response, part_path, mode)
+                return finish_transfer(pdf_url, local_path, dest_base, manifest,
+                                       response.status, response.headers, sha256)
+    except TransientError:
+        raise
+    except Exception as e:
+        logging.error("Failed to download {}: {}".format(pdf_url, e))
+        return False
+    return await download_pdf_async(session, pdf_url, dest_base, file_name, manifest)
+
+async def crawl_async(start_url, dest_base, max_concurrency=16, per_host_concurrency=4,
+                      fresh=False, rate=4.0, max_retries=3, retry_passes=2, telemetry=None):
+    """
+    Crawls from start_url with a pool of workers sharing one keep-alive
+    connection pool. HTML pages and PDFs are fetched concurrently; the
+    connector caps open connections globally (max_concurrency), and each
+    host gets an adaptive limiter (token bucket at up to `rate` requests/s
+    and an AIMD window of up to per_host_concurrency requests in flight).
+
+    Transient failures are requeued after a jittered exponential backoff,
+    up to max_retries times; items still failing go to the retry queue,
+    which is drained (up to retry_passes times) at the end of the run.
+
+    Uses the same persistent frontier and link rules as crawl: same-domain
+    links only, fragments stripped, PDFs named after their link text.
+    """
+    import aiohttp  # Only needed for the async mode
+
+    base_domain = urlparse(start_url).netloc
+    manifest = load_manifest(dest_base)
+    frontier = open_frontier(start_url, dest_base, fresh)
+    queue = asyncio.Queue()
+    for row in frontier.pending():
+        queue.put_nowait(row)
+    attempts = {}
+    delayed = set()
+
+    async def requeue_later(row, delay):
+        await asyncio.sleep(delay)
+        queue.put_nowait(row)
+        queue.task_done()
+
+    async def worker(session):
+        while True:
+            row = await queue.get()
+            row_id, url, kind, depth, name = row
+            requeued = False
+            try:
+                frontier.mark(row_id, "in_progress")
+                try:
+                    if kind == "pdf":
+                        ok = await download_pdf_async(session, url, dest_base, file_name=name,
+                                                      manifest=manifest)
+                    else:
+                        logging.info("Processing URL (depth {}): {}".format(depth, url))
+                        links = await fetch_page_async(session, url)
+                        ok = links is not None
+                        if links:
+                            for new_row in add_links(frontier, url, links, depth, base_domain):
+                                queue.put_nowait(new_row)
+                    frontier.mark(row_id, "done" if ok else "failed")
+                except TransientError as e:
+                    attempt = attempts.get(row_id, 0)
+                    attempts[row_id] = attempt + 1
+                    if attempt < max_retries:
+                        delay = backoff_delay(attempt, e.retry_after)
+                        logging.warning("Retrying {} in {:.1f}s after {}".format(url, delay, e))
+                        session.telemetry.record_retry(url)
+                        frontier.mark(row_id, "pending")
+                        task = asyncio.create_task(requeue_later(row, delay))
+                        delayed.add(task)
+                        task.add_done_callback(delayed.discard)
+                        requeued = True
+                    else:
+                        logging.error("Giving up on {} for now: {}".format(url, e))
+                        frontier.mark(row_id, "retry")
+            except Exception:
+                # Anything else is a bug or bad input for this row only;
+                # the worker must live on or queue.join() never returns.
+                logging.exception("Failed to process {}".format(url))
+                try:
+                    frontier.mark(row_id, "failed")
+                except sqlite3.Error:
+                    logging.exception("Could not mark {} failed".format(url))
+            finally:
+                if not requeued:
+                    queue.task_done()
+
+    connector = aiohttp.TCPConnector(
+        limit=max_concurrency,
+        limit_per_host=per_host_concurrency,
+        keepalive_timeout=30,
+    )
+    timeout = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as client:
+            session = AdaptiveSession(client, per_host_concurrency, rate, telemetry)
+            workers = [asyncio.create_task(worker(session)) for _ in range(max_concurrency)]
+            await queue.join()
+            for _ in range(retry_passes):
+                retries = frontier.requeue_retries()
+                if not retries:
+                    break
+                logging.info("Retrying {} failed items".format(len(retries)))
+                attempts.clear()
+                for row in retries:
+                    queue.put_nowait(row)
+                await queue.join()
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+    finally:
+        frontier.close()
 
 def main():
-    # Starting URL as provided
-    start_url = "https://epe.lac-bac.gc.ca/100/201/301/public_accounts_can/pdf/index.html"
+    parser = argparse.ArgumentParser(description="Mirror the Public Accounts of Canada PDFs.")
+    parser.add_argument("--start-url",
+                        default="https://epe.lac-bac.gc.ca/100/201/301/public_accounts_can/pdf/index.html",
+                        help="Index page to start crawling from")
     # Base directory where PDFs will be stored (root folder is 'pdfs')
-    dest_base = "pdfs"
-    
-    parse_page(start_url, dest_base)
+    parser.add_argument("--dest", default="pdfs", help="Directory to save PDFs under")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Crawl concurrently with a shared connection pool")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Maximum concurrent connections in async mode")
+    parser.add_argument("--per-host-concurrency", type=int, default=4,
+                        help="Maximum concurrent connections per host in async mode")
+    parser.add_argument("--rate", type=float, default=4.0,
+                        help="Maximum requests per second per host in async mode")
+    parser.add_argument("--max-retries", type=int, default=3,
+                        help="Retries per item for 429/5xx and dropped connections")
+    parser.add_argument("--retry-passes", type=int, default=2,
+                        help="Passes over the retry queue at the end of the run")
+    parser.add_argument("--prom-file",
+                        help="Where to write Prometheus textfile metrics (default <dest>/crawl.prom)")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Discard an unfinished crawl frontier and start over")
+    parser.add_argument("--ingest", action="store_true",
+                        help="Adopt PDFs already under --dest into the blob store and "
+                             "write the supersession report, without crawling")
+    args = parser.parse_args()
+
+    if args.ingest:
+        manifest = load_manifest(args.dest)
+        ingest_tree(args.dest, manifest)
+        write_supersession_report(args.dest, manifest)
+        return
+
+    telemetry = CrawlTelemetry()
+    if args.use_async:
+        asyncio.run(crawl_async(args.start_url, args.dest,
+                                max_concurrency=args.concurrency,
+                                per_host_concurrency=args.per_host_concurrency,
+                                fresh=args.fresh, rate=args.rate,
+                                max_retries=args.max_retries,
+                                retry_passes=args.retry_passes,
+                                telemetry=telemetry))
+    else:
+        crawl(args.start_url, args.dest, fresh=args.fresh,
+              max_retries=args.max_retries, retry_passes=args.retry_passes,
+              telemetry=telemetry)
+    manifest = load_manifest(args.dest)
+    write_supersession_report(args.dest, manifest)
+    telemetry.write(args.dest, manifest, args.prom_file)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+"""
+Extract expense tables from the mirrored Public Accounts of Canada PDFs.
+
+Handles three kinds of document under PublicAccountsPDFs/<year>/:
+
+  Volume II  "Details of expenses and revenues"  – the per-ministry
+             "Transfer payments" tables (authorities used in the year)
+  Section 3  "Professional and special services" – payments by service
+             class and payee
+  Section 4  "Acquisition of land, buildings and works" – current-year
+             expenditures by contractor and project
+
+Each volume is split into shards of consecutive pages which a process
+pool turns into text (pypdf's layout mode, by far the expensive step).
+Workers open the PDF themselves and only ever hold one shard, so memory
+per worker does not depend on the size of the volume, and throughput
+scales with the number of processes. Shards come back in page order and
+are fed through a small per-layout parser in this process, which keeps
+the ministry/department context that continued tables carry across
+page (and therefore shard) boundaries.
+
+If page_index.py has built an index of the PDFs, only the pages of the
+section a layout reads (e.g. Volume II's "Transfer payments") are
+extracted; unindexed or changed volumes are still read in full.
+
+Tokenized pages are cached (extract_cache.sqlite3, keyed by PDF hash,
+page and EXTRACTOR_VERSION), so re-running after a parser change only
+re-parses text; --rebuild or --no-cache bypass it.
+
+Outputs one CSV per fiscal year, <out>/expenses_<year>.csv, with the
+columns clean_public_accounts_2024.py writes to clean_expenses_2024.csv,
+including the exact integer amount_cents.
+
+The parsers follow the layouts used since about 2010; pages of older
+volumes that do not match simply produce no rows.
+"""
+import os
+import argparse
+import csv
+import decimal
+import hashlib
+import json
+import logging
+import multiprocessing
+import re
+import sqlite3
+import time
+import zlib
+
+import pypdf
+from pypdf import PdfReader
+
+import page_index
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# pypdf warns about every font it cannot fully decode
+logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+# Same columns as clean_expenses_2024.csv
+KEPT_COLS = [
+    "Ministry Name",
+    "Expenditure Category (Operating / Capital)",
+    "Program Name",
+    "Activity / Item",
+    "Sub Item",
+    "Standard Account (Expense/Asset Name)",
+    "Account Details (Expense/Asset Details)",
+]
+
+PAGES_PER_SHARD = 16
+# Bump whenever extract_shard or tokenize_line change what they return,
+# so cached pages from the old code are not reused
+EXTRACTOR_VERSION = 1
+CACHE_NAME = "extract_cache.sqlite3"
+
+# A table cell holding an amount: 1,234 / (1,234) / a dash for nil
+AMOUNT = re.compile(r"^(?:\(?-?\d{1,3}(?:,\d{3})*\)?|[–—-])$")
+# Columns are separated by runs of spaces or dot leaders
+FIELD_SEP = re.compile(r"\s{2,}|\s*\.{3,}\s*")
+# Footnote references printed just before the amounts, e.g. "2,f"
+NOTES = re.compile(r"^[0-9a-z](?:,[0-9a-z])*$")
+DASHES = {"-", "–", "—"}
+CENT = decimal.Decimal("0.01")
+
+def parse_amount(text):
+    """Return Decimal dollars or None for a nil (dash) cell."""
+    text = text.strip()
+    if text in DASHES:
+        return None
+    negative = text.startswith("(") and text.endswith(")")
+    amount = decimal.Decimal(text.strip("()").replace(",", ""))
+    return -amount if negative else amount
+
+def amount_cents(amount):
+    """
+    Exact int cents for a Decimal amount, rounded half away from zero like
+    amounts_to_cents in clean_public_accounts_2024.py.
+    """
+    return int(amount.quantize(CENT, rounding=decimal.ROUND_HALF_UP) * 100)
+
+def tokenize_line(line):
+    """
+    Splits one layout-mode line into (indent, label, amounts). Indent
+    counts leading spaces and the '#' tagging markers some volumes carry;
+    amounts are the trailing amount cells, left to right, as strings.
+    """
+    indent = len(line) - len(line.lstrip(" #"))
+    fields = [f for f in FIELD_SEP.split(line.strip(" #")) if f]
+    amounts = []
+    while fields and AMOUNT.match(fields[-1]):
+        amounts.insert(0, fields.pop())
+    if amounts and fields and NOTES.match(fields[-1]):
+        fields.pop()
+    label = " ".join(fields)
+    label = re.sub(r"\s*\.{2,}[\s.]*$", "", label).strip(" #")
+    return indent, label, tuple(amounts)
+
+def extract_shard(shard):
+    """
+    Worker: text of pages [start, stop) of one PDF as tokenized lines.
+    Returns (path, [(page_number, [(indent, label, amounts), ...]), ...]).
+    """
+    path, start, stop = shard
+    reader = PdfReader(path)
+    pages = []
+    for number in range(start, stop):
+        try:
+            text = reader.pages[number].extract_text(extraction_mode="layout")
+        except Exception as e:
+            logging.warning("Could not extract {} page {}: {}".format(path, number + 1, e))
+            text = ""
+        pages.append((number, [tokenize_line(line) for line in text.splitlines() if line.strip()]))
+    return path, pages
+
+def make_row(ministry, category, program, activity, account, details, amount):
+    return [ministry or "", category, program or "", activity or "", "", account, details,
+            amount, amount_cents(amount)]
+
+class TransferPaymentsParser:
+    """
+    Volume II "Transfer payments" tables. Takes the "Used in the current
+    year" column; rows are grouped by organization and Grants /
+    Contributions / Other transfer payments.
+    """
+    GROUPS = {"Grants", "Contributions", "Other transfer payments"}
+    # Page index section holding these tables (see page_index.py)
+    SECTION = "Transfer payments"
+    FOOTER = re.compile(r"Section\s+\d+\s*[—–-]\s*(.+?)(?:\s+\d+\s+Public Accounts.*)?$")
+    USED_COLUMN = -4
+
+    def __init__(self):
+        self.ministry = None
+        self.organization = None
+        self.group = None
+        self.indent = None
+        self.open = False
+
+    def page(self, lines):
+        # The running header/footer names the section's ministry
+        content = []
+        for indent, label, amounts in lines:
+            if "Public Accounts of Canada" in label:
+                footer = self.FOOTER.search(label)
+                if footer:
+                    self.ministry = footer.group(1).strip()
+            else:
+                content.append((indent, label, amounts))
+        if not content:
+            return
+        title = content[0][1]
+        if title.startswith("Transfer payments"):
+            if title == "Transfer payments":
+                # A new table starts; anything else is "—continued" / "—concluded"
+                self.organization = self.group = self.indent = None
+            # (A "—concluded" page can still run on to an untitled one)
+            self.open = True
+            in_body, margin = False, 0
+        elif self.open and not (len(content) > 1 and content[1][1] == "(in dollars)"):
+            # Some continuation pages carry no title or column headings
+            in_body, margin = True, self.indent or 0
+        else:
+            self.open = False
+            return
+        pending = []
+        heading = False
+        for indent, label, amounts in content:
+            if label.startswith("Total Ministry"):
+                self.open = False
+            if not in_body:
+                in_body, margin = label.startswith("Description"), indent
+                continue
+            if indent < margin:
+                # Footnotes sit left of the table
+                continue
+            if self.indent is None:
+                # A table opens with its first organization heading
+                self.indent = indent
+            if not amounts:
+                if indent > self.indent + 1:
+                    # First line of a description that wraps onto the amount line
+                    pending.append(label)
+                    continue
+                if label in self.GROUPS:
+                    self.group = label
+                elif heading:
+                    # Organization name wrapped over two lines
+                    self.organization += " " + label
+                elif not label.startswith("Total"):
+                    self.organization, self.group = label, None
+                    heading = True
+                    continue
+                heading = False
+                continue
+            heading = False
+            description = " ".join(pending + [label]).strip()
+            pending = []
+            if not description or description.startswith("Total") or len(amounts) < -self.USED_COLUMN:
+                continue
+            amount = parse_amount(amounts[self.USED_COLUMN])
+            if amount is None:
+                continue
+            yield make_row(self.ministry, "Operating Expense", self.organization, self.group,
+                           "Transfer payments", description, amount)
+
+class ProfessionalServicesParser:
+    """
+    Section 3 "Professional and special services": one row per payee
+    (including the "Service payments under $100,000" line) under its
+    department and service class. Class and department subtotals are
+    skipped.
+    """
+    CLASSES = {
+        "Business Services", "Communications Services", "Construction Services",
+        "Engineering and Architectural Services", "Health and Welfare Services",
+        "Informatics Services", "Interpretation and Translation Services",
+        "Legal Services", "Management Consulting", "Other Services",
+        "Protection Services", "Scientific and Research Services",
+        "Special Fees and Services", "Temporary Help Services",
+        "Training and Educational Services",
+    }
+    HEADER_END = re.compile(r"^\(?in dollars\)?", re.I)
+    SECTION = None
+
+    def __init__(self):
+        self.ministry = None
+        self.department = None
+        self.service = None
+        self.class_indent = 0
+
+    def page(self, lines):
+        in_body = False
+        pending = []
+        for indent, label, amounts in lines:
+            if not in_body:
+                in_body = bool(self.HEADER_END.match(label))
+                continue
+            if "Public Accounts of Canada" in label or not label:
+                continue
+            if label in self.CLASSES:
+                if label != self.service or not amounts:
+                    # The heading, not the subtotal line repeated under it
+                    self.class_indent = indent
+                self.service = label
+            elif label.startswith("Total") or label.endswith(" Total"):
+                # Ends the department (or ministry)
+                self.service = None
+            elif not amounts:
+                if self.service and indent > self.class_indent:
+                    # Payee name wrapping onto the amount line
+                    pending.append(label)
+                elif indent == 0:
+                    self.ministry, self.department, self.service = label, None, None
+                else:
+                    self.department, self.service = label, None
+                continue
+            elif indent <= self.class_indent:
+                # Department subtotal, in layouts that give departments an amount
+                self.department, self.service = label, None
+            else:
+                payee = " ".join(pending + [label])
+                amount = parse_amount(amounts[-1])
+                if amount is not None:
+                    yield make_row(self.ministry, "Operating Expense", self.department, self.service,
+                                   "Services", payee, amount)
+            pending = []
+
+class AcquisitionsParser:
+    """
+    Section 4 "Acquisition of land, buildings and works": one row per
+    project (current-year expenditures) under its department and
+    contractor. Small contracts are reported as a single "Total" line.
+    """
+    HEADER_END = re.compile(r"^(Contracted|\(in dollars\))")
+    CURRENT_YEAR_COLUMN = -2
+    SECTION = None
+
+    def __init__(self):
+        self.ministry = None
+        self.department = None
+        self.contractor = None
+        self.headers = []
+
+    def page(self, lines):
+        body = []
+        in_body = False
+        for indent, label, amounts in lines:
+            if not in_body:
+                in_body = bool(self.HEADER_END.match(label))
+            elif "Public Accounts of Canada" not in label:
+                body.append((indent, label, amounts))
+        # Projects (and their wrapped lines) sit deeper than the headers
+        leaf_indents = [indent for indent, label, amounts in body
+                        if amounts and label and "Total" not in label]
+        leaf = min(leaf_indents) if leaf_indents else None
+
+        pending = []
+        for indent, label, amounts in body:
+            is_total = label == "Total"
+            if not amounts:
+                if leaf is not None and indent >= leaf - 1:
+                    pending.append(label)
+                else:
+                    self.headers.append(label)
+                continue
+            if (label.startswith("Total") and not is_total) or label.endswith(" Total"):
+                self.headers = []
+                continue
+            self.assign_headers()
+            if is_total:
+                # "Contracts under $250,000 ... (N contractors)" followed by its total
+                contractor, details = None, self.contractor
+            else:
+                contractor, details = self.contractor, " ".join(pending + [label])
+            pending = []
+            if len(amounts) < -self.CURRENT_YEAR_COLUMN or not details:
+                continue
+            amount = parse_amount(amounts[self.CURRENT_YEAR_COLUMN])
+            if amount is not None:
+                yield make_row(self.ministry, "Capital Expense", self.department, contractor,
+                               "Acquisition of land, buildings and works", details, amount)
+
+    def assign_headers(self):
+        """
+        Headers collected since the last row are, from the right,
+        contractor, department and ministry.
+        """
+        if not self.headers:
+            return
+        self.contractor = self.headers[-1]
+        if len(self.headers) >= 2:
+            self.department = self.headers[-2]
+        if len(self.headers) >= 3:
+            self.ministry = self.headers[-3]
+        self.headers = []
+
+# (parser, filename pattern); errata are single replacement pages and are skipped
+LAYOUTS = [
+    (TransferPaymentsParser, re.compile(r"vol2|volume ii\b.*details of exp", re.I)),
+    (ProfessionalServicesParser, re.compile(r"ds3|professional and special services", re.I)),
+    (AcquisitionsParser, re.compile(r"ds4|acquisition of land", re.I)),
+]
+
+def layout_for(name):
+    if re.search(r"erratum|revised|revision", name, re.I):
+        return None
+    for parser, pattern in LAYOUTS:
+        if pattern.search(name):
+            return parser
+    return None
+
+def find_documents(pdf_dir, years=None):
+    """Returns [(year, path, parser class)] in year and file name order."""
+    documents = []
+    for year in sorted(os.listdir(pdf_dir)):
+        year_dir = os.path.join(pdf_dir, year)
+        if not (year.isdigit() and os.path.isdir(year_dir)):
+            continue
+        if years and year not in years:
+            continue
+        for name in sorted(os.listdir(year_dir)):
+            parser = layout_for(name) if name.lower().endswith(".pdf") else None
+            if parser:
+                documents.append((year, os.path.join(year_dir, name), parser))
+    return documents
+
+def page_runs(pages):
+    """[3, 4, 5, 9, 10] -> [(3, 6), (9, 11)]"""
+    runs = []
+    for number in pages:
+        if runs and runs[-1][1] == number:
+            runs[-1][1] = number + 1
+        else:
+            runs.append([number, number + 1])
+    return [tuple(run) for run in runs]
+
+def pages_for(path, layout, index=None):
+    """
+    Page numbers to extract. With an up-to-date page index, only the pages
+    of a layout's SECTION; otherwise the whole volume.
+    """
+    if index and layout.SECTION and index.indexed(path):
+        return index.pages(path, layout.SECTION)
+    return list(range(len(PdfReader(path).pages)))
+
+def shards_for(path, pages, pages_per_shard):
+    """Shards of consecutive pages covering the given page numbers."""
+    for first, last in page_runs(pages):
+        for start in range(first, last, pages_per_shard):
+            yield path, start, min(start + pages_per_shard, last)
+
+class ExtractionCache:
+    """
+    Tokenized pages from earlier runs, in a SQLite file keyed by (PDF
+    content hash, page number, extractor version): a re-downloaded PDF or
+    a change to the extraction code never reuses stale text. Pages not
+    read for the longest time are evicted once the cache holds more than
+    max_bytes of compressed results.
+    """
+
+    def __init__(self, path, max_bytes, version=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.version = version or "{}/pypdf-{}".format(EXTRACTOR_VERSION, pypdf.__version__)
+        self.used = {}
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                sha256 TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                sha256 TEXT NOT NULL,
+                page INTEGER NOT NULL,
+                version TEXT NOT NULL,
+                data BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                used REAL NOT NULL,
+                PRIMARY KEY (sha256, page, version)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS pages_used ON pages(used);
+        """)
+
+    def digest(self, path):
+        """SHA-256 of the PDF, rehashed only when its size or mtime changes."""
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        row = self.db.execute("SELECT size, mtime, sha256 FROM files WHERE path = ?", (key,)).fetchone()
+        if row and row[:2] == (stat.st_size, stat.st_mtime):
+            return row[2]
+        sha = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                        (key, stat.st_size, stat.st_mtime, sha.hexdigest()))
+        self.db.commit()
+        return sha.hexdigest()
+
+    def cached(self, digest, pages):
+        """The subset of pages that have results for this version."""
+        have = {page for (page,) in self.db.execute(
+            "SELECT page FROM pages WHERE sha256 = ? AND version = ?", (digest, self.version))}
+        return have.intersection(pages)
+
+    def get(self, digest, page):
+        data, = self.db.execute("SELECT data FROM pages WHERE sha256 = ? AND page = ? AND version = ?",
+                                (digest, page, self.version)).fetchone()
+        self.used[digest, page] = time.time()
+        return [(indent, label, tuple(amounts))
+                for indent, label, amounts in json.loads(zlib.decompress(data))]
+
+    def put(self, digest, page, lines):
+        data = zlib.compress(json.dumps(lines, separators=(",", ":")).encode("utf-8"))
+        self.db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)",
+                        (digest, page, self.version, data, len(data), time.time()))
+
+    def close(self):
+        """Records page reads, evicts down to max_bytes and closes."""
+        self.db.executemany("UPDATE pages SET used = ? WHERE sha256 = ? AND page = ? AND version = ?",
+                            [(used, digest, page, self.version) for (digest, page), used in self.used.items()])
+        total, = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()
+        if total > self.max_bytes:
+            excess, cutoff = total - self.max_bytes, None
+            for used, size in self.db.execute("SELECT used, size FROM pages ORDER BY used"):
+                excess -= size
+                if excess <= 0:
+                    cutoff = used
+                    break
+            evicted = self.db.execute("DELETE FROM pages WHERE used <= ?", (cutoff,)).rowcount
+            logging.info("Evicted {} cached pages to stay under {} bytes".format(evicted, self.max_bytes))
+        self.db.commit()
+        self.db.close()
+
+class YearWriter:
+    """Streams rows into <out>/expenses_<year>.csv, one year open at a time."""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.year = None
+        self.file = None
+        self.count = 0
+
+    def switch(self, year):
+        if year == self.year:
+            return
+        self.close()
+        os.makedirs(self.out_dir, exist_ok=True)
+        self.year = year
+        self.path = os.path.join(self.out_dir, "expenses_{}.csv".format(year))
+        self.file = open(self.path + ".tmp", "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow([*KEPT_COLS, "amount_dollars", "amount_cents"])
+        self.count = 0
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.count += 1
+
+    def close(self):
+        if self.file is None:
+            return
+        self.file.close()
+        os.replace(self.path + ".tmp", self.path)
+        logging.info("Wrote {} expense rows to {}".format(self.count, self.path))
+        self.file = None
+
+def extract(pdf_dir, out_dir, years=None, jobs=None, pages_per_shard=PAGES_PER_SHARD, index=None,
+            cache=None, rebuild=False):
+    """
+    Cached pages are read back in this process; only the others go to
+    the pool. rebuild re-extracts every page and overwrites the cache.
+    """
+    plan = []
+    for year, path, layout in find_documents(pdf_dir, years):
+        pages = pages_for(path, layout, index)
+        digest = cache.digest(path) if cache else None
+        cached = cache.cached(digest, pages) if cache and not rebuild else set()
+        plan.append((year, path, layout, digest, pages, cached))
+    shards = [shard for year, path, layout, digest, pages, cached in plan
+              for shard in shards_for(path, [n for n in pages if n not in cached], pages_per_shard)]
+    logging.info("Extracting {} pages, {} from cache".format(
+        sum(len(pages) for *_, pages, cached in plan), sum(len(cached) for *_, cached in plan)))
+
+    writer = YearWriter(out_dir)
+    # Recycling workers keeps pypdf's per-process caches from accumulating
+    with multiprocessing.Pool(jobs, maxtasksperchild=32) as pool:
+        extracted = pool.imap(extract_shard, shards)
+        for year, path, layout, digest, pages, cached in plan:
+            parser, rows, pages_with_rows = layout(), 0, 0
+            writer.switch(year)
+            fresh = {}
+            for number in pages:
+                if number in cached:
+                    lines = cache.get(digest, number)
+                else:
+                    # Shards arrive in plan order, so this only ever reads ahead
+                    while number not in fresh:
+                        fresh.update(next(extracted)[1])
+                    lines = fresh.pop(number)
+                    if cache:
+                        cache.put(digest, number, lines)
+                page_rows = 0
+                for row in parser.page(lines):
+                    writer.write(row)
+                    page_rows += 1
+                rows += page_rows
+                pages_with_rows += bool(page_rows)
+            logging.info("{}: {} rows from {} pages".format(path, rows, pages_with_rows))
+    writer.close()
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Extract expense tables from Public Accounts PDFs.")
+    parser.add_argument("--pdfs", default=here, help="Directory holding the <year>/ folders")
+    parser.add_argument("--out", default=os.path.join(here, "extracted"), help="Output directory")
+    parser.add_argument("--years", nargs="*", help="Only these fiscal years (default: all)")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--pages-per-shard", type=int, default=PAGES_PER_SHARD,
+                        help="Pages each worker extracts per task")
+    parser.add_argument("--no-index", action="store_true",
+                        help="Extract whole volumes even if page_index.py has indexed them")
+    parser.add_argument("--cache", default=os.path.join(here, CACHE_NAME),
+                        help="Extraction cache file (default: %(default)s)")
+    parser.add_argument("--cache-size", type=int, default=512,
+                        help="Cache size bound in MB; least recently used pages are evicted")
+    parser.add_argument("--no-cache", action="store_true", help="Neither read nor write the cache")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Re-extract every page and replace its cached result")
+    args = parser.parse_args()
+    index = None
+    if not args.no_index and os.path.exists(os.path.join(args.pdfs, page_index.INDEX_NAME)):
+        index = page_index.PageIndex(args.pdfs)
+    cache = None if args.no_cache else ExtractionCache(args.cache, args.cache_size * 1024 * 1024)
+    try:
+        extract(args.pdfs, args.out, args.years, args.jobs, args.pages_per_shard, index, cache, args.rebuild)
+    finally:
+        if cache:
+            cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""
+Page-level index of the mirrored Public Accounts PDFs.
+
+A one-time pass over every PDF under PublicAccountsPDFs/<year>/ records,
+for each page, its printed folio, section heading (the table or chapter
+title, carried onto untitled continuation pages), the ministry or
+ministries it covers, whether it is a table, narrative or index page,
+and where its text lives. Page text is kept zlib-compressed in a single
+side file and addressed by offset and length, so a lookup reads back
+one page without opening the PDF, and extraction jobs can open only the
+pages they need instead of parsing whole volumes.
+
+    python page_index.py build [--years 2023 2024]
+    python page_index.py find --year 2024 --ministry "Agri" --section "Transfer payments"
+    python page_index.py find --year 2024 --ministry Health --kind table --text
+
+Rebuilding is incremental: documents whose size and modification time
+are unchanged are skipped, and documents no longer on disk are dropped.
+Text of re-indexed or dropped documents stays in the side file as dead
+bytes until they make up more than half of it; the file is then
+rewritten with only the live pages (or on demand with `compact`).
+
+    python page_index.py compact
+"""
+import os
+import argparse
+import logging
+import multiprocessing
+import re
+import sqlite3
+import zlib
+
+from pypdf import PdfReader
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+INDEX_NAME = "page_index.sqlite3"
+TEXT_NAME = "page_index.text"
+PAGES_PER_SHARD = 32
+# Rewrite the text file once this share of it belongs to no page
+COMPACT_RATIO = 0.5
+
+RUNNING_HEAD = re.compile(r"Public Accounts of Canada,?\s*\d{4}\s*[–-]\s*\d{2,4}")
+SECTION_HEAD = re.compile(r"Section\s+\d+\s*[—–-]\s*(.+?)(?=\s+\d{1,4}\b|\s*$)")
+TOC_ENTRY = re.compile(r"^(?:\d+\.\s*)?(.+?)\s*\.{3,}[\s.]*(\d+)(?:\s+\d+)?$")
+CONTINUED = re.compile(r"\s*[—–-]\s*(continued|concluded)$")
+AMOUNT_LINE = re.compile(r"(?:\d{1,3}(?:,\d{3})+|[–—])\)?\s*$")
+DOLLARS = re.compile(r"^\(?in (thousands of |millions of )?dollars\)?", re.I)
+
+def document_key(pdf_dir, path):
+    return os.path.relpath(path, pdf_dir).replace(os.sep, "/")
+
+def page_texts(shard):
+    """Worker: plain text of pages [start, stop) of one PDF."""
+    path, start, stop = shard
+    reader = PdfReader(path)
+    texts = []
+    for number in range(start, stop):
+        try:
+            texts.append((number, reader.pages[number].extract_text() or ""))
+        except Exception as e:
+            logging.warning("Could not extract {} page {}: {}".format(path, number + 1, e))
+            texts.append((number, ""))
+    return path, texts
+
+class PageDescriber:
+    """
+    Works out folio, section, ministries and kind for the pages of one
+    document, in order.
+
+    A page's section is its title when it starts with one of the entries
+    of the most recent table of contents (or sits over an "(in dollars)"
+    line); untitled pages continue the previous page's section. Volumes
+    with a "Section N—Ministry" running head take the ministry from it;
+    the others (Sections 3 and 4 of Volume III) from ministry headings
+    matching their own table of contents.
+    """
+
+    def __init__(self):
+        self.section = None
+        self.ministry = None
+        self.headed = False
+        self.ministries = {}
+        self.titles = set()
+
+    def contents(self, body):
+        """Entry names of a table of contents page, joining wrapped names."""
+        names, carry = [], []
+        for line in body:
+            match = TOC_ENTRY.match(line)
+            if not match:
+                if names:
+                    carry.append(re.sub(r"^\d+\.\s*", "", line))
+                continue
+            name = match.group(1).strip()
+            if carry and carry[-1] == name:
+                carry.pop()
+            names.append(" ".join(carry + [name]))
+            carry = []
+        return names
+
+    def cover_title(self, body):
+        """"Section 3 / Public Accounts of Canada / 2023–2024 / <title> / Table of contents" """
+        for i, line in enumerate(body):
+            if re.match(r"^\d{4}\s*[–-]\s*\d{2,4}$", line):
+                title = []
+                for line in body[i + 1:]:
+                    if line.lower() == "table of contents":
+                        return " ".join(title) or None
+                    title.append(line)
+        return None
+
+    def describe(self, text):
+        lines = [line.strip() for line in text.splitlines() if line.strip()]
+        folio = None
+        body = []
+        for line in lines:
+            if RUNNING_HEAD.search(line):
+                rest = RUNNING_HEAD.sub(" ", line)
+                head = SECTION_HEAD.search(rest)
+                if head:
+                    name = head.group(1).strip()
+                    self.headed = True
+                    self.ministry = None if name.startswith("Summary") else name
+                number = re.search(r"(?<![\d,])(\d{1,4})(?![\d,])", SECTION_HEAD.sub(" ", rest))
+                if number:
+                    folio = int(number.group(1))
+            else:
+                body.append(line)
+
+        section = None
+        toc = [line for line in body if TOC_ENTRY.match(line)]
+        if any(line.lower() == "table of contents" for line in body) or len(toc) >= 5:
+            kind = "index"
+            names = self.contents(body)
+            self.titles = set(names)
+            if not self.headed and not self.ministries:
+                self.ministries = {name.lower(): name for name in names}
+            title = None if self.headed else self.cover_title(body)
+            if title:
+                self.section = title
+            section = title or "Table of contents"
+        elif sum(bool(AMOUNT_LINE.search(line)) for line in body) >= 3:
+            kind = "table"
+        else:
+            kind = "narrative"
+
+        if kind != "index" and body:
+            heading = CONTINUED.sub("", body[0])
+            if heading in self.titles or any(DOLLARS.match(line) for line in body[1:4]):
+                self.section = heading
+            section = self.section
+
+        ministries = [self.ministry] if self.ministry else []
+        if not self.headed and kind != "index":
+            for line in body:
+                name = self.ministries.get(line.lower())
+                if name and name not in ministries:
+                    self.ministry = name
+                    ministries.append(name)
+        return folio, section, ministries, kind
+
+class PageIndex:
+    """
+    SQLite index (page_index.sqlite3) plus compressed page text
+    (page_index.text), both kept next to the <year>/ folders.
+    """
+
+    def __init__(self, pdf_dir, path=None):
+        self.pdf_dir = pdf_dir
+        self.path = path or os.path.join(pdf_dir, INDEX_NAME)
+        self.text_path = os.path.splitext(self.path)[0] + ".text"
+        self.db = sqlite3.connect(self.path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                path TEXT UNIQUE NOT NULL,
+                year TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                pages INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pages (
+                document INTEGER NOT NULL REFERENCES documents(id),
+                page INTEGER NOT NULL,
+                folio INTEGER,
+                section TEXT,
+                kind TEXT NOT NULL,
+                text_offset INTEGER NOT NULL,
+                text_length INTEGER NOT NULL,
+                PRIMARY KEY (document, page)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS page_ministries (
+                document INTEGER NOT NULL,
+                page INTEGER NOT NULL,
+                ministry TEXT NOT NULL,
+                PRIMARY KEY (ministry, document, page)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS pages_section ON pages(section);
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """)
+        self.finish_compaction()
+
+    def close(self):
+        self.db.close()
+
+    def stale_documents(self, years=None):
+        """[(year, path)] of PDFs that are new or changed since they were indexed."""
+        known = {path: (size, mtime) for path, size, mtime in
+                 self.db.execute("SELECT path, size, mtime FROM documents")}
+        stale = []
+        for year in sorted(os.listdir(self.pdf_dir)):
+            year_dir = os.path.join(self.pdf_dir, year)
+            if not (year.isdigit() and os.path.isdir(year_dir)) or (years and year not in years):
+                continue
+            for name in sorted(os.listdir(year_dir)):
+                if not name.lower().endswith(".pdf"):
+                    continue
+                path = os.path.join(year_dir, name)
+                stat = os.stat(path)
+                if known.get(document_key(self.pdf_dir, path)) != (stat.st_size, stat.st_mtime):
+                    stale.append((year, path))
+        return stale
+
+    def missing_documents(self):
+        """Indexed paths whose PDF is no longer on disk."""
+        return [path for path, in self.db.execute("SELECT path FROM documents")
+                if not os.path.exists(os.path.join(self.pdf_dir, path))]
+
+    def forget(self, key):
+        row = self.db.execute("SELECT id FROM documents WHERE path = ?", (key,)).fetchone()
+        if row:
+            self.db.execute("DELETE FROM pages WHERE document = ?", row)
+            self.db.execute("DELETE FROM page_ministries WHERE document = ?", row)
+            self.db.execute("DELETE FROM documents WHERE id = ?", row)
+
+    def build(self, years=None, jobs=None, pages_per_shard=PAGES_PER_SHARD):
+        """
+        Indexes new and changed PDFs on a process pool, drops deleted ones
+        and compacts the text file when too much of it is dead.
+        """
+        for key in self.missing_documents():
+            logging.info("Dropping {} (no longer on disk)".format(key))
+            self.forget(key)
+        self.db.commit()
+        stale = self.stale_documents(years)
+        if not stale:
+            logging.info("Page index is up to date")
+            self.compact(COMPACT_RATIO)
+            return
+        counts = {path: len(PdfReader(path).pages) for year, path in stale}
+        shards = [(path, start, min(start + pages_per_shard, counts[path]))
+                  for year, path in stale for start in range(0, counts[path], pages_per_shard)]
+        years_by_path = dict((path, year) for year, path in stale)
+
+        current, describer, document = None, None, None
+        with open(self.text_path, "ab") as text_file, \
+                multiprocessing.Pool(jobs, maxtasksperchild=32) as pool:
+            for path, texts in pool.imap(page_texts, shards):
+                if path != current:
+                    if current:
+                        self.db.commit()
+                        logging.info("Indexed {} ({} pages)".format(current, counts[current]))
+                    current, describer = path, PageDescriber()
+                    key = document_key(self.pdf_dir, path)
+                    self.forget(key)
+                    stat = os.stat(path)
+                    document = self.db.execute(
+                        "INSERT INTO documents (path, year, size, mtime, pages) VALUES (?, ?, ?, ?, ?)",
+                        (key, years_by_path[path], stat.st_size, stat.st_mtime, counts[path])).lastrowid
+                for number, text in texts:
+                    folio, section, ministries, kind = describer.describe(text)
+                    blob = zlib.compress(text.encode("utf-8"))
+                    offset = text_file.tell()
+                    text_file.write(blob)
+                    self.db.execute(
+                        "INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (document, number, folio, section, kind, offset, len(blob)))
+                    self.db.executemany(
+                        "INSERT OR IGNORE INTO page_ministries VALUES (?, ?, ?)",
+                        [(document, number, ministry) for ministry in ministries])
+            text_file.flush()
+        self.db.commit()
+        if current:
+            logging.info("Indexed {} ({} pages)".format(current, counts[current]))
+        self.compact(COMPACT_RATIO)
+
+    def dead_bytes(self):
+        """(bytes of the text file no page points at, size of the text file)"""
+        size = os.path.getsize(self.text_path) if os.path.exists(self.text_path) else 0
+        live, = self.db.execute("SELECT COALESCE(SUM(text_length), 0) FROM pages").fetchone()
+        return size - live, size
+
+    def compact(self, ratio=0.0):
+        """
+        Rewrites the text file with only the blobs pages point at, if more
+        than `ratio` of it is dead. The new file and offsets are committed
+        before the swap, and an interrupted swap is finished on next open.
+        """
+        dead, size = self.dead_bytes()
+        if not dead or dead <= ratio * size:
+            return
+        compact_path = self.text_path + ".compact"
+        offset = 0
+        with open(self.text_path, "rb") as old, open(compact_path, "wb") as new:
+            rows = self.db.execute(
+                "SELECT document, page, text_offset, text_length FROM pages ORDER BY text_offset").fetchall()
+            for document, page, text_offset, text_length in rows:
+                old.seek(text_offset)
+                new.write(old.read(text_length))
+                self.db.execute("UPDATE pages SET text_offset = ? WHERE document = ? AND page = ?",
+                                (offset, document, page))
+                offset += text_length
+            new.flush()
+            os.fsync(new.fileno())
+        self.db.execute("INSERT OR REPLACE INTO meta VALUES ('compacting', ?)", (compact_path,))
+        self.db.commit()
+        self.finish_compaction()
+        logging.info("Compacted {}: {:.1f} MB -> {:.1f} MB".format(
+            self.text_path, size / 1e6, offset / 1e6))
+
+    def finish_compaction(self):
+        """
+        Swaps in a compacted text file whose offsets are committed; drops
+        one left by a compaction that died before its commit.
+        """
+        compact_path = self.text_path + ".compact"
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'compacting'").fetchone()
+        if row and os.path.exists(compact_path):
+            os.replace(compact_path, self.text_path)
+        elif os.path.exists(compact_path):
+            os.remove(compact_path)
+        if row:
+            self.db.execute("DELETE FROM meta WHERE key = 'compacting'")
+            self.db.commit()
+
+    def find(self, year=None, document=None, ministry=None, section=None, kind=None):
+        """
+        Pages matching every given filter, as dicts in document and page
+        order. ministry and section match case-insensitive substrings.
+        """
+        query = ["SELECT DISTINCT d.path, d.year, p.page, p.folio, p.section, p.kind,"
+                 " p.text_offset, p.text_length FROM pages p JOIN documents d ON d.id = p.document"]
+        where, params = [], []
+        if ministry:
+            query.append("JOIN page_ministries m ON m.document = p.document AND m.page = p.page")
+            where.append("m.ministry LIKE ?")
+            params.append("%{}%".format(ministry))
+        if year:
+            where.append("d.year = ?")
+            params.append(str(year))
+        if document:
+            where.append("d.path = ?")
+            params.append(document_key(self.pdf_dir, document) if os.path.isabs(document) else document)
+        if section:
+            where.append("p.section LIKE ?")
+            params.append("%{}%".format(section))
+        if kind:
+            where.append("p.kind = ?")
+            params.append(kind)
+        if where:
+            query.append("WHERE " + " AND ".join(where))
+        query.append("ORDER BY d.path, p.page")
+        columns = ("path", "year", "page", "folio", "section", "kind", "text_offset", "text_length")
+        return [dict(zip(columns, row)) for row in self.db.execute(" ".join(query), params)]
+
+    def pages(self, path, section=None):
+        """Page numbers of one PDF, optionally only those of a section."""
+        return [row["page"] for row in self.find(document=path, section=section)]
+
+    def indexed(self, path):
+        key = document_key(self.pdf_dir, path)
+        row = self.db.execute("SELECT size, mtime FROM documents WHERE path = ?", (key,)).fetchone()
+        stat = os.stat(path)
+        return row == (stat.st_size, stat.st_mtime)
+
+    def text(self, row):
+        """The stored text of a page returned by find()."""
+        with open(self.text_path, "rb") as f:
+            f.seek(row["text_offset"])
+            return zlib.decompress(f.read(row["text_length"])).decode("utf-8")
+
+def main():
+    here = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Page-level index of the Public Accounts PDFs.")
+    parser.add_argument("--pdfs", default=here, help="Directory holding the <year>/ folders")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Index new and changed PDFs")
+    build.add_argument("--years", nargs="*", help="Only these fiscal years (default: all)")
+    build.add_argument("--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    commands.add_parser("compact", help="Rewrite the text file without dead bytes")
+    find = commands.add_parser("find", help="List pages matching the filters")
+    find.add_argument("--year")
+    find.add_argument("--document", help="PDF path relative to --pdfs")
+    find.add_argument("--ministry")
+    find.add_argument("--section")
+    find.add_argument("--kind", choices=("table", "narrative", "index"))
+    find.add_argument("--text", action="store_true", help="Print each page's text")
+    args = parser.parse_args()
+
+    index = PageIndex(args.pdfs)
+    try:
+        if args.command == "build":
+            index.build(args.years, args.jobs)
+            return
+        if args.command == "compact":
+            index.compact()
+            return
+        for row in index.find(args.year, args.document, args.ministry, args.section, args.kind):
+            print("{}\tp.{}\t{}\t{}\t{}".format(row["path"], row["page"] + 1, row["folio"] or "",
+                                                 row["kind"], row["section"] or ""))
+            if args.text:
+                print(index.text(row))
+    finally:
+        index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Tests for the async crawl mode of download_pdfs.py, against a local
+aiohttp server.
+
+    python -m pytest PublicAccountsPDFs/test_download_pdfs.py
+"""
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from aiohttp import ClientSession, web
+
+import download_pdfs
+from download_pdfs import (AdaptiveSession, CrawlTelemetry, Frontier, TransientError, backoff_delay,
+                           blob_path, crawl, crawl_async, download_pdf_async, fetch_page_async,
+                           load_manifest, local_pdf_path, partial_path, save_manifest)
+
+INDEX = """<html><body>
+<a href="/2020/missing.pdf">Missing volume</a>
+<a href="/gone.html">Gone</a>
+</body></html>"""
+
+class NotFoundTest(unittest.IsolatedAsyncioTestCase):
+    """A 404 is a permanent failure: no retry, no slowdown, no resumed crawl."""
+
+    async def asyncSetUp(self):
+        async def index(request):
+            return web.Response(text=INDEX, content_type="text/html")
+
+        app = web.Application()
+        app.router.add_get("/index.html", index)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = self.runner.addresses[0][1]
+        self.base = "http://127.0.0.1:{}".format(port)
+        self.dest = tempfile.mkdtemp()
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        shutil.rmtree(self.dest)
+
+    async def test_not_found_is_failed_and_not_pending(self):
+        await crawl_async(self.base + "/index.html", self.dest, max_concurrency=2,
+                          per_host_concurrency=2, rate=100.0)
+        frontier = Frontier(os.path.join(self.dest, "frontier.sqlite3"))
+        try:
+            states = dict(frontier.conn.execute("SELECT url, state FROM frontier").fetchall())
+            self.assertEqual(states[self.base + "/2020/missing.pdf"], "failed")
+            self.assertEqual(states[self.base + "/gone.html"], "failed")
+            self.assertEqual(states[self.base + "/index.html"], "done")
+            self.assertFalse(frontier.has_pending())
+        finally:
+            frontier.close()
+
+    async def test_not_found_keeps_limiter_rate(self):
+        async with ClientSession() as client:
+            session = AdaptiveSession(client, 4, 10.0)
+            self.assertIsNone(await fetch_page_async(session, self.base + "/gone.html"))
+            limiter = session.limiter(self.base)
+            self.assertEqual(limiter.rate, 10.0)
+            self.assertEqual(limiter.in_flight, 0)
+            self.assertEqual(session.telemetry.host(self.base)["errors"], {})
+
+class SameNameTest(unittest.IsolatedAsyncioTestCase):
+    """Two URLs saved under one name download at once without sharing a .part file."""
+
+    async def asyncSetUp(self):
+        self.bodies = {"a": b"%PDF-a" + b"a" * 200_000, "b": b"%PDF-b" + b"b" * 300_000}
+
+        async def pdf(request):
+            body = self.bodies[request.match_info["which"]]
+            response = web.StreamResponse(headers={"Content-Type": "application/pdf",
+                                                   "Content-Length": str(len(body))})
+            await response.prepare(request)
+            for start in range(0, len(body), 16384):
+                await response.write(body[start:start + 16384])
+                await asyncio.sleep(0.001)
+            return response
+
+        app = web.Application()
+        app.router.add_get("/2020/{which}/volume.pdf", pdf)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = "http://127.0.0.1:{}".format(self.runner.addresses[0][1])
+        self.dest = tempfile.mkdtemp()
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        shutil.rmtree(self.dest)
+
+    async def test_concurrent_downloads_keep_their_bytes(self):
+        manifest = load_manifest(self.dest)
+        async with ClientSession() as client:
+            session = AdaptiveSession(client, 4, 100.0)
+            results = await asyncio.gather(*(
+                download_pdf_async(session, "{}/2020/{}/volume.pdf".format(self.base, which),
+                                   self.dest, file_name="Volume", manifest=manifest)
+                for which in self.bodies))
+        self.assertEqual(results, [True, True])
+        local_path = os.path.join(self.dest, "2020", "Volume.pdf")
+        with open(local_path, "rb") as f:
+            self.assertIn(f.read(), self.bodies.values())
+        self.assertEqual([n for n in os.listdir(os.path.dirname(local_path)) if n.endswith(".part")], [])
+        for body in self.bodies.values():
+            self.assertTrue(os.path.exists(blob_path(self.dest, hashlib.sha256(body).hexdigest())))
+
+class ResumeTest(unittest.IsolatedAsyncioTestCase):
+    """A resumed async download hashes the bytes it already had plus the new ones."""
+
+    async def asyncSetUp(self):
+        self.body = bytes(range(256)) * 12_000  # 3 MB, several write batches
+        self.ranges = []
+
+        async def pdf(request):
+            headers = {"Content-Type": "application/pdf", "ETag": '"v1"'}
+            start = 0
+            if request.headers.get("Range") and request.headers.get("If-Range") == '"v1"':
+                start = int(request.headers["Range"].split("=")[1].rstrip("-"))
+            self.ranges.append(start)
+            if start:
+                headers["Content-Range"] = "bytes {}-{}/{}".format(start, len(self.body) - 1, len(self.body))
+                return web.Response(status=206, body=self.body[start:], headers=headers)
+            return web.Response(body=self.body, headers=headers)
+
+        app = web.Application()
+        app.router.add_get("/2020/volume.pdf", pdf)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = "http://127.0.0.1:{}".format(self.runner.addresses[0][1])
+        self.dest = tempfile.mkdtemp()
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        shutil.rmtree(self.dest)
+
+    async def test_resume_hashes_whole_file(self):
+        url = self.base + "/2020/volume.pdf"
+        local_path = local_pdf_path(url, self.dest, "Volume")
+        with open(partial_path(url, local_path), "wb") as f:
+            f.write(self.body[:1_000_000])
+        key = os.path.relpath(local_path, self.dest)
+        manifest = {key: {"url": url, "path": key, "partial": {"url": url, "etag": '"v1"'}}}
+        save_manifest(self.dest, manifest)
+        async with ClientSession() as client:
+            session = AdaptiveSession(client, 4, 100.0)
+            self.assertTrue(await download_pdf_async(session, url, self.dest, "Volume", manifest))
+        self.assertEqual(self.ranges, [1_000_000])
+        sha256 = hashlib.sha256(self.body).hexdigest()
+        self.assertEqual(load_manifest(self.dest)[key]["sha256"], sha256)
+        with open(blob_path(self.dest, sha256), "rb") as f:
+            self.assertEqual(f.read(), self.body)
+
+def frontier_states(dest):
+    frontier = Frontier(os.path.join(dest, "frontier.sqlite3"))
+    try:
+        return dict(frontier.conn.execute("SELECT url, state FROM frontier").fetchall())
+    finally:
+        frontier.close()
+
+class BadLinkTest(unittest.IsolatedAsyncioTestCase):
+    """Unparsable links and errors on one row must not stop the async workers."""
+
+    async def asyncSetUp(self):
+        pages = {
+            "/index.html": "".join('<a href="//[bad{}/b.html">Bad</a>'.format(i) for i in range(8))
+                           + '<a href="http://h:99999/x.pdf">Bad port</a>'
+                           + "".join('<a href="/p{}.html">Page</a>'.format(i) for i in range(6)),
+        }
+        for i in range(6):
+            pages["/p{}.html".format(i)] = '<a href="/index.html">Home</a>'
+
+        async def page(request):
+            return web.Response(text=pages[request.path], content_type="text/html")
+
+        app = web.Application()
+        for path in pages:
+            app.router.add_get(path, page)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = "http://127.0.0.1:{}".format(self.runner.addresses[0][1])
+        self.dest = tempfile.mkdtemp()
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        shutil.rmtree(self.dest)
+
+    async def test_unparsable_links_are_skipped(self):
+        await asyncio.wait_for(crawl_async(self.base + "/index.html", self.dest, max_concurrency=2,
+                                           per_host_concurrency=2, rate=100.0), 30)
+        states = frontier_states(self.dest)
+        self.assertEqual(len(states), 7)
+        self.assertEqual(set(states.values()), {"done"})
+
+    async def test_row_errors_mark_failed_and_keep_workers(self):
+        add_links = download_pdfs.add_links
+
+        def flaky_add_links(frontier, url, links, depth, base_domain):
+            if url.endswith(("/p1.html", "/p2.html", "/p3.html")):
+                raise RuntimeError("boom")
+            return add_links(frontier, url, links, depth, base_domain)
+
+        with mock.patch.object(download_pdfs, "add_links", flaky_add_links):
+            await asyncio.wait_for(crawl_async(self.base + "/index.html", self.dest, max_concurrency=2,
+                                               per_host_concurrency=2, rate=100.0), 30)
+        states = frontier_states(self.dest)
+        self.assertEqual([url for url, state in sorted(states.items()) if state == "failed"],
+                         [self.base + "/p{}.html".format(i) for i in (1, 2, 3)])
+        self.assertEqual(list(states.values()).count("done"), 4)
+
+SITE = {
+    "/index.html": """<a href="/reports/2019.html">2019</a>
+<a href="/reports/2020.html">2020</a>
+<a href="https://elsewhere.example/2020/other.pdf">Elsewhere</a>""",
+    "/reports/2019.html": """<a href="/index.html">Home</a>
+<a href="/docs/2019/vol1.pdf">Volume 1</a>
+<a href="/docs/2019/vol2.pdf">Volume 2: Details</a>
+<a href="/docs/summary.pdf">Summary</a>""",
+    "/reports/2020.html": """<a href="/index.html">Home</a>
+<a href="/reports/2019.html#top">2019</a>
+<a href="/docs/2020/vol1.pdf">Volume 1</a>
+<a href="/docs/2020/vol1.pdf#page=3">Volume 1</a>""",
+}
+
+def pdf_tree(dest):
+    """{<year>/<name>.pdf: bytes} for everything saved under dest."""
+    tree = {}
+    for year in os.listdir(dest):
+        folder = os.path.join(dest, year)
+        if not os.path.isdir(folder) or year == download_pdfs.BLOB_DIR:
+            continue
+        for name in os.listdir(folder):
+            if name.endswith(".pdf"):
+                with open(os.path.join(folder, name), "rb") as f:
+                    tree[year + "/" + name] = f.read()
+    return tree
+
+class SyncAsyncTreeTest(unittest.IsolatedAsyncioTestCase):
+    """crawl and crawl_async save the same two-level site to the same tree."""
+
+    async def asyncSetUp(self):
+        async def page(request):
+            return web.Response(text=SITE[request.path], content_type="text/html")
+
+        async def pdf(request):
+            return web.Response(body=b"%PDF-" + request.path.encode() * 1000,
+                                content_type="application/pdf")
+
+        app = web.Application()
+        for path in SITE:
+            app.router.add_get(path, page)
+        app.router.add_get("/docs/{tail:.+}.pdf", pdf)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = "http://127.0.0.1:{}".format(self.runner.addresses[0][1])
+        self.sync_dest = tempfile.mkdtemp()
+        self.async_dest = tempfile.mkdtemp()
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+        shutil.rmtree(self.sync_dest)
+        shutil.rmtree(self.async_dest)
+
+    async def test_same_tree(self):
+        # The sync crawler blocks, so it runs in a thread while the loop serves it
+        await asyncio.to_thread(crawl, self.base + "/index.html", self.sync_dest)
+        await asyncio.wait_for(crawl_async(self.base + "/index.html", self.async_dest, max_concurrency=4,
+                                           per_host_concurrency=4, rate=100.0), 30)
+        sync_tree = pdf_tree(self.sync_dest)
+        self.assertEqual(sorted(sync_tree), ["2019/Volume 1.pdf", "2019/Volume 2 Details.pdf",
+                                             "2020/Volume 1.pdf", "misc/Summary.pdf"])
+        self.assertEqual(pdf_tree(self.async_dest), sync_tree)
+        self.assertEqual(frontier_states(self.async_dest), frontier_states(self.sync_dest))
+
+class ThrottleTest(unittest.IsolatedAsyncioTestCase):
+    """429 with Retry-After and 503 are retried, slow the host down, and it recovers."""
+
+    async def asyncSetUp(self):
+        # Responses served to each path before it succeeds
+        self.failures = {
+            "/page.html": [(429, {"Retry-After": "0"}), (503, {})],
+            "/2020/flaky.pdf": [(429, {"Retry-After": "0"}), (503, {})],
+            "/2020/stubborn.pdf": [(503, {}), (503, {}), (503, {})],
+        }
+        self.hits = {}
+
+        async def handler(request):
+            self.hits[request.path] = self.hits.get(request.path, 0) + 1
+            pending = self.failures.get(request.path)
+            if pending:
+                status, headers = pending.pop(0)
+                return web.Response(status=status, headers=headers)
+            if request.path.endswith(".pdf"):
+                return web.Response(body=b"%PDF-" + request.path.encode(), content_type="application/pdf")
+            return web.Response(text=PAGES[request.path], content_type="text/html")
+
+        PAGES = {
+            "/index.html": """<a href="/2020/flaky.pdf">Flaky</a>
+<a href="/2020/stubborn.pdf">Stubborn</a>""",
+            "/page.html": "",
+        }
+        app = web.Application()
+        app.router.add_get("/{tail:.+}", handler)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = "http://127.0.0.1:{}".format(self.runner.addresses[0][1])
+        self.dest = tempfile.mkdtemp()
+        # Keep the backoff short; Retry-After still sets its floor
+        self.backoff = mock.patch.object(
+            download_pdfs, "backoff_delay",
+            lambda attempt, retry_after=None: backoff_delay(attempt, retry_after, base=0.01))
+        self.backoff.start()
+
+    async def asyncTearDown(self):
+        self.backoff.stop()
+        await self.runner.cleanup()
+        shutil.rmtree(self.dest)
+
+    async def test_limiter_backs_off_and_recovers(self):
+        async with ClientSession() as client:
+            session = AdaptiveSession(client, 4, 10.0)
+            limiter = session.limiter(self.base)
+            windows = [limiter.window]
+            for _ in range(2):  # 429, then 503
+                with self.assertRaises(TransientError):
+                    await fetch_page_async(session, self.base + "/page.html")
+                windows.append(limiter.window)
+            self.assertEqual(windows, [2.0, 1.0, 1.0])
+            self.assertEqual(limiter.rate, 2.5)
+            for _ in range(30):
+                self.assertEqual(await fetch_page_async(session, self.base + "/page.html"), [])
+            self.assertEqual(limiter.rate, 10.0)
+            self.assertGreater(limiter.window, 2.0)
+            self.assertEqual(limiter.in_flight, 0)
+        self.assertEqual(session.telemetry.host(self.base)["statuses"], {"429": 1, "503": 1, "200": 30})
+
+    async def test_retries_then_retry_pass(self):
+        telemetry = CrawlTelemetry()
+        with self.assertLogs(level="ERROR") as logs:
+            await asyncio.wait_for(crawl_async(self.base + "/index.html", self.dest, max_concurrency=2,
+                                               per_host_concurrency=2, rate=100.0, max_retries=2,
+                                               telemetry=telemetry), 30)
+        # stubborn.pdf fails all max_retries + 1 attempts, is parked, and
+        # succeeds on the end-of-run retry pass
+        self.assertEqual(logs.output, ["ERROR:root:Giving up on {}/2020/stubborn.pdf for now: HTTP 503"
+                                       .format(self.base)])
+        self.assertEqual(self.hits, {"/index.html": 1, "/2020/flaky.pdf": 3, "/2020/stubborn.pdf": 4})
+        self.assertEqual(telemetry.host(self.base)["retries"], 4)
+        self.assertEqual(set(frontier_states(self.dest).values()), {"done"})
+        self.assertEqual(sorted(pdf_tree(self.dest)), ["2020/Flaky.pdf", "2020/Stubborn.pdf"])
+
+    async def test_exhausted_retries_stay_in_retry(self):
+        await asyncio.wait_for(crawl_async(self.base + "/index.html", self.dest, max_concurrency=2,
+                                           per_host_concurrency=2, rate=100.0, max_retries=2,
+                                           retry_passes=0), 30)
+        states = frontier_states(self.dest)
+        self.assertEqual(states[self.base + "/2020/stubborn.pdf"], "retry")
+        self.assertEqual(states[self.base + "/2020/flaky.pdf"], "done")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,112 +4,93 @@
 import json
 import os
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Dict
 
 import pandas as pd
 
 
+# A flow is "Source [amount] Target"; amounts may group thousands with commas ("1,234.5")
+FLOW_PATTERN = re.compile(r'^(.+?)\s*\[(-?(?:\d{1,3}(?:,\d{3})+(?:\.\d*)?|\d+\.?\d*|\.\d+))\]\s*(.+)$')
+# Any "Source [...] Target", to say why a line is not a flow
+BRACKETED_PATTERN = re.compile(r'^(.+?)\s*\[([^\]]*)\]\s*(.+)$')
+# Section headers: "// Tier 2 - Transportation", "// Tier 3 - Transportation"
+TIER_HEADER_PATTERN = re.compile(r'^//\s*Tier\s*(\d+)\s*-?\s*(.*)$')
+
+
 def parse_sankeymatic_txt(filepath: str) -> Dict[str, Any]:
     """
     Parse the sankeymatic.txt file to extract the hierarchical structure.
-    Returns a dict with 'revenue' and 'spending' tier-1 categories and their totals.
+    Returns a dict with 'revenue' and 'spending' tier-1 categories and their totals,
+    plus the flows under each "// Tier 2 - ..." and "// Tier 3 - ..." header.
+
+    Reads the file once, a line at a time. Tier-1 flows count wherever they are; other
+    flows belong to the section of the last tier header (tier-2 headers mentioning
+    Revenue open revenue sections). A bracketed line that is not a flow, or whose
+    amount is not a number (SankeyMATIC's "[*]" remainder included), is skipped and
+    reported under 'warnings' as "file:line: message".
     """
-    with open(filepath, 'r') as f:
-        content = f.read()
-
     result = {
         'revenue_tier1': [],
         'spending_tier1': [],
         'revenue_tier2': {},
         'spending_tier2': {},
-        'spending_tier3': {}
+        'spending_tier3': {},
+        'warnings': []
     }
 
-    # Parse tier-1 revenue items: "Category [amount] Revenue"
-    for line in content.split('\n'):
-        if '] Revenue' in line and not line.strip().startswith('//'):
-            match = re.match(r'^(.+?)\s*\[(-?[0-9.]+)\]\s*Revenue', line.strip())
-            if match:
-                category = match.group(1).strip()
-                amount = float(match.group(2))
-                result['revenue_tier1'].append({'name': category, 'amount': amount})
-
-    # Parse tier-1 spending items: "Spending [amount] Category"
-    for line in content.split('\n'):
-        if line.strip().startswith('Spending ['):
-            match = re.match(r'^Spending\s*\[(-?[0-9.]+)\]\s*(.+)$', line.strip())
-            if match:
-                amount = float(match.group(1))
-                category = match.group(2).strip()
-                result['spending_tier1'].append({'name': category, 'amount': amount})
-
-    # Parse tier-2 revenue items: "Item [amount] Category"
-    current_tier1_rev = None
-    for line in content.split('\n'):
-        line = line.strip()
-        if line.startswith('// Tier 2 -'):
-            # Extract the category name
-            current_tier1_rev = line.replace('// Tier 2 -', '').strip()
-            result['revenue_tier2'][current_tier1_rev] = []
-        elif current_tier1_rev and not line.startswith('//') and '[' in line and '] Revenue' not in line:
-            # Skip tier-1 lines and comments
-            if line.startswith('Spending ['):
-                current_tier1_rev = None
+    # Flows outside any section (before the first header, or under a tier-1 one) are skipped
+    section = None
+    items = None
+
+    with open(filepath, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+
+            if line.startswith('//'):
+                header = TIER_HEADER_PATTERN.match(line)
+                if header:
+                    tier, name = header.group(1), header.group(2).strip()
+                    if tier == '2' and 'Revenue' in line:
+                        section, items = 'revenue_tier2', result['revenue_tier2'].setdefault(name, [])
+                    elif tier == '2':
+                        section, items = 'spending_tier2', result['spending_tier2'].setdefault(name, [])
+                    elif tier == '3':
+                        section, items = 'spending_tier3', None
+                    else:
+                        section, items = None, None
+                continue
+
+            if '[' not in line:
+                continue
+            match = FLOW_PATTERN.match(line)
+            if not match:
+                bracketed = BRACKETED_PATTERN.match(line)
+                if not bracketed:
+                    problem = "malformed flow"
+                elif bracketed.group(2).strip() == '*':
+                    problem = "remainder amount [*] not supported"
+                else:
+                    problem = f"bad amount [{bracketed.group(2)}]"
+                result['warnings'].append(f"{filepath}:{line_number}: {problem}, skipped: {line}")
                 continue
-            match = re.match(r'^(.+?)\s*\[(-?[0-9.]+)\]\s*(.+)$', line)
-            if match:
-                item_name = match.group(1).strip()
-                amount = float(match.group(2))
-                category = match.group(3).strip()
-                result['revenue_tier2'][current_tier1_rev].append({
-                    'name': item_name,
-                    'amount': amount,
-                    'category': category
-                })
-
-    # Parse tier-2 spending items: "Category [amount] Item"
-    current_section = None
-    for line in content.split('\n'):
-        line = line.strip()
-        if line.startswith('// Tier 2 -') and 'Revenue' not in line:
-            current_section = line.replace('// Tier 2 -', '').strip()
-            result['spending_tier2'][current_section] = []
-        elif line.startswith('// Tier 3'):
-            current_section = None
-        elif current_section and not line.startswith('//') and '[' in line:
-            match = re.match(r'^(.+?)\s*\[(-?[0-9.]+)\]\s*(.+)$', line)
-            if match:
-                category = match.group(1).strip()
-                amount = float(match.group(2))
-                item_name = match.group(3).strip()
-                result['spending_tier2'][current_section].append({
-                    'name': item_name,
-                    'amount': amount,
-                    'category': category
-                })
-
-    # Parse tier-3 spending items: "Tier2Item [amount] LineItem (CODE)"
-    current_tier3_section = None
-    for line in content.split('\n'):
-        line = line.strip()
-        if line.startswith('// Tier 3'):
-            current_tier3_section = line.replace('// Tier 3 -', '').strip()
-        elif line.startswith('// Tier 2'):
-            current_tier3_section = None
-        elif current_tier3_section and not line.startswith('//') and '[' in line:
-            match = re.match(r'^(.+?)\s*\[(-?[0-9.]+)\]\s*(.+)$', line)
-            if match:
-                tier2_item = match.group(1).strip()
-                amount = float(match.group(2))
-                line_item = match.group(3).strip()
-
-                if tier2_item not in result['spending_tier3']:
-                    result['spending_tier3'][tier2_item] = []
-                result['spending_tier3'][tier2_item].append({
-                    'name': line_item,
-                    'amount': amount
-                })
+            source = match.group(1).strip()
+            amount = float(match.group(2).replace(',', ''))
+            target = match.group(3).strip()
+
+            if target == 'Revenue':
+                result['revenue_tier1'].append({'name': source, 'amount': amount})
+            elif source == 'Spending':
+                result['spending_tier1'].append({'name': target, 'amount': amount})
+            elif source == 'Revenue' and target == 'Spending':
+                # The link between the two halves of the diagram
+                continue
+            elif section == 'revenue_tier2':
+                items.append({'name': source, 'amount': amount, 'category': target})
+            elif section == 'spending_tier2':
+                items.append({'name': target, 'amount': amount, 'category': source})
+            elif section == 'spending_tier3':
+                result['spending_tier3'].setdefault(source, []).append({'name': target, 'amount': amount})
 
     return result
 
@@ -295,6 +276,16 @@ def sum_node(node: Dict[str, Any]) -> float:
     return float(node.get('amount', 0.0))
 
 
+def generated_at() -> str:
+    """
+    UTC build time for the summary, or SOURCE_DATE_EPOCH when it is set
+    (scripts/run_pipelines.py does), so unchanged inputs give identical files.
+    """
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    moment = datetime.fromtimestamp(int(epoch), timezone.utc) if epoch else datetime.now(timezone.utc)
+    return moment.replace(microsecond=0, tzinfo=None).isoformat() + 'Z'
+
+
 def slugify(value: str) -> str:
     slug = value.lower()
     slug = slug.replace('&', ' and ')
@@ -376,7 +367,7 @@ def generate_summary(
         'propertyTaxRevenue': property_tax_total,
         'propertyTaxRevenueFormatted': format_compact_currency(property_tax_total),
         'ministries': ministries,
-        'generatedAt': datetime.utcnow().replace(microsecond=0).isoformat() + 'Z',
+        'generatedAt': generated_at(),
     }
 
     return summary
@@ -391,6 +382,8 @@ def main():
     sankey_data = parse_sankeymatic_txt('2024_sankeymatic.txt')
     print(f"  Found {len(sankey_data['revenue_tier1'])} revenue tier-1 categories")
     print(f"  Found {len(sankey_data['spending_tier1'])} spending tier-1 categories")
+    for warning in sankey_data['warnings']:
+        print(f"  Warning: {warning}")
 
     # Load Excel data
     print("\nLoading Excel data...")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark flatten_single_chains: the old recursive version, which rewrote
+children in place, vs. the explicit-stack one that returns a new tree.
+
+    python scripts/bench_flatten_chains.py                  # 100k nodes, 20 levels
+    python scripts/bench_flatten_chains.py --nodes 10000 --levels 5000
+
+The synthetic tree has level widths growing geometrically to the node
+count, every node hung under a random node of the level above (so about
+half of the parents have a single child) and amounts on the leaves.
+The old version gets a fresh copy per run, since it changes its input.
+Nothing is read from disk, so it can run from anywhere.
+"""
+
+import argparse
+import random
+import sys
+import time
+from typing import List, Optional
+
+from create_compact_sankey import flatten_single_chains
+from sankey_tree import SEPARATOR, Labels, Node
+
+def recursive_flatten(node: Node, labels: Labels) -> Node:
+    """The recursive flatten_single_chains, as it was (mutates node.children)."""
+    if node.children is not None:
+        flattened_children = []
+        for child in node.children:
+            flattened_children.append(recursive_flatten(child, labels))
+
+        if len(flattened_children) == 1 and node.amount is None:
+            child = flattened_children[0]
+            if child.amount is not None:
+                node.children = flattened_children
+                return node
+            if child.children is not None:
+                meaningful_part = labels[child.label].split(SEPARATOR)[-1]
+                return Node(labels(meaningful_part), node, children=child.children)
+
+        node.children = flattened_children
+
+    return node
+
+def level_widths(nodes: int, levels: int) -> List[int]:
+    """Level sizes from 1 (the root) growing geometrically, summing to nodes."""
+    def total(ratio: float) -> float:
+        # Stops once past nodes, so deep trees don't overflow
+        width, sum_ = 1.0, 0.0
+        for _ in range(levels):
+            sum_ += width
+            width *= ratio
+            if sum_ > nodes:
+                break
+        return sum_
+
+    low, high = 1.0, 2.0
+    while total(high) < nodes:
+        high *= 2
+    for _ in range(60):
+        ratio = (low + high) / 2
+        if total(ratio) < nodes:
+            low = ratio
+        else:
+            high = ratio
+    widths = [max(1, round(ratio ** level)) for level in range(levels)]
+    widths[-1] += nodes - sum(widths)
+    return widths
+
+def synthetic_tree(nodes: int, levels: int, labels: Labels, seed: int = 0) -> Node:
+    rng = random.Random(seed)
+    root = Node(labels('Spending'))
+    previous = [root]
+    for depth, width in enumerate(level_widths(nodes, levels)[1:], start=1):
+        level = []
+        for i in range(width):
+            parent = previous[rng.randrange(len(previous))] if i >= len(previous) else previous[i]
+            node = Node(labels(f"L{depth}-{i}"), parent)
+            parent.children.append(node)
+            level.append(node)
+        previous = level
+    # Childless nodes become leaves
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.children:
+            stack.extend(node.children)
+        else:
+            node.children, node.amount = None, rng.randrange(1, 10**10)
+    return root
+
+def signature(root: Node) -> List[tuple]:
+    """Preorder (depth, label, amount, has children, name parent's label) of a tree."""
+    rows, stack = [], [(root, 0)]
+    while stack:
+        node, depth = stack.pop()
+        parent = node.parent.label if node.parent is not None else None
+        rows.append((depth, node.label, node.amount, node.children is not None, parent))
+        stack.extend((child, depth + 1) for child in reversed(node.children or ()))
+    return rows
+
+def count_nodes(root: Node) -> int:
+    count, stack = 0, [root]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children or ())
+    return count
+
+def shared_nodes(result: Node, original: Node) -> int:
+    """Nodes of result that are the input's own node objects."""
+    seen, stack = set(), [original]
+    while stack:
+        node = stack.pop()
+        seen.add(id(node))
+        stack.extend(node.children or ())
+    count, stack = 0, [result]
+    while stack:
+        node = stack.pop()
+        count += id(node) in seen
+        stack.extend(node.children or ())
+    return count
+
+def timed(fn, root: Node, labels: Labels, repeat: int):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(root, labels)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--nodes', type=int, default=100_000)
+    parser.add_argument('--levels', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per version (best is kept)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if not 1 <= args.levels <= args.nodes:
+        parser.error('--levels must be between 1 and --nodes')
+
+    labels = Labels()
+    root = synthetic_tree(args.nodes, args.levels, labels, args.seed)
+    before = signature(root)
+    print(f"Synthetic tree: {count_nodes(root):,} nodes, {args.levels} levels")
+
+    old_time: Optional[float] = float('inf')
+    old_tree = None
+    try:
+        for _ in range(args.repeat):
+            copy = synthetic_tree(args.nodes, args.levels, labels, args.seed)
+            start = time.perf_counter()
+            old_result = recursive_flatten(copy, labels)
+            old_time = min(old_time, time.perf_counter() - start)
+        old_tree = signature(old_result)
+    except RecursionError:
+        old_time = None
+    new_time, result = timed(flatten_single_chains, root, labels, args.repeat)
+    new_tree = signature(result)
+
+    unchanged = signature(root) == before
+    result_nodes = count_nodes(result)
+    print(f"  flattened: {result_nodes:,} nodes, {shared_nodes(result, root):,} shared with the input")
+    if old_time is None:
+        print(f"  recursive:  RecursionError (limit {sys.getrecursionlimit()})")
+    else:
+        print(f"  recursive:  {old_time:.3f}s")
+    print(f"  iterative:  {new_time:.3f}s")
+    print(f"  input unchanged: {'yes' if unchanged else 'NO'}")
+    if old_tree is not None:
+        print(f"  identical to recursive: {'yes' if old_tree == new_tree else 'NO'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Benchmark build_hierarchy_tree: the old nested per-level groupbys vs. the
+single sorted pass into a path trie.
+
+Run it from the Ontario directory after clean_public_accounts_2024.py:
+
+    python scripts/bench_hierarchy_tree.py                 # 1x, 10x, 100x rows
+    python scripts/bench_hierarchy_tree.py --scales 1 10
+
+Both sides are timed up to the JSON-ready tree, names and billions
+included. Larger scales repeat the 2024 rows under renamed ministries,
+so the tree grows in proportion. The groupby version takes minutes at 100x.
+"""
+
+import argparse
+import json
+import time
+from typing import Any, Dict
+
+import pandas as pd
+
+from clean_public_accounts_2024 import read_clean
+from sankey_tree import CENTS_PER_BILLION, Labels, to_json
+from transform_sankey_data import build_hierarchy_tree
+
+def to_billions(node: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy of a tree with its cent amounts converted to billions."""
+    return {
+        key: (value / CENTS_PER_BILLION if key == 'amount'
+              else [to_billions(child) for child in value] if key == 'children'
+              else value)
+        for key, value in node.items()
+    }
+
+def create_hierarchical_name(row: pd.Series, level: str) -> str:
+    """Create a unique hierarchical name based on the full path."""
+    parts = []
+    
+    if level == 'ministry':
+        return row['Ministry Name']
+    
+    parts.append(row['Ministry Name'])
+    
+    if level == 'program':
+        return f"{parts[0]} → {row['Program Name']}"
+    
+    parts.append(row['Program Name'])
+    
+    if level == 'activity' and pd.notna(row['Activity / Item']) and row['Activity / Item'] != '':
+        return f"{parts[0]} → {parts[1]} → {row['Activity / Item']}"
+    
+    if level == 'sub_item' and pd.notna(row['Sub Item']) and row['Sub Item'] != '':
+        if pd.notna(row['Activity / Item']) and row['Activity / Item'] != '':
+            return f"{parts[0]} → {parts[1]} → {row['Activity / Item']} → {row['Sub Item']}"
+        else:
+            return f"{parts[0]} → {parts[1]} → {row['Sub Item']}"
+    
+    if level == 'account':
+        path_parts = [parts[0], parts[1]]
+        
+        if pd.notna(row['Activity / Item']) and row['Activity / Item'] != '':
+            path_parts.append(row['Activity / Item'])
+        
+        if pd.notna(row['Sub Item']) and row['Sub Item'] != '':
+            path_parts.append(row['Sub Item'])
+        
+        # Add the account name
+        account_name = row['Standard Account (Expense/Asset Name)']
+        if pd.notna(row['Account Details (Expense/Asset Details)']) and row['Account Details (Expense/Asset Details)'] != '':
+            account_name = f"{account_name}: {row['Account Details (Expense/Asset Details)']}"
+        
+        path_parts.append(account_name)
+        return ' → '.join(path_parts)
+    
+    return row['Ministry Name']  # fallback
+
+def groupby_tree(df: pd.DataFrame) -> Dict[str, Any]:
+    """What build_hierarchy_tree used to do."""
+    
+    # Group by ministry
+    ministries = {}
+    
+    for ministry_name, ministry_group in df.groupby('Ministry Name', observed=True):
+        ministry_node = {
+            'name': ministry_name,
+            'children': []
+        }
+        
+        # Group by program within ministry
+        for program_name, program_group in ministry_group.groupby('Program Name', observed=True):
+            program_node = {
+                'name': create_hierarchical_name(program_group.iloc[0], 'program'),
+                'children': []
+            }
+            
+            # Group by activity within program
+            activity_groups = program_group.groupby(['Activity / Item'], dropna=False, observed=True)
+            
+            for activity_name, activity_group in activity_groups:
+                # Handle cases where Activity / Item might be NaN or empty
+                if pd.isna(activity_name) or activity_name == '' or activity_name == 'No Value':
+                    # No activity level, group by sub item
+                    sub_item_groups = activity_group.groupby(['Sub Item'], dropna=False, observed=True)
+                    
+                    for sub_item_name, sub_item_group in sub_item_groups:
+                        if pd.isna(sub_item_name) or sub_item_name == '' or sub_item_name == 'No Value':
+                            # No sub item level, go directly to accounts
+                            account_groups = sub_item_group.groupby(['Standard Account (Expense/Asset Name)', 'Account Details (Expense/Asset Details)'], dropna=False, observed=True)
+                            
+                            for (account_name, account_details), account_group in account_groups:
+                                account_node = {
+                                    'name': create_hierarchical_name(account_group.iloc[0], 'account'),
+                                    'amount': int(account_group['amount_cents'].sum())
+                                }
+                                program_node['children'].append(account_node)
+                        else:
+                            # Has sub item level
+                            sub_item_node = {
+                                'name': create_hierarchical_name(sub_item_group.iloc[0], 'sub_item'),
+                                'children': []
+                            }
+                            
+                            account_groups = sub_item_group.groupby(['Standard Account (Expense/Asset Name)', 'Account Details (Expense/Asset Details)'], dropna=False, observed=True)
+                            
+                            for (account_name, account_details), account_group in account_groups:
+                                account_node = {
+                                    'name': create_hierarchical_name(account_group.iloc[0], 'account'),
+                                    'amount': int(account_group['amount_cents'].sum())
+                                }
+                                sub_item_node['children'].append(account_node)
+                            
+                            program_node['children'].append(sub_item_node)
+                else:
+                    # Has activity level
+                    activity_node = {
+                        'name': create_hierarchical_name(activity_group.iloc[0], 'activity'),
+                        'children': []
+                    }
+                    
+                    # Group by sub item within activity
+                    sub_item_groups = activity_group.groupby(['Sub Item'], dropna=False, observed=True)
+                    
+                    for sub_item_name, sub_item_group in sub_item_groups:
+                        if pd.isna(sub_item_name) or sub_item_name == '' or sub_item_name == 'No Value':
+                            # No sub item level, go directly to accounts
+                            account_groups = sub_item_group.groupby(['Standard Account (Expense/Asset Name)', 'Account Details (Expense/Asset Details)'], dropna=False, observed=True)
+                            
+                            for (account_name, account_details), account_group in account_groups:
+                                account_node = {
+                                    'name': create_hierarchical_name(account_group.iloc[0], 'account'),
+                                    'amount': int(account_group['amount_cents'].sum())
+                                }
+                                activity_node['children'].append(account_node)
+                        else:
+                            # Has sub item level
+                            sub_item_node = {
+                                'name': create_hierarchical_name(sub_item_group.iloc[0], 'sub_item'),
+                                'children': []
+                            }
+                            
+                            account_groups = sub_item_group.groupby(['Standard Account (Expense/Asset Name)', 'Account Details (Expense/Asset Details)'], dropna=False, observed=True)
+                            
+                            for (account_name, account_details), account_group in account_groups:
+                                account_node = {
+                                    'name': create_hierarchical_name(account_group.iloc[0], 'account'),
+                                    'amount': int(account_group['amount_cents'].sum())
+                                }
+                                sub_item_node['children'].append(account_node)
+                            
+                            activity_node['children'].append(sub_item_node)
+                    
+                    program_node['children'].append(activity_node)
+            
+            ministry_node['children'].append(program_node)
+        
+        ministries[ministry_name] = ministry_node
+    
+    return {
+        'name': 'Spending',
+        'children': list(ministries.values())
+    }
+
+def groupby_json(df: pd.DataFrame) -> Dict[str, Any]:
+    return to_billions(groupby_tree(df))
+
+def trie_json(df: pd.DataFrame) -> Dict[str, Any]:
+    labels = Labels()
+    return to_json(build_hierarchy_tree(df, labels), labels)
+
+def scaled(df: pd.DataFrame, factor: int) -> pd.DataFrame:
+    """The rows repeated factor times, each copy under its own ministry names."""
+    df = df.astype({'Ministry Name': object})
+    copies = [df]
+    for i in range(2, factor + 1):
+        copy = df.copy()
+        copy['Ministry Name'] = copy['Ministry Name'] + f" ({i})"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+def best_of(fn, df: pd.DataFrame, repeat: int):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def count_nodes(node: Dict[str, Any]) -> int:
+    return 1 + sum(count_nodes(child) for child in node.get('children', []))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--expenses', default='clean_expenses_2024.csv')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--repeat', type=int, default=3, help='Runs of the trie builder per scale (best is kept)')
+    args = parser.parse_args()
+
+    base = read_clean(args.expenses)
+    print(f"{'rows':>9} {'nodes':>9} {'groupby':>10} {'trie':>10} {'speedup':>8}  identical")
+    for factor in args.scales:
+        df = scaled(base, factor)
+        old_time, old_tree = best_of(groupby_json, df, 1)
+        new_time, new_tree = best_of(trie_json, df, args.repeat)
+        identical = json.dumps(old_tree) == json.dumps(new_tree)
+        print(f"{len(df):>9,} {count_nodes(new_tree):>9,} {old_time:>9.2f}s {new_time:>9.3f}s "
+              f"{old_time / new_time:>7.0f}x  {'yes' if identical else 'NO'}")
+
+if __name__ == '__main__':
+    main()
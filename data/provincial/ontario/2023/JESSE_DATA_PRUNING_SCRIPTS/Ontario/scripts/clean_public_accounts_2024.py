@@ -1,78 +1,326 @@
 #!/usr/bin/env python3
 """
-Clean Ontario Public Accounts revenue and expense data for fiscal year 2024.
+Clean Ontario Public Accounts revenue and expense data, every fiscal year in one pass.
 
 • Revenue source: PublicAccountsPDFs/2024/tbs-public-accounts-annual-report-revenue-by-source-2023-24-en-fr.csv
 • Expense source: PublicAccountsPDFs/2024/f4801adb-b00a-4798-9802-005231e275ee (1).json
 
-Outputs (overwritten each run):
-  clean_revenue_2024.csv   – columns: revenue_type,revenue_detail,amount_dollars
-  clean_expenses_2024.csv  – flattened hierarchy with columns described below
+Outputs (overwritten each run), partitioned by fiscal year:
+  clean_revenue/year=<fy>/data.csv   – columns: revenue_type,revenue_detail,amount_dollars,amount_cents
+  clean_expenses/year=<fy>/data.csv  – flattened hierarchy with columns described below
+plus clean_revenue_2024.csv / clean_expenses_2024.csv, the 2023-24 partitions
+under the names the Sankey builders read. With pyarrow installed each CSV
+also gets a .parquet twin (see read_clean), which the builders load instead.
 
-Both outputs live in the same directory as this script (repository root level).
+Amounts are parsed a column at a time to exact integer cents
+(amount_cents); amount_dollars is the same value as a dollar string.
+
+Each input is read once however many years it holds; --years limits the
+partitions written. All outputs live at repository root level.
 """
+import argparse
 import csv
-import decimal
 import json
+import re
 from pathlib import Path
 
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet copies are optional; the CSVs are always written
+    pa = pq = None
+
 ROOT = Path(__file__).resolve().parent.parent  # repo root
 REV_PATH = ROOT / "PublicAccountsPDFs/2024/tbs-public-accounts-annual-report-revenue-by-source-2023-24-en-fr.csv"
 EXP_PATH = ROOT / "PublicAccountsPDFs/2024/f4801adb-b00a-4798-9802-005231e275ee (1).json"
 
 OUT_REV = ROOT / "clean_revenue_2024.csv"
 OUT_EXP = ROOT / "clean_expenses_2024.csv"
+PART_REV = ROOT / "clean_revenue"
+PART_EXP = ROOT / "clean_expenses"
+LEGACY_YEAR = "2023-24"  # the year OUT_REV / OUT_EXP hold
+
+CHUNK_SIZE = 1 << 16  # characters read per step when streaming the expense JSON
+BATCH_SIZE = 50_000  # rows cleaned per vectorized batch
+NULL_AMOUNTS = ["", "-", "–", "—", "No Value"]
+
+def amounts_to_cents(values, *, millions: bool) -> pd.Series:
+    """Parse a whole column of amount strings to exact int64 cents.
+
+    Thousands separators are ignored; blanks, dashes, "No Value" and
+    anything unparseable become <NA>. Millions (the revenue file) are
+    scaled by shifting the decimal point, so no value goes through float.
+    Digits beyond a cent are rounded half away from zero.
+    """
+    txt = pd.Series(values, dtype="string").str.replace(",", "", regex=False).str.strip()
+    txt = txt.mask(txt.isin(NULL_AMOUNTS))
+    parts = txt.str.extract(r"^([-+]?)(\d*)(?:\.(\d*))?$")
+    valid = parts[1].notna() & (parts[1].fillna("") + parts[2].fillna("") != "")
+    places = 8 if millions else 2  # decimal places that are still whole cents
+    whole = parts[1].where(valid, "0").replace("", "0").astype("int64")
+    frac = parts[2].where(valid, "").fillna("")
+    kept = frac.str[:places].str.pad(places, side="right", fillchar="0").astype("int64")
+    round_up = frac.str[places:places + 1].str.match(r"[5-9]").fillna(False).astype("int64")
+    cents = whole * 10 ** places + kept + round_up
+    cents = cents.where(parts[0] != "-", -cents)
+    return cents.astype("Int64").mask(~valid)
+
+def cents_to_dollars(cents: pd.Series) -> pd.Series:
+    """Exact dollar strings for int cents: "1234" or "-12.05"."""
+    sign = cents.lt(0).map({True: "-", False: ""})
+    dollars, rem = cents.abs().floordiv(100), cents.abs().mod(100)
+    frac = ("." + rem.astype(str).str.zfill(2)).where(rem != 0, "")
+    return sign + dollars.astype(str) + frac
+
+def fiscal_year(value) -> str:
+    """Normalise "2023-24", "23-24", "2023–2024" etc. to "2023-24"."""
+    txt = str(value).strip()
+    m = re.search(r"(\d{2}|\d{4})\s*[-–/]\s*(\d{2}|\d{4})$", txt)
+    if not m:
+        return txt
+    start = int(m.group(1))
+    if start < 100:
+        start += 2000
+    return f"{start}-{(start + 1) % 100:02d}"
+
+class YearPartitions:
+    """Outputs for <base>/year=<fy>/data.csv (+ data.parquet), opened as each year first appears.
+
+    Rows for LEGACY_YEAR are also written to the single-year file the
+    downstream scripts read. Years outside `years` (when given) are dropped.
+    The Parquet files hold the text columns dictionary-encoded (blanks as
+    nulls, as pd.read_csv would give them) and amount_cents as int64.
+    """
+
+    def __init__(self, base: Path, header: list[str], legacy: Path, years: set[str] | None = None):
+        self.base = base
+        self.header = header
+        self.legacy = legacy
+        self.years = years
+        self.text_cols = [col for col in header if not col.startswith("amount_")]
+        self.files: dict[str, list] = {}
+        self.tables: dict[str, list] = {}
+        self.counts: dict[str, int] = {}
+
+    def open(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        f = path.open("w", newline="", encoding="utf-8")
+        csv.writer(f).writerow(self.header)
+        return f
+
+    def schema(self):
+        return pa.schema([*(pa.field(col, pa.dictionary(pa.int32(), pa.string())) for col in self.text_cols),
+                          pa.field("amount_cents", pa.int64())])
+
+    def columnar(self, frame: pd.DataFrame):
+        arrays = [pa.array(frame[col].mask(frame[col] == "", None), type=pa.string()).dictionary_encode()
+                  for col in self.text_cols]
+        arrays.append(pa.array(frame["amount_cents"].astype("int64"), type=pa.int64()))
+        return pa.Table.from_arrays(arrays, schema=self.schema())
+
+    def write(self, fy: str, frame: pd.DataFrame) -> None:
+        files = self.files.get(fy)
+        if files is None:
+            if self.years is not None and fy not in self.years:
+                return
+            paths = [self.base / f"year={fy}" / "data.csv"]
+            if fy == LEGACY_YEAR:
+                paths.append(self.legacy)
+            files = self.files[fy] = [self.open(path) for path in paths]
+            if pq is not None:
+                self.tables[fy] = [pq.ParquetWriter(path.with_suffix(".parquet"), self.schema()) for path in paths]
+            self.counts[fy] = 0
+        for f in files:
+            frame.to_csv(f, header=False, index=False, lineterminator="\r\n")
+        if fy in self.tables:
+            table = self.columnar(frame)
+            for writer in self.tables[fy]:
+                writer.write_table(table)
+        self.counts[fy] += len(frame)
+
+    def write_batch(self, years: pd.Series, frame: pd.DataFrame) -> None:
+        for fy, group in frame.groupby(years, sort=False):
+            self.write(fy, group)
+
+    def close(self, what: str) -> None:
+        for files in self.files.values():
+            for f in files:
+                f.close()
+        # After the CSVs, so read_clean sees the Parquet file as current
+        for writers in self.tables.values():
+            for writer in writers:
+                writer.close()
+        for fy, n in sorted(self.counts.items()):
+            print(f"Wrote {n} {what} rows to {(self.base / f'year={fy}').relative_to(ROOT)}")
+        if LEGACY_YEAR in self.counts:
+            print(f"Wrote {self.counts[LEGACY_YEAR]} {what} rows to {self.legacy.relative_to(ROOT)}")
+        if pq is None and self.counts:
+            print("pyarrow is not installed; skipped the Parquet copies")
+
+def read_clean(csv_path: Path | str) -> pd.DataFrame:
+    """Load a table this script wrote, for the Sankey builders.
+
+    Prefers the Parquet copy next to the CSV: it is memory-mapped, the
+    text columns come back as categoricals straight from their
+    dictionaries (sorted, so groupby order matches the CSV), and nothing
+    is re-parsed or type-inferred. Falls back to the CSV when pyarrow or
+    a current Parquet file is missing.
+    """
+    csv_path = Path(csv_path)
+    parquet = csv_path.with_suffix(".parquet")
+    if pq is not None and parquet.exists() and (
+            not csv_path.exists() or parquet.stat().st_mtime >= csv_path.stat().st_mtime):
+        df = pq.read_table(parquet, memory_map=True).to_pandas()
+        for col in df.select_dtypes("category"):
+            df[col] = df[col].cat.reorder_categories(sorted(df[col].cat.categories))
+        return df
+    return pd.read_csv(csv_path, dtype={"amount_cents": "int64"})
 
-def clean_amount(value: str, *, millions: bool) -> decimal.Decimal | None:
-    """Return Decimal dollars (not millions) or None if blank/dash."""
-    if value is None:
-        return None
-    txt = str(value).replace(",", "").strip()
-    # Handle blanks, em dashes, etc.
-    if txt in {"", "-", "–", "—", "- ", " - "}:  # includes nbspace dash
-        return None
+def fiscal_years(values: pd.Series) -> pd.Series:
+    """fiscal_year over a column, computed once per distinct value."""
+    return values.map({v: fiscal_year(v) for v in values.unique()})
+
+def with_amounts(frame: pd.DataFrame, cents: pd.Series) -> pd.DataFrame:
+    """Append amount_dollars and amount_cents, dropping rows without an amount."""
+    keep = cents.notna()
+    frame = frame[keep].copy()
+    frame["amount_dollars"] = cents_to_dollars(cents[keep])
+    frame["amount_cents"] = cents[keep]
+    return frame
+
+def clean_revenue(years: set[str] | None = None):
+    parts = YearPartitions(PART_REV, ["revenue_type", "revenue_detail", "amount_dollars", "amount_cents"],
+                           OUT_REV, years)
     try:
-        amt = decimal.Decimal(txt)
-        if millions:
-            amt *= 1_000_000
-        return amt
-    except decimal.InvalidOperation:
-        return None
-
-def clean_revenue():
-    rows: list[tuple[str, str, decimal.Decimal]] = []
-    with REV_PATH.open(newline="", encoding="utf-8-sig") as f:
-        reader = csv.DictReader(f)
-        # Identify the amount column (contains 'Amount' in header)
-        amount_col = next((h for h in reader.fieldnames if 'Amount' in h), None)
-        if amount_col is None:
-            raise RuntimeError('Could not locate amount column in revenue CSV.')
-        for r in reader:
-            fy = r["Year/Année"].strip()
-            if fy not in {"2023-24", "23-24"} and not fy.endswith("23-24"):
-                continue  # skip non-2024 years
-            amt = clean_amount(r[amount_col], millions=True)
-            if amt is None:
+        batches = pd.read_csv(REV_PATH, dtype=str, keep_default_na=False, encoding="utf-8-sig",
+                              chunksize=BATCH_SIZE)
+        for batch in batches:
+            # Identify the amount column (contains 'Amount' in header)
+            amount_col = next((h for h in batch.columns if 'Amount' in h), None)
+            if amount_col is None:
+                raise RuntimeError('Could not locate amount column in revenue CSV.')
+            frame = pd.DataFrame({
+                "revenue_type": batch["Revenue type"].str.strip(),
+                "revenue_detail": batch["Revenue type details"].str.strip(),
+            })
+            frame = with_amounts(frame, amounts_to_cents(batch[amount_col], millions=True))
+            parts.write_batch(fiscal_years(batch.loc[frame.index, "Year/Année"]), frame)
+    finally:
+        parts.close("revenue")
+
+class JsonStream:
+    """Incremental reader over JSON text, decoding one value at a time.
+
+    Only what walking a CKAN dump needs: punctuation and whole values.
+    The buffer holds one pending value plus one read chunk, so memory
+    does not grow with the size of the file.
+    """
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ("" at end of input)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        ch = self.peek()
+        if not ch or ch not in chars:
+            raise ValueError(f"Expected one of {chars!r} at offset {self.pos}, found {ch!r}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                val, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.eof or not self.fill():
+                    raise
+                continue
+            # A number ending exactly at the buffer edge may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self.fill():
                 continue
-            rev_type = r["Revenue type"].strip()
-            rev_detail = r["Revenue type details"].strip()
-            rows.append((rev_type, rev_detail, amt))
-
-    # write cleaned CSV
-    with OUT_REV.open("w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["revenue_type", "revenue_detail", "amount_dollars"])
-        for row in rows:
-            w.writerow(row)
-    print(f"Wrote {len(rows)} revenue rows to {OUT_REV.relative_to(ROOT)}")
-
-def clean_expenses():
-    data = json.loads(EXP_PATH.read_text(encoding="utf-8"))
-    headers = [fld["id"] for fld in data["fields"]]
-    idx_year = headers.index("Year")
-    idx_amt = headers.index("Amount $")
-
-    # We'll keep the remaining columns as part of hierarchy.
+            self.pos = end
+            return val
+
+    def array(self):
+        """Yields the elements of the array starting here, one at a time."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+    def keys(self):
+        """Walks an object, yielding each key; the caller must consume its value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.expect(",}") == "}":
+                return
+
+def read_ckan_dump(f):
+    """Return (field ids, record iterator) for a CKAN datastore dump.
+
+    The dump is {"fields": [{"id": ...}, ...], "records": [[...], ...]}
+    (records may also be objects keyed by field id). Records are decoded
+    lazily as the iterator is consumed.
+    """
+    stream = JsonStream(f)
+    keys = stream.keys()
+    headers = None
+    for key in keys:
+        if key == "fields":
+            headers = [fld["id"] for fld in stream.value()]
+        elif key == "records":
+            if headers is None:
+                raise RuntimeError('Expense JSON lists "records" before "fields".')
+            break
+        else:
+            stream.value()
+    else:
+        raise RuntimeError('Expense JSON has no "records" array.')
+
+    def records():
+        for rec in stream.array():
+            yield [rec.get(h) for h in headers] if isinstance(rec, dict) else rec
+        for _ in keys:  # trailing keys, if any
+            stream.value()
+
+    return headers, records()
+
+def clean_expenses(years: set[str] | None = None):
+    # Kept columns form the hierarchy, in order.
     kept_cols = [
         "Ministry Name",
         "Expenditure Category (Operating / Capital)",
@@ -82,36 +330,41 @@ def clean_expenses():
         "Standard Account (Expense/Asset Name)",
         "Account Details (Expense/Asset Details)",
     ]
-    idx_map = {col: headers.index(col) for col in kept_cols}
-
-    cleaned_rows: list[list[str | decimal.Decimal]] = []
-    for rec in data["records"]:
-        fy = rec[idx_year]
-        if fy != "2023-24":
-            continue
-        amt = clean_amount(rec[idx_amt], millions=False)
-        if amt is None:
-            continue
-        path_vals = []
-        for col in kept_cols:
-            val = rec[idx_map[col]]
-            if isinstance(val, str):
-                val = val.strip()
-                if val in {"", "No Value"}:
-                    val = ""
-            path_vals.append(val)
-        cleaned_rows.append(path_vals + [amt])
-
-    with OUT_EXP.open("w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow([*kept_cols, "amount_dollars"])
-        w.writerows(cleaned_rows)
-    print(f"Wrote {len(cleaned_rows)} expense rows to {OUT_EXP.relative_to(ROOT)}")
+    parts = YearPartitions(PART_EXP, [*kept_cols, "amount_dollars", "amount_cents"], OUT_EXP, years)
+    # Stream records from the dump and clean them a batch at a time, so
+    # memory stays flat on the multi-year full dumps (hundreds of MB).
+    try:
+        with EXP_PATH.open(encoding="utf-8") as src:
+            headers, records = read_ckan_dump(src)
+            cols = ["Year", "Amount $", *kept_cols]
+            idx = [headers.index(col) for col in cols]
+            batch: list[list] = []
+            for rec in records:
+                batch.append([rec[i] for i in idx])
+                if len(batch) == BATCH_SIZE:
+                    clean_expense_batch(pd.DataFrame(batch, columns=cols, dtype=object), kept_cols, parts)
+                    batch = []
+            if batch:
+                clean_expense_batch(pd.DataFrame(batch, columns=cols, dtype=object), kept_cols, parts)
+    finally:
+        parts.close("expense")
+
+def clean_expense_batch(batch: pd.DataFrame, kept_cols: list[str], parts: YearPartitions) -> None:
+    frame = pd.DataFrame(index=batch.index)
+    for col in kept_cols:
+        val = batch[col].astype("string").str.strip()
+        frame[col] = val.mask(val == "No Value", "")
+    frame = with_amounts(frame, amounts_to_cents(batch["Amount $"], millions=False))
+    parts.write_batch(fiscal_years(batch.loc[frame.index, "Year"]), frame)
 
 
 def main():
-    clean_revenue()
-    clean_expenses()
+    parser = argparse.ArgumentParser(description="Clean Ontario Public Accounts revenue and expenses.")
+    parser.add_argument("--years", nargs="*", help="Fiscal years to write, e.g. 2023-24 (default: all)")
+    args = parser.parse_args()
+    years = {fiscal_year(y) for y in args.years} if args.years else None
+    clean_revenue(years)
+    clean_expenses(years)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
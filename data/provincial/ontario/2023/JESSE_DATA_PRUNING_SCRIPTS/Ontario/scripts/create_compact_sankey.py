@@ -2,111 +2,92 @@
 """
 Create an ultra-compact Sankey that flattens single-child chains and removes
 unnecessary hierarchy levels. Focus on meaningful government spending patterns.
+
+Programs under $50M and items under $10M are folded into "Other Programs"
+and "Other". Instead of those fixed thresholds, the spending tree can be
+sized to a node budget, and the thresholds are found for it:
+
+    python create_compact_sankey.py --budget 400
+    python create_compact_sankey.py --program-budget 60 --item-budget 300
+
+A total budget scales both thresholds together (keeping programs at 5x
+items); per-level budgets cap the number of program nodes and item nodes
+separately. Either way a table of node counts against thresholds is
+printed next to the choice.
 """
 
+import argparse
 import pandas as pd
-import json
 import sys
-from typing import Dict, List, Any
-
-# Categories to consolidate into "Operations"
-OPERATIONAL_CATEGORIES = {
-    'Salaries and wages',
-    'Employee benefits', 
-    'Transportation and communication',
-    'Services',
-    'Supplies and equipment',
-    'Recoveries',
-    'Other transactions',
-    'Amortization',
-    'Bad Debt Expense'
-}
-
-# NEW – keywords that indicate Treasury interest-on-debt payments.
-INTEREST_KEYWORDS = {
-    'interest on',        # Interest on Ontario Securities, etc.
-    'interest capitalized',
-    'interest payable'
-}
-
-def should_consolidate_category(account_name: str, account_details: str) -> bool:
-    """Determine if this should be consolidated into Operations."""
-    
-    # Check if it's in our operational categories
-    for op_cat in OPERATIONAL_CATEGORIES:
-        if op_cat.lower() in account_name.lower():
-            # SPECIAL-CASE: if this "Other transactions" bucket is actually an
-            # interest-on-debt line (Treasury Program), keep it separate so it
-            # doesn't get merged into the generic Operations node.
-            if op_cat.lower() == 'other transactions' and pd.notna(account_details):
-                details_lc = account_details.lower()
-                if any(k in details_lc for k in INTEREST_KEYWORDS):
-                    return False  # treat as substantive, NOT operational
-            return True
-    
-    # Keep substantive program spending separate
-    if 'transfer payments' in account_name.lower():
-        return False
-        
-    if account_name.lower() in ['capital expense', 'capital']:
-        return False
-        
-    # Check account details for specific programs/grants
-    if pd.notna(account_details) and account_details != '':
-        details_lower = account_details.lower()
-        if any(keyword in details_lower for keyword in [
-            'program', 'grant', 'fund', 'transfer', 'payment', 
-            'subsidy', 'benefit', 'insurance', 'pension'
-        ]):
-            return False
-    
-    return True
+from typing import Callable, Dict, List, Tuple
 
-def flatten_single_chains(node: Dict[str, Any]) -> Dict[str, Any]:
-    """Recursively flatten chains where a node has only one child."""
-    
-    if 'children' in node:
-        # First, recursively flatten all children
-        flattened_children = []
-        for child in node['children']:
-            flattened_child = flatten_single_chains(child)
-            flattened_children.append(flattened_child)
-        
-        # If this node has exactly one child and no amount, merge with child
-        if len(flattened_children) == 1 and 'amount' not in node:
-            child = flattened_children[0]
-            
-            # If child has an amount, it's a terminal node - keep the chain
-            if 'amount' in child:
-                node['children'] = flattened_children
-                return node
-            
-            # If child also has children, we can potentially flatten
-            if 'children' in child:
-                # Create a flattened node that combines names
-                child_name = child['name']
-                # Extract the meaningful part after the arrow
-                if ' → ' in child_name:
-                    parts = child_name.split(' → ')
-                    # Use the last meaningful part
-                    meaningful_part = parts[-1]
-                    
-                    # If it's just "Operations", keep the parent context
-                    if meaningful_part == 'Operations':
-                        flattened_name = f"{node['name']} → Operations"
-                    else:
-                        flattened_name = f"{node['name']} → {meaningful_part}"
-                else:
-                    flattened_name = f"{node['name']} → {child_name}"
-                
-                return {
-                    'name': flattened_name,
-                    'children': child.get('children', [])
-                }
-        
-        node['children'] = flattened_children
-    
-    return node
+import numpy as np
+
+from sankey_tree import CENTS_PER_BILLION, SEPARATOR, Labels, Node
+from spending_model import SpendingModel, spending_by_program, write_sankey
+
+OUTPUT_FILE = 'public/data/sankey_2024_compact.json'
+
+# Layer thresholds, in cents
+PROGRAM_THRESHOLD = 50_000_000 * 100  # $50M
+ITEM_THRESHOLD = 10_000_000 * 100     # $10M
+
+# What keeps two of a program's spending items apart
+ITEM_KEYS = ['operational', 'category', 'Expenditure Category (Operating / Capital)', 'Activity / Item', 'Sub Item']
+
+# Thresholds listed in the node count table: $100K to $5B in 1-2-5 steps
+TABLE_THRESHOLDS = [m * 10**e * 100 for e in range(5, 10) for m in (1, 2, 5)]
+
+def format_threshold(cents: int) -> str:
+    """$50M as '50M', $2.5B as '2.5B'."""
+    dollars = cents / 100
+    for unit, size in (('B', 10**9), ('M', 10**6), ('K', 10**3)):
+        if abs(dollars) >= size:
+            return f"{dollars / size:.4g}{unit}"
+    return f"{dollars:.4g}"
+
+def flatten_single_chains(root: Node, labels: Labels) -> Node:
+    """Flatten chains where a node has only one child.
+
+    A node without an amount whose only child has children of its own is
+    replaced by one node named after it plus the last part of the child's
+    name, holding the child's children. Returns a new tree and leaves the
+    input as it is: nodes whose subtrees need no change are shared with
+    the input rather than copied. Children are done before their parent
+    with an explicit stack, so any depth works.
+    """
+    # Nodes with children in preorder, from an explicit stack; walked
+    # backwards, children come before their parents. Leaves never change.
+    order = []
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.children:
+            order.append(node)
+            stack.extend(node.children)
+
+    # Nodes that change, with what replaces them; the rest are kept
+    flattened: Dict[Node, Node] = {}
+    replacement = flattened.get
+    for node in reversed(order):
+        children = [replacement(child, child) for child in node.children]
+
+        # If this node has exactly one child and no amount, merge with child,
+        # unless the child is a terminal node (has an amount)
+        if len(children) == 1 and node.amount is None:
+            child = children[0]
+            if child.amount is None and child.children is not None:
+                # The merged node is named after this one plus the last
+                # part of the child's name (which the child's label ends with)
+                meaningful_part = labels[child.label].split(SEPARATOR)[-1]
+                flattened[node] = Node(labels(meaningful_part), node, children=child.children)
+                continue
+
+        # Lists of nodes compare by identity
+        if children != node.children:
+            flattened[node] = Node(node.label, node.parent, children=children, amount=node.amount)
+
+    return flattened.get(root, root)
 
 def clean_program_name(ministry: str, program: str) -> str:
     """Clean up program names to remove redundancy."""
@@ -122,89 +103,57 @@ def clean_program_name(ministry: str, program: str) -> str:
     
     return program
 
-def build_compact_hierarchy(df: pd.DataFrame) -> Dict[str, Any]:
+def build_compact_hierarchy(df: pd.DataFrame, labels: Labels, program_threshold: int = PROGRAM_THRESHOLD,
+                            item_threshold: int = ITEM_THRESHOLD) -> Node:
     """Build a compact hierarchy with layer-specific thresholds."""
     
     print("Building ultra-compact spending hierarchy with layer-specific thresholds...")
-    print("   • Layer 2 (Programs): 50M threshold")
-    print("   • Layer 3 (Items): 10M threshold")
+    print(f"   • Layer 2 (Programs): {format_threshold(program_threshold)} threshold")
+    print(f"   • Layer 3 (Items): {format_threshold(item_threshold)} threshold")
     
     ministries = {}
     
-    for ministry_name, ministry_group in df.groupby('Ministry Name'):
+    for ministry_name, programs in spending_by_program(df, ITEM_KEYS, dropna_programs=False):
+        ministry_node = Node(labels(ministry_name))
         ministry_programs = {}
         
-        # Group by program within ministry
-        for program_name, program_group in ministry_group.groupby('Program Name', dropna=False):
+        # Programs within ministry, their spending already summed per item
+        for program_name, rows in programs:
             
-            # Separate operational vs substantive spending
+            # Separate operational vs substantive spending; rows are distinct
+            # by category, expenditure category, activity and sub item, so
+            # operating and capital spending stay apart
             operational_total = 0
-            substantive_categories = {}
+            substantive_categories = []
             
-            for _, row in program_group.iterrows():
-                account_name = row['Standard Account (Expense/Asset Name)']
-                account_details = row['Account Details (Expense/Asset Details)']
-                expenditure_category = row['Expenditure Category (Operating / Capital)']
-                activity = row['Activity / Item']
-                sub_item = row['Sub Item']
-                amount = float(row['amount_dollars']) / 1e9
-                
-                if should_consolidate_category(account_name, account_details):
+            for operational, category_name, _, _, _, amount in rows:
+                if operational:
                     operational_total += amount
                 else:
                     # This is substantive program spending
-                    if 'transfer payments' in account_name.lower() and pd.notna(account_details) and account_details != '':
-                        category_name = account_details
-                    elif pd.notna(account_details) and account_details != '':
-                        category_name = f"{account_name}: {account_details}"
-                    else:
-                        category_name = account_name
-                    
-                    # Create unique key to avoid merging distinct spending items
-                    # Include expenditure category and activity to distinguish operating vs capital
-                    unique_key = f"{category_name}|{expenditure_category}|{activity}|{sub_item}"
-                    
-                    # Aggregate amounts only for truly identical categories
-                    if unique_key in substantive_categories:
-                        substantive_categories[unique_key]['amount'] += amount
-                    else:
-                        substantive_categories[unique_key] = {
-                            'name': category_name,
-                            'amount': amount,
-                            'expenditure_category': expenditure_category,
-                            'activity': activity,
-                            'sub_item': sub_item
-                        }
+                    substantive_categories.append((category_name, amount))
             
             # Clean program name (handle NaN program names)
             if pd.isna(program_name):
                 clean_prog_name = f"{ministry_name} (Unspecified Program)"
             else:
                 clean_prog_name = clean_program_name(ministry_name, program_name)
+            program_node = Node(labels(clean_prog_name), ministry_node)
             
-            # Create program spending items with Layer 3 threshold (10M = 0.01B)
+            # Create program spending items with the Layer 3 threshold
             program_items = []
             
             # Always add operational spending (don't filter by threshold)
             if operational_total != 0:
-                program_items.append({
-                    'name': f"{ministry_name} → {clean_prog_name} → Operations",
-                    'amount': operational_total
-                })
+                program_items.append(Node(labels('Operations'), program_node, amount=operational_total))
             
-            # Separate substantive spending into major and minor categories (10M threshold)
+            # Separate substantive spending into major and minor categories
             major_categories = []
             minor_categories_total = 0
             
-            for unique_key, category_data in substantive_categories.items():
-                category_name = category_data['name']
-                amount = category_data['amount']
-                
-                if amount >= 0.01:  # $10M threshold for Layer 3
-                    major_categories.append({
-                        'name': f"{ministry_name} → {clean_prog_name} → {category_name}",
-                        'amount': amount
-                    })
+            for category_name, amount in substantive_categories:
+                if amount >= item_threshold:  # Layer 3
+                    major_categories.append(Node(labels(category_name), program_node, amount=amount))
                 else:
                     # Accumulate sub-$10M expenses
                     minor_categories_total += amount
@@ -214,215 +163,323 @@ def build_compact_hierarchy(df: pd.DataFrame) -> Dict[str, Any]:
             
             # Add "Other" category for sub-$10M expenses if there are any
             if minor_categories_total > 0:
-                program_items.append({
-                    'name': f"{ministry_name} → {clean_prog_name} → Other",
-                    'amount': minor_categories_total
-                })
+                program_items.append(Node(labels('Other'), program_node, amount=minor_categories_total))
             
             # Only keep programs with meaningful spending
             if program_items:
-                ministry_programs[clean_prog_name] = program_items
+                program_node.children = program_items
+                ministry_programs[clean_prog_name] = program_node
         
-        # Apply Layer 2 threshold (50M = 0.05B) to programs within each ministry
+        # Apply the Layer 2 threshold to programs within each ministry
         major_programs = []
         minor_programs_total = 0
         minor_programs_items = []
         
-        for program_name, program_items in ministry_programs.items():
+        for program_name, program_node in ministry_programs.items():
             # Calculate total spending for this program
-            program_total = sum(item['amount'] for item in program_items)
+            program_total = sum(item.amount for item in program_node.children)
             
-            if program_total >= 0.05:  # $50M threshold for Layer 2
+            if program_total >= program_threshold:  # Layer 2
                 # Keep this as a major program
-                major_programs.append({
-                    'name': f"{ministry_name} → {program_name}",
-                    'children': program_items
-                })
+                major_programs.append(program_node)
             else:
                 # Accumulate as minor program
                 minor_programs_total += program_total
-                # Collect all items from minor programs for grouping
-                minor_programs_items.extend(program_items)
+                # Collect all items from minor programs for grouping; they
+                # keep their program in their names
+                minor_programs_items.extend(program_node.children)
         
         # Handle ministry structure based on number of major programs
         if len(major_programs) == 0:
             # All programs are small - group everything under ministry
             if minor_programs_items:
-                ministries[ministry_name] = {
-                    'name': ministry_name,
-                    'children': minor_programs_items
-                }
+                ministry_node.children = minor_programs_items
+                ministries[ministry_name] = ministry_node
         elif len(major_programs) == 1 and minor_programs_total == 0:
             # Only one major program, no minor programs - check for flattening
             program_node = major_programs[0]
-            program_name = program_node['name'].split(' → ')[-1]
+            program_name = labels[program_node.label].split(SEPARATOR)[-1]
             
             if program_name.lower() in ['ministry administration', 'administration', 'main program']:
-                # Flatten administrative programs
-                ministries[ministry_name] = {
-                    'name': ministry_name,
-                    'children': [
-                        {
-                            'name': item['name'].replace(f" → {program_name}", ""),
-                            'amount': item['amount']
-                        }
-                        for item in program_node['children']
-                    ]
-                }
+                # Flatten administrative programs: items are named straight
+                # after the ministry
+                ministry_node.children = [
+                    Node(item.label, ministry_node, amount=item.amount)
+                    for item in program_node.children
+                ]
             else:
                 # Keep the program structure
-                ministries[ministry_name] = {
-                    'name': ministry_name,
-                    'children': [program_node]
-                }
+                ministry_node.children = [program_node]
+            ministries[ministry_name] = ministry_node
         else:
             # Multiple major programs or mix of major and minor
             children = major_programs.copy()
             
             # Add "Other Programs" if we have minor programs
             if minor_programs_total > 0:
-                children.append({
-                    'name': f"{ministry_name} → Other Programs",
-                    'children': minor_programs_items
-                })
+                children.append(Node(labels('Other Programs'), ministry_node, children=minor_programs_items))
             
-            ministries[ministry_name] = {
-                'name': ministry_name,
-                'children': children
-            }
+            ministry_node.children = children
+            ministries[ministry_name] = ministry_node
     
     # Build the final structure and flatten chains
-    spending_root = {
-        'name': 'Spending',
-        'children': list(ministries.values())
-    }
+    spending_root = Node(labels('Spending'), children=list(ministries.values()))
     
     # Apply chain flattening
-    flattened_root = flatten_single_chains(spending_root)
+    flattened_root = flatten_single_chains(spending_root, labels)
     
     return flattened_root
 
-def create_compact_revenue(df: pd.DataFrame) -> Dict[str, Any]:
+class NodeBudget:
+    """Node counts of the compact spending tree for any pair of thresholds.
+
+    Built once from the summed spending: each program's substantive item
+    amounts are sorted largest first with prefix sums, so the items kept
+    at a threshold are a prefix of each program and their total is one
+    subtraction. Counting a pair of thresholds is then a few vectorized
+    passes, with build_compact_hierarchy's rules (and its chain
+    flattening) applied per ministry, instead of a build.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        ministry_of, operational, items = [], [], []
+        ministries = spending_by_program(df, ITEM_KEYS, dropna_programs=False)
+        for ministry_index, (_, programs) in enumerate(ministries):
+            for _, rows in programs:
+                ministry_of.append(ministry_index)
+                operational.append(sum(amount for is_operational, *_, amount in rows if is_operational))
+                items.append(sorted((amount for is_operational, *_, amount in rows if not is_operational),
+                                    reverse=True))
+
+        lengths = np.array([len(amounts) for amounts in items], dtype=np.int64)
+        self.ministries = len(ministries)
+        self.ministry_of = np.array(ministry_of, dtype=np.int64)
+        self.operational = np.array(operational, dtype=np.int64)
+        self.amounts = np.array([amount for amounts in items for amount in amounts], dtype=np.int64)
+        self.program_of = np.repeat(np.arange(len(items)), lengths)
+        self.starts = np.cumsum(lengths) - lengths
+        self.prefix = np.concatenate(([0], np.cumsum(self.amounts)))
+        self.substantive = self.prefix[self.starts + lengths] - self.prefix[self.starts]
+
+    def programs(self, item_threshold: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Item node count and total of each program at an item threshold."""
+        kept = np.bincount(self.program_of[self.amounts >= item_threshold], minlength=len(self.starts))
+        major_total = self.prefix[self.starts + kept] - self.prefix[self.starts]
+        minor_total = self.substantive - major_total
+        items = (self.operational != 0) + kept + (minor_total > 0)
+        totals = self.operational + major_total + np.where(minor_total > 0, minor_total, 0)
+        return items, totals
+
+    def per_ministry(self, values: np.ndarray) -> np.ndarray:
+        sums = np.zeros(self.ministries, dtype=np.int64)
+        np.add.at(sums, self.ministry_of, values)
+        return sums
+
+    def count(self, program_threshold: int, item_threshold: int) -> Tuple[int, int, int]:
+        """(all nodes, program nodes, item nodes) of the flattened spending tree."""
+        items, totals = self.programs(item_threshold)
+        kept = items > 0
+        major = kept & (totals >= program_threshold)
+        minor = kept & ~major
+        major_programs = self.per_ministry(major)
+        major_items = self.per_ministry(np.where(major, items, 0))
+        minor_items = self.per_ministry(np.where(minor, items, 0))
+        minor_total = self.per_ministry(np.where(minor, totals, 0))
+
+        # The three ministry layouts of build_compact_hierarchy
+        all_minor = major_programs == 0
+        one_major = (major_programs == 1) & (minor_total == 0)
+        mixed = ~all_minor & ~one_major
+        other_programs = mixed & (minor_total > 0)
+        # A mixed ministry left with one child is merged with it
+        merged = mixed & (major_programs == 1) & ~other_programs
+
+        program_nodes = int(np.where(mixed, major_programs + other_programs, 0).sum() - merged.sum())
+        item_nodes = int(np.where(all_minor, minor_items, 0).sum()
+                         + np.where(one_major | mixed, major_items, 0).sum()
+                         + np.where(other_programs, minor_items, 0).sum())
+        ministry_nodes = int((~all_minor | (minor_items > 0)).sum())
+        # A lone ministry is merged into the root
+        nodes = 1 + ministry_nodes + program_nodes + item_nodes - (ministry_nodes == 1)
+        return nodes, program_nodes, item_nodes
+
+    def item_thresholds(self) -> np.ndarray:
+        """Item thresholds at which the tree can change, ascending."""
+        amounts = self.amounts[self.amounts > 0]
+        return np.unique(np.append(amounts, amounts.max(initial=0) + 1))
+
+    def program_thresholds(self, item_threshold: int) -> np.ndarray:
+        """Program thresholds at which the tree can change, ascending."""
+        totals = self.programs(item_threshold)[1]
+        totals = totals[totals > 0]
+        return np.unique(np.append(totals, totals.max(initial=0) + 1))
+
+def lowest_fitting(thresholds: np.ndarray, fits: Callable[[int], bool]) -> int:
+    """Lowest threshold (most detail) that fits, by binary search over ascending thresholds."""
+    low, high = 0, len(thresholds) - 1
+    if not fits(int(thresholds[high])):
+        raise ValueError(f"even a {format_threshold(int(thresholds[high]))} threshold does not fit the budget")
+    while low < high:
+        middle = (low + high) // 2
+        if fits(int(thresholds[middle])):
+            high = middle
+        else:
+            low = middle + 1
+    return int(thresholds[low])
+
+def fit_thresholds(budget: NodeBudget, total: int = None, programs: int = None,
+                   items: int = None) -> Tuple[int, int]:
+    """(program threshold, item threshold) giving the most detail within the budget.
+
+    With a total, both thresholds move together at today's ratio. Per-level
+    budgets fix the item threshold first (programs at PROGRAM_THRESHOLD),
+    then the program threshold for it; a level without a budget keeps its
+    fixed threshold.
+    """
+    if total is not None:
+        ratio = PROGRAM_THRESHOLD // ITEM_THRESHOLD
+        thresholds = np.unique(np.concatenate((
+            budget.item_thresholds(), -(-budget.program_thresholds(0) // ratio))))
+        item_threshold = lowest_fitting(thresholds, lambda t: budget.count(t * ratio, t)[0] <= total)
+        return item_threshold * ratio, item_threshold
+
+    program_threshold, item_threshold = PROGRAM_THRESHOLD, ITEM_THRESHOLD
+    if items is not None:
+        item_threshold = lowest_fitting(
+            budget.item_thresholds(), lambda t: budget.count(program_threshold, t)[2] <= items)
+    if programs is not None:
+        program_threshold = lowest_fitting(
+            budget.program_thresholds(item_threshold), lambda t: budget.count(t, item_threshold)[1] <= programs)
+    return program_threshold, item_threshold
+
+def print_threshold_table(budget: NodeBudget, rows: List[Tuple[int, int]], chosen: Tuple[int, int]) -> None:
+    """Node counts for (program threshold, item threshold) rows, the chosen pair marked."""
+    print(f"\n   {'Programs':>10} {'Items':>10} {'Nodes':>7} {'Program':>8} {'Item':>7}")
+    for program_threshold, item_threshold in sorted(set(rows) | {chosen}, key=lambda pair: pair[::-1]):
+        nodes, program_nodes, item_nodes = budget.count(program_threshold, item_threshold)
+        mark = '  ← chosen' if (program_threshold, item_threshold) == chosen else ''
+        print(f"   {format_threshold(program_threshold):>10} {format_threshold(item_threshold):>10} "
+              f"{nodes:>7} {program_nodes:>8} {item_nodes:>7}{mark}")
+
+def create_compact_revenue(df: pd.DataFrame, labels: Labels) -> Node:
     """Create compact revenue with flattening and Other categories for small amounts."""
     
     revenue_types = {}
     
-    for revenue_type, type_group in df.groupby('revenue_type'):
+    for revenue_type, type_group in df.groupby('revenue_type', observed=True):
+        type_node = Node(labels(revenue_type))
         major_items = []
         minor_items_total = 0
         
-        for revenue_detail, detail_group in type_group.groupby('revenue_detail'):
-            amount = float(detail_group['amount_dollars'].sum()) / 1e9
+        for revenue_detail, detail_group in type_group.groupby('revenue_detail', observed=True):
+            amount = int(detail_group['amount_cents'].sum())
             
             if revenue_detail == revenue_type:
                 # This is the main category amount - always include
-                revenue_types[revenue_type] = {
-                    'name': revenue_type,
-                    'amount': amount
-                }
+                revenue_types[revenue_type] = Node(type_node.label, amount=amount)
             else:
                 # This is a sub-category - apply 10M threshold to match spending
-                if amount >= 0.01:  # $10M threshold
-                    major_items.append({
-                        'name': f"{revenue_type} → {revenue_detail}",
-                        'amount': amount
-                    })
+                if amount >= ITEM_THRESHOLD:
+                    major_items.append(Node(labels(revenue_detail), type_node, amount=amount))
                 else:
                     minor_items_total += amount
         
         # Add "Other" category for minor revenue items if needed
         if minor_items_total > 0:
-            major_items.append({
-                'name': f"{revenue_type} → Other",
-                'amount': minor_items_total
-            })
+            major_items.append(Node(labels('Other'), type_node, amount=minor_items_total))
         
         # If we have sub-categories, use those instead
         if major_items:
-            revenue_types[revenue_type] = {
-                'name': revenue_type,
-                'children': major_items
-            }
+            type_node.children = major_items
+            revenue_types[revenue_type] = type_node
     
-    revenue_root = {
-        'name': 'Revenue',
-        'children': list(revenue_types.values())
-    }
+    revenue_root = Node(labels('Revenue'), children=list(revenue_types.values()))
     
-    return flatten_single_chains(revenue_root)
+    return flatten_single_chains(revenue_root, labels)
+
+def build_view(model: SpendingModel, program_threshold: int = PROGRAM_THRESHOLD,
+               item_threshold: int = ITEM_THRESHOLD) -> Tuple[Node, Node, Labels]:
+    """The compact view: layer thresholds and single-child chains flattened."""
+    labels = Labels()
+    spending = build_compact_hierarchy(model.expenses, labels, program_threshold, item_threshold)
+    return spending, create_compact_revenue(model.revenue, labels), labels
 
 def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--budget', type=int, help='Most spending nodes in the whole tree')
+    parser.add_argument('--program-budget', type=int, help='Most program nodes (including "Other Programs")')
+    parser.add_argument('--item-budget', type=int, help='Most item nodes (Operations, items, "Other")')
+    parser.add_argument('--output', default=OUTPUT_FILE, help=f'Sankey JSON to write (default {OUTPUT_FILE})')
+    args = parser.parse_args()
+    if args.budget is not None and (args.program_budget is not None or args.item_budget is not None):
+        parser.error('--budget cannot be combined with per-level budgets')
+
     print("🎯 Creating Ultra-Compact Sankey Data")
     print("=" * 50)
     
-    print("Loading expense data...")
-    df_expenses = pd.read_csv('clean_expenses_2024.csv')
-    
-    print("Loading revenue data...")
-    df_revenue = pd.read_csv('clean_revenue_2024.csv')
-    
-    print(f"Input: {len(df_expenses)} expense rows, {len(df_revenue)} revenue rows")
-    
-    # Build compact hierarchies
-    spending_data = build_compact_hierarchy(df_expenses)
-    revenue_data = create_compact_revenue(df_revenue)
-    
-    # Calculate totals
-    def calculate_total(node):
-        if 'amount' in node:
-            return node['amount']
-        elif 'children' in node:
-            return sum(calculate_total(child) for child in node['children'])
+    print("Loading expense and revenue data...")
+    model = SpendingModel.load()
+    
+    print(f"Input: {model.expense_rows} expense rows, {len(model.revenue)} revenue rows")
+    
+    program_threshold, item_threshold = PROGRAM_THRESHOLD, ITEM_THRESHOLD
+    budgeted = any(budget is not None for budget in (args.budget, args.program_budget, args.item_budget))
+    if budgeted:
+        budget = NodeBudget(model.expenses)
+        try:
+            program_threshold, item_threshold = fit_thresholds(
+                budget, args.budget, args.program_budget, args.item_budget)
+        except ValueError as error:
+            print(f"❌ {error}")
+            sys.exit(1)
+        chosen = (program_threshold, item_threshold)
+        if args.budget is not None:
+            ratio = PROGRAM_THRESHOLD // ITEM_THRESHOLD
+            rows = [(threshold * ratio, threshold) for threshold in TABLE_THRESHOLDS]
         else:
-            return 0
+            rows = []
+            if args.item_budget is not None:
+                rows += [(program_threshold, threshold) for threshold in TABLE_THRESHOLDS]
+            if args.program_budget is not None:
+                rows += [(threshold, item_threshold) for threshold in TABLE_THRESHOLDS]
+        print(f"\n📐 Node counts by threshold:")
+        print_threshold_table(budget, rows, chosen)
+        print()
+
+    # Build compact hierarchies
+    spending_data, revenue_data, labels = build_view(model, program_threshold, item_threshold)
     
-    spending_total = calculate_total(spending_data)
-    revenue_total = calculate_total(revenue_data)
+    spending_total = spending_data.total()
+    revenue_total = revenue_data.total()
     
     print(f"\n📊 Totals:")
-    print(f"   • Spending: ${spending_total:.2f}B")
-    print(f"   • Revenue: ${revenue_total:.2f}B")
-    
-    # Create final Sankey data structure
-    sankey_data = {
-        'total': max(spending_total, revenue_total),
-        'spending': spending_total,
-        'revenue': revenue_total,
-        'spending_data': spending_data,
-        'revenue_data': revenue_data
-    }
+    print(f"   • Spending: ${spending_total / CENTS_PER_BILLION:.2f}B")
+    print(f"   • Revenue: ${revenue_total / CENTS_PER_BILLION:.2f}B")
     
     # Write to file
-    output_file = 'public/data/sankey_2024_compact.json'
-    print(f"\n💾 Writing compact Sankey data to {output_file}...")
-    
-    with open(output_file, 'w') as f:
-        json.dump(sankey_data, f, indent=2)
-    
-    # Count nodes for comparison
-    def count_nodes(node):
-        count = 1
-        if 'children' in node:
-            for child in node['children']:
-                count += count_nodes(child)
-        return count
+    print(f"\n💾 Writing compact Sankey data to {args.output}...")
+    write_sankey(args.output, spending_data, revenue_data, labels)
     
-    revenue_nodes = count_nodes(revenue_data)
-    spending_nodes = count_nodes(spending_data)
+    revenue_nodes = revenue_data.count()
+    spending_nodes = spending_data.count()
+    if budgeted and spending_nodes != budget.count(program_threshold, item_threshold)[0]:
+        print(f"⚠️  Built {spending_nodes} spending nodes, the budget search counted "
+              f"{budget.count(program_threshold, item_threshold)[0]}")
     
+    program_limit, item_limit = format_threshold(program_threshold), format_threshold(item_threshold)
     print("✅ Ultra-compact Sankey transformation complete!")
     print(f"\n📈 Results:")
     print(f"   • Revenue nodes: {revenue_nodes}")
     print(f"   • Spending nodes: {spending_nodes}")
     print(f"   • Layer-based consolidation applied:")
-    print(f"     - Programs under $50M grouped as 'Other Programs'")
-    print(f"     - Items under $10M grouped as 'Other'")
+    print(f"     - Programs under ${program_limit} grouped as 'Other Programs'")
+    print(f"     - Items under ${item_limit} grouped as 'Other'")
     
     print(f"\n🎯 Layer-Specific Benefits:")
     print(f"   • Reduced visual complexity with meaningful thresholds")
-    print(f"   • Programs: $50M+ kept separate, smaller ones consolidated") 
-    print(f"   • Items: $10M+ kept separate, smaller ones consolidated")
+    print(f"   • Programs: ${program_limit}+ kept separate, smaller ones consolidated")
+    print(f"   • Items: ${item_limit}+ kept separate, smaller ones consolidated")
     print(f"   • 100% spending coverage with clean visualization")
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
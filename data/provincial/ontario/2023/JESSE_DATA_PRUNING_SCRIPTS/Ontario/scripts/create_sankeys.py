@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Build every Ontario Sankey view (full, strategic, compact) in one process.
+
+The cleaned tables are read and reduced to a SpendingModel once; each view
+is then a projection of it, written to the same files the per-view scripts
+write:
+
+  public/data/sankey_2024_fixed.json      (transform_sankey_data.py)
+  public/data/sankey_2024_strategic.json  (create_strategic_sankey.py)
+  public/data/sankey_2024_compact.json    (create_compact_sankey.py)
+
+each with its .flat.json twin and .lod.json root plus .shards/ detail file.
+Run from the Ontario directory.
+"""
+
+import time
+
+import create_compact_sankey
+import create_strategic_sankey
+import transform_sankey_data
+from sankey_tree import CENTS_PER_BILLION
+from spending_model import SpendingModel, write_sankey
+
+VIEWS = [transform_sankey_data, create_strategic_sankey, create_compact_sankey]
+
+def main():
+    started = time.perf_counter()
+    model = SpendingModel.load()
+    print(f"Loaded {model.expense_rows} expense rows ({len(model.expenses)} leaves), "
+          f"{len(model.revenue)} revenue rows in {time.perf_counter() - started:.2f}s")
+
+    for view in VIEWS:
+        view_started = time.perf_counter()
+        spending, revenue, labels = view.build_view(model)
+        write_sankey(view.OUTPUT_FILE, spending, revenue, labels)
+        print(f"  {view.OUTPUT_FILE}: {spending.count()} spending nodes, "
+              f"${spending.total() / CENTS_PER_BILLION:.2f}B spending, "
+              f"${revenue.total() / CENTS_PER_BILLION:.2f}B revenue "
+              f"({time.perf_counter() - view_started:.2f}s)")
+
+    print(f"✅ {len(VIEWS)} Sankey views written in {time.perf_counter() - started:.2f}s")
+
+if __name__ == '__main__':
+    main()
@@ -10,88 +10,24 @@ This script consolidates:
 """
 
 import pandas as pd
-import json
-import sys
-from typing import Dict, List, Any
+from typing import Tuple
 
-# Categories to consolidate into "Operations"
-OPERATIONAL_CATEGORIES = {
-    'Salaries and wages',
-    'Employee benefits', 
-    'Transportation and communication',
-    'Services',
-    'Supplies and equipment',
-    'Recoveries',  # Usually operational adjustments
-    'Other transactions',  # Often administrative
-    'Amortization',
-    'Bad Debt Expense'
-}
+from sankey_tree import CENTS_PER_BILLION, Labels, Node
+from spending_model import SpendingModel, build_revenue_tree, spending_by_program, write_sankey
 
-# NEW – keywords that indicate Treasury interest-on-debt payments which we
-# want to surface instead of hiding under Operations.
-INTEREST_KEYWORDS = {
-    'interest on',
-    'interest capitalized',
-    'interest payable'
-}
+OUTPUT_FILE = 'public/data/sankey_2024_strategic.json'
 
-def should_consolidate_category(account_name: str, account_details: str) -> bool:
-    """Determine if this should be consolidated into Operations."""
-    
-    # Check if it's in our operational categories
-    for op_cat in OPERATIONAL_CATEGORIES:
-        if op_cat.lower() in account_name.lower():
-            # Don't collapse Treasury "Other transactions → Interest ..." items
-            if op_cat.lower() == 'other transactions' and pd.notna(account_details):
-                details_lc = account_details.lower()
-                if any(k in details_lc for k in INTEREST_KEYWORDS):
-                    return False
-            return True
-    
-    # Keep substantive program spending separate
-    if 'transfer payments' in account_name.lower():
-        return False
-        
-    if account_name.lower() in ['capital expense', 'capital']:
-        return False
-        
-    # Check account details for specific programs/grants
-    if pd.notna(account_details) and account_details != '':
-        details_lower = account_details.lower()
-        # These suggest substantive program spending
-        if any(keyword in details_lower for keyword in [
-            'program', 'grant', 'fund', 'transfer', 'payment', 
-            'subsidy', 'benefit', 'insurance', 'pension'
-        ]):
-            return False
-    
-    return True
-
-def create_strategic_name(row: pd.Series, level: str) -> str:
-    """Create strategic names focused on program outcomes."""
-    
-    ministry = row['Ministry Name']
-    program = row['Program Name'] 
-    activity = row['Activity / Item'] if pd.notna(row['Activity / Item']) and row['Activity / Item'] != '' else None
-    
-    if level == 'ministry':
-        return ministry
-    
-    if level == 'program':
-        # Clean up program names - remove redundant ministry name repetition
-        if ministry.lower() in program.lower():
-            # Try to extract the unique part
-            program_clean = program.replace(ministry, '').strip()
-            if program_clean and program_clean != 'Program':
-                return f"{ministry} → {program_clean}"
-        return f"{ministry} → {program}"
-    
-    if level == 'activity' and activity:
-        return f"{ministry} → {program} → {activity}"
-    
-    return f"{ministry} → {program}"
+def strategic_program_label(ministry: str, program: str) -> str:
+    """Program label shown under its ministry, without the ministry name repeated."""
+    # Clean up program names - remove redundant ministry name repetition
+    if ministry.lower() in program.lower():
+        # Try to extract the unique part
+        program_clean = program.replace(ministry, '').strip()
+        if program_clean and program_clean != 'Program':
+            return program_clean
+    return program
 
-def build_strategic_hierarchy(df: pd.DataFrame) -> Dict[str, Any]:
+def build_strategic_hierarchy(df: pd.DataFrame, labels: Labels) -> Node:
     """Build a strategic hierarchy focused on program outcomes."""
     
     print("Building strategic spending hierarchy...")
@@ -99,167 +35,74 @@ def build_strategic_hierarchy(df: pd.DataFrame) -> Dict[str, Any]:
     # Group by ministry
     ministries = {}
     
-    for ministry_name, ministry_group in df.groupby('Ministry Name'):
-        ministry_node = {
-            'name': ministry_name,
-            'children': []
-        }
+    for ministry_name, programs in spending_by_program(df, ['operational', 'category']):
+        ministry_node = Node(labels(ministry_name))
         
-        # Group by program within ministry
-        for program_name, program_group in ministry_group.groupby('Program Name'):
-            program_node = {
-                'name': create_strategic_name(program_group.iloc[0], 'program'),
-                'children': []
-            }
+        # Programs within ministry, their spending already summed per category
+        for program_name, rows in programs:
+            program_node = Node(labels(strategic_program_label(ministry_name, program_name)), ministry_node)
             
             # Separate operational vs substantive spending
             operational_total = 0
             substantive_categories = {}
             
-            for _, row in program_group.iterrows():
-                account_name = row['Standard Account (Expense/Asset Name)']
-                account_details = row['Account Details (Expense/Asset Details)']
-                amount = float(row['amount_dollars']) / 1e9
-                
-                if should_consolidate_category(account_name, account_details):
+            for operational, category_name, amount in rows:
+                if operational:
                     # Add to operational total
                     operational_total += amount
                 else:
                     # This is substantive program spending - keep detailed
-                    if 'transfer payments' in account_name.lower() and pd.notna(account_details) and account_details != '':
-                        # Transfer payments - use the program/recipient name
-                        category_name = account_details
-                    elif pd.notna(account_details) and account_details != '':
-                        # Other substantive spending with details
-                        category_name = f"{account_name}: {account_details}"
-                    else:
-                        # Use the account name
-                        category_name = account_name
-                    
-                    # Aggregate amounts for same categories
-                    if category_name in substantive_categories:
-                        substantive_categories[category_name] += amount
-                    else:
-                        substantive_categories[category_name] = amount
+                    substantive_categories[category_name] = amount
             
             # Add operational spending as single consolidated category
             if operational_total > 0:
-                program_node['children'].append({
-                    'name': f"{create_strategic_name(program_group.iloc[0], 'program')} → Operations",
-                    'amount': operational_total
-                })
+                program_node.children.append(Node(labels('Operations'), program_node, amount=operational_total))
             
             # Add substantive spending categories
             for category_name, amount in substantive_categories.items():
                 if amount > 0:  # Only include positive amounts
-                    program_node['children'].append({
-                        'name': f"{create_strategic_name(program_group.iloc[0], 'program')} → {category_name}",
-                        'amount': amount
-                    })
+                    program_node.children.append(Node(labels(category_name), program_node, amount=amount))
             
             # Only add program if it has children
-            if program_node['children']:
-                ministry_node['children'].append(program_node)
+            if program_node.children:
+                ministry_node.children.append(program_node)
         
         # Only add ministry if it has children
-        if ministry_node['children']:
+        if ministry_node.children:
             ministries[ministry_name] = ministry_node
     
-    return {
-        'name': 'Spending',
-        'children': list(ministries.values())
-    }
+    return Node(labels('Spending'), children=list(ministries.values()))
 
-def create_strategic_revenue(df: pd.DataFrame) -> Dict[str, Any]:
-    """Create strategic revenue categories."""
-    
-    # Group by revenue type
-    revenue_types = {}
-    
-    for revenue_type, type_group in df.groupby('revenue_type'):
-        type_node = {
-            'name': revenue_type,
-            'children': []
-        }
-        
-        # For revenue, keep more detail since it's naturally less cluttered
-        for revenue_detail, detail_group in type_group.groupby('revenue_detail'):
-            if revenue_detail == revenue_type:
-                # No sub-category, create direct amount node
-                type_node['amount'] = float(detail_group['amount_dollars'].sum()) / 1e9
-            else:
-                # Has sub-category - use hierarchical naming
-                detail_node = {
-                    'name': f"{revenue_type} → {revenue_detail}",
-                    'amount': float(detail_group['amount_dollars'].sum()) / 1e9
-                }
-                type_node['children'].append(detail_node)
-        
-        revenue_types[revenue_type] = type_node
-    
-    return {
-        'name': 'Revenue',
-        'children': list(revenue_types.values())
-    }
+def build_view(model: SpendingModel) -> Tuple[Node, Node, Labels]:
+    """The strategic view: operational spending folded into Operations per program."""
+    labels = Labels()
+    return build_strategic_hierarchy(model.expenses, labels), build_revenue_tree(model.revenue, labels), labels
 
 def main():
     print("🎯 Creating Strategic Sankey Data")
     print("=" * 50)
     
-    print("Loading expense data...")
-    df_expenses = pd.read_csv('clean_expenses_2024.csv')
+    print("Loading expense and revenue data...")
+    model = SpendingModel.load()
     
-    print("Loading revenue data...")
-    df_revenue = pd.read_csv('clean_revenue_2024.csv')
-    
-    print(f"Input: {len(df_expenses)} expense rows, {len(df_revenue)} revenue rows")
+    print(f"Input: {model.expense_rows} expense rows, {len(model.revenue)} revenue rows")
     
     # Build strategic hierarchies
-    spending_data = build_strategic_hierarchy(df_expenses)
-    revenue_data = create_strategic_revenue(df_revenue)
-    
-    # Calculate totals
-    def calculate_total(node):
-        if 'amount' in node:
-            return node['amount']
-        elif 'children' in node:
-            return sum(calculate_total(child) for child in node['children'])
-        else:
-            return 0
+    spending_data, revenue_data, labels = build_view(model)
     
-    spending_total = calculate_total(spending_data)
-    revenue_total = calculate_total(revenue_data)
+    spending_total = spending_data.total()
+    revenue_total = revenue_data.total()
     
     print(f"\n📊 Totals:")
-    print(f"   • Spending: ${spending_total:.2f}B")
-    print(f"   • Revenue: ${revenue_total:.2f}B")
-    
-    # Create final Sankey data structure
-    sankey_data = {
-        'total': max(spending_total, revenue_total),
-        'spending': spending_total,
-        'revenue': revenue_total,
-        'spending_data': spending_data,
-        'revenue_data': revenue_data
-    }
+    print(f"   • Spending: ${spending_total / CENTS_PER_BILLION:.2f}B")
+    print(f"   • Revenue: ${revenue_total / CENTS_PER_BILLION:.2f}B")
     
     # Write to file
-    output_file = 'public/data/sankey_2024_strategic.json'
-    print(f"\n💾 Writing strategic Sankey data to {output_file}...")
-    
-    with open(output_file, 'w') as f:
-        json.dump(sankey_data, f, indent=2)
-    
-    # Count nodes for comparison
-    def count_nodes(node):
-        count = 1
-        if 'children' in node:
-            for child in node['children']:
-                count += count_nodes(child)
-        return count
+    print(f"\n💾 Writing strategic Sankey data to {OUTPUT_FILE}...")
+    write_sankey(OUTPUT_FILE, spending_data, revenue_data, labels)
     
-    revenue_nodes = count_nodes(revenue_data)
-    spending_nodes = count_nodes(spending_data)
+    revenue_nodes = revenue_data.count()
+    spending_nodes = spending_data.count()
     
     print("✅ Strategic Sankey transformation complete!")
     print(f"\n📈 Results:")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Columnar ("flat") Sankey files, and the lossless conversion to and from the
+nested sankey.json schema.
+
+A flat file keeps the nested file's top-level keys in order. Each tree
+(spending_data, revenue_data) becomes parallel arrays in preorder:
+
+    label        index into the shared "labels" string table
+    parent       index of the node's tree parent, -1 for the root
+    depth        0 for the root
+    name_parent  index of the node whose name this one's name extends
+                 (name = that name + " → " + label), -1 if label is the
+                 whole name
+    amount       the node's amount, null if it has none
+    empty        (sparse) nodes whose "children" list is present but empty
+
+so the repeated "Ministry → Program → ..." prefixes are stored once. Files
+are written without indentation.
+
+    python sankey_flat.py public/data/sankey_2024_fixed.json      # writes *.flat.json
+    python sankey_flat.py --expand public/data/sankey_2024_fixed.flat.json
+    python sankey_flat.py --check ../../sankey.json               # round-trip only
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List
+
+from sankey_tree import SEPARATOR
+
+FORMAT = 'sankey-flat'
+VERSION = 1
+NODE_KEYS = [['name', 'children'], ['name', 'amount'], ['name', 'children', 'amount'], ['name']]
+
+def flatten_tree(root: Dict[str, Any], labels: Dict[str, int]) -> Dict[str, List]:
+    """Columns for one nested tree; new label strings are added to labels."""
+    columns = {'label': [], 'parent': [], 'depth': [], 'name_parent': [], 'amount': []}
+    empty = []
+    names: List[str] = []       # full name of each node, by index
+    first: Dict[str, int] = {}  # full name -> first node carrying it
+    stack = [(root, -1, 0)]
+    while stack:
+        node, parent, depth = stack.pop()
+        if list(node) not in NODE_KEYS or node.get('amount', 0) is None:
+            raise ValueError(f"unsupported node layout {list(node)} in {node.get('name')!r}")
+        index = len(names)
+        name = node['name']
+
+        # The name this one extends: the tree parent's if it fits, else
+        # the longest earlier name it starts with
+        name_parent = -1
+        if parent >= 0 and name.startswith(names[parent] + SEPARATOR):
+            name_parent = parent
+        else:
+            cut = name.rfind(SEPARATOR)
+            while cut > 0 and name[:cut] not in first:
+                cut = name.rfind(SEPARATOR, 0, cut)
+            if cut > 0:
+                name_parent = first[name[:cut]]
+        label = name if name_parent < 0 else name[len(names[name_parent]) + len(SEPARATOR):]
+        names.append(name)
+        first.setdefault(name, index)
+
+        columns['label'].append(labels.setdefault(label, len(labels)))
+        columns['parent'].append(parent)
+        columns['depth'].append(depth)
+        columns['name_parent'].append(name_parent)
+        columns['amount'].append(node.get('amount'))
+        children = node.get('children')
+        if children == []:
+            empty.append(index)
+        for child in reversed(children or ()):
+            stack.append((child, index, depth + 1))
+    if empty:
+        columns['empty'] = empty
+    return columns
+
+def expand_tree(columns: Dict[str, List], labels: List[str]) -> Dict[str, Any]:
+    """The nested tree for one set of columns."""
+    nodes: List[Dict[str, Any]] = []
+    names: List[str] = []
+    internal = set(columns['parent']) | set(columns.get('empty', ()))
+    for index, (label, parent, name_parent, amount) in enumerate(zip(
+            columns['label'], columns['parent'], columns['name_parent'], columns['amount'])):
+        name = labels[label] if name_parent < 0 else names[name_parent] + SEPARATOR + labels[label]
+        node: Dict[str, Any] = {'name': name}
+        if index in internal:
+            node['children'] = []
+        if amount is not None:
+            node['amount'] = amount
+        names.append(name)
+        nodes.append(node)
+        if parent >= 0:
+            nodes[parent]['children'].append(node)
+    return nodes[0]
+
+def to_flat(sankey: Dict[str, Any]) -> Dict[str, Any]:
+    """Flat form of a nested sankey.json document; dict values are trees."""
+    labels: Dict[str, int] = {}
+    body = {}
+    for key, value in sankey.items():
+        if key in ('format', 'version', 'labels'):
+            raise ValueError(f"top-level key {key!r} is reserved in flat files")
+        body[key] = flatten_tree(value, labels) if isinstance(value, dict) else value
+    return {'format': FORMAT, 'version': VERSION, 'labels': list(labels), **body}
+
+def from_flat(flat: Dict[str, Any]) -> Dict[str, Any]:
+    """The nested sankey.json document a flat file was made from."""
+    if flat.get('format') != FORMAT or flat.get('version') != VERSION:
+        raise ValueError(f"not a {FORMAT} v{VERSION} file")
+    labels = flat['labels']
+    return {
+        key: expand_tree(value, labels) if isinstance(value, dict) else value
+        for key, value in flat.items()
+        if key not in ('format', 'version', 'labels')
+    }
+
+def flat_path(path: Path | str) -> Path:
+    """sankey.json -> sankey.flat.json"""
+    path = Path(path)
+    return path.with_name(path.stem + '.flat' + path.suffix)
+
+def write_flat(sankey: Dict[str, Any], path: Path | str) -> None:
+    with open(path, 'w') as f:
+        json.dump(to_flat(sankey), f, separators=(',', ':'))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='Nested sankey JSON files (flat files with --expand)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--expand', action='store_true', help='Write the nested JSON back out of flat files')
+    mode.add_argument('--check', action='store_true', help='Only verify that each file round-trips')
+    args = parser.parse_args()
+
+    failed = 0
+    for path in map(Path, args.paths):
+        with open(path) as f:
+            data = json.load(f)
+        if args.expand:
+            stem = path.name[:-len('.flat.json')] if path.name.endswith('.flat.json') else path.stem + '.nested'
+            out = path.with_name(stem + '.json')
+            with open(out, 'w') as f:
+                json.dump(from_flat(data), f, indent=2)
+            print(f"{path} -> {out}")
+            continue
+        flat = to_flat(data)
+        if json.dumps(from_flat(flat)) != json.dumps(data):
+            print(f"{path}: does not round-trip")
+            failed += 1
+            continue
+        size = path.stat().st_size
+        flat_size = len(json.dumps(flat, separators=(',', ':')).encode('utf-8'))
+        if not args.check:
+            write_flat(data, flat_path(path))
+        print(f"{path}: {size / 1024:.1f} KB nested, {flat_size / 1024:.1f} KB flat")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Level-of-detail ("LOD") Sankey files: a small root file with the top of
+each tree, and one content-hashed detail file holding every subtree cut
+from it, which the site loads after first render.
+
+For sankey.json the root is sankey.lod.json and the detail file is
+sankey.shards/<hash>.json, both written without indentation. The root
+keeps the nested file's top-level keys in order; each tree
+(spending_data, revenue_data) keeps its top `levels` levels, root
+included (by default the root and the ministries). A node on the last
+kept level that has children becomes a stub
+
+    {"name": ..., "amount": <total of its subtree>, "shard": "<hash>"}
+
+which renders as a leaf with the right total. The detail file maps each
+stub's hash to the node as it was, and the root names the detail file
+under "shards". The chart draws every level at once and has no
+drill-down, so the subtrees are fetched together in one request rather
+than stub by stub. The detail file's name is a hash of its bytes, so it
+can be cached forever; a detail file no longer referenced is removed
+when a root is written.
+
+    python sankey_lod.py ../../sankey.json                  # writes sankey.lod.json + sankey.shards/
+    python sankey_lod.py --levels 3 public/data/sankey_2024_fixed.json
+    python sankey_lod.py --check ../../sankey.json          # round-trip only
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+FORMAT = 'sankey-lod'
+VERSION = 2
+LEVELS = 2
+SEPARATORS = (',', ':')
+RESERVED = ('format', 'version', 'levels', 'shards')
+
+def subtree_total(node: Dict[str, Any]) -> float:
+    """Own amount plus every descendant's, as d3's hierarchy.sum() adds them."""
+    total, stack = 0.0, [node]
+    while stack:
+        node = stack.pop()
+        total += node.get('amount') or 0
+        stack.extend(node.get('children') or ())
+    return total
+
+def shard_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:16]
+
+def cut_tree(node: Dict[str, Any], levels: int, shards: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Copy of node `levels` levels deep, node included; deeper subtrees go to shards."""
+    def copy(node: Dict[str, Any], depth: int) -> Dict[str, Any]:
+        if depth == levels - 1 and node.get('children'):
+            key = shard_key(json.dumps(node, separators=SEPARATORS).encode('utf-8'))
+            shards[key] = node
+            return {'name': node['name'], 'amount': subtree_total(node), 'shard': key}
+        return {
+            key: [copy(child, depth + 1) for child in value] if key == 'children' else value
+            for key, value in node.items()
+        }
+    return copy(node, 0)
+
+def to_lod(sankey: Dict[str, Any], levels: int = LEVELS) -> Tuple[Dict[str, Any], Optional[bytes]]:
+    """(root document, detail file bytes or None) for a nested sankey.json document."""
+    if levels < 2:
+        raise ValueError("levels must be at least 2")
+    shards: Dict[str, Dict[str, Any]] = {}
+    body = {}
+    for key, value in sankey.items():
+        if key in RESERVED:
+            raise ValueError(f"top-level key {key!r} is reserved in LOD files")
+        body[key] = cut_tree(value, levels, shards) if isinstance(value, dict) else value
+    root = {'format': FORMAT, 'version': VERSION, 'levels': levels}
+    if not shards:
+        return {**root, **body}, None
+    detail = json.dumps(shards, separators=SEPARATORS).encode('utf-8')
+    return {**root, 'shards': shard_key(detail), **body}, detail
+
+def from_lod(root: Dict[str, Any], read_detail: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+    """The nested sankey.json document, with every stub replaced from the detail file."""
+    if root.get('format') != FORMAT or root.get('version') != VERSION:
+        raise ValueError(f"not a {FORMAT} v{VERSION} file")
+    shards = read_detail(root['shards']) if 'shards' in root else {}
+
+    def graft(node: Dict[str, Any]) -> Dict[str, Any]:
+        if 'shard' in node:
+            return shards[node['shard']]
+        return {
+            key: [graft(child) for child in value] if key == 'children' else value
+            for key, value in node.items()
+        }
+
+    return {
+        key: graft(value) if isinstance(value, dict) else value
+        for key, value in root.items()
+        if key not in RESERVED
+    }
+
+def lod_paths(path: Path | str) -> Tuple[Path, Path]:
+    """sankey.json -> (sankey.lod.json, sankey.shards/)"""
+    path = Path(path)
+    return path.with_name(path.stem + '.lod' + path.suffix), path.with_name(path.stem + '.shards')
+
+def lod_sizes(root: Dict[str, Any], detail: Optional[bytes]) -> Dict[str, int]:
+    return {'root': len(json.dumps(root, separators=SEPARATORS).encode('utf-8')),
+            'detail': len(detail or b'')}
+
+def write_lod(sankey: Dict[str, Any], path: Path | str, levels: int = LEVELS) -> Dict[str, int]:
+    """Write the root and detail file for the nested file at path; returns byte sizes."""
+    root, detail = to_lod(sankey, levels)
+    root_path, shard_dir = lod_paths(path)
+    shard_dir.mkdir(exist_ok=True)
+    if detail is not None:
+        detail_path = shard_dir / f"{root['shards']}.json"
+        # Same name, same bytes: an existing detail file is left alone
+        if not detail_path.exists():
+            detail_path.write_bytes(detail)
+    for stale in shard_dir.glob('*.json'):
+        if stale.stem != root.get('shards'):
+            stale.unlink()
+    root_path.write_bytes(json.dumps(root, separators=SEPARATORS).encode('utf-8'))
+    return lod_sizes(root, detail)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='+', help='Nested sankey JSON files')
+    parser.add_argument('--levels', type=int, default=LEVELS, help=f'Tree levels in the root, its top node included (default {LEVELS})')
+    parser.add_argument('--check', action='store_true', help='Only verify that each file round-trips')
+    args = parser.parse_args()
+
+    failed = 0
+    for path in map(Path, args.paths):
+        with open(path) as f:
+            data = json.load(f)
+        root, detail = to_lod(data, args.levels)
+        restored = from_lod(root, lambda key: json.loads(detail))
+        if json.dumps(restored) != json.dumps(data):
+            print(f"{path}: does not round-trip")
+            failed += 1
+            continue
+        sizes = lod_sizes(root, detail) if args.check else write_lod(data, path, args.levels)
+        print(f"{path}: {path.stat().st_size / 1024:.1f} KB nested, {sizes['root'] / 1024:.1f} KB root, "
+              f"{sizes['detail'] / 1024:.1f} KB detail")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
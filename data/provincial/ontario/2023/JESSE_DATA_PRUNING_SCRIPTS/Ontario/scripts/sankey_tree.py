@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Sankey trees with interned labels, shared by the Ontario builders.
+
+A node holds the id of its own label (e.g. a program name) and a pointer
+to the node its name continues from, not the full "Ministry → Program →
+Item" string. Full names are rendered once, by to_json(), when the
+compatibility JSON is written, so building costs the same however deep
+the tree is.
+
+The name parent is usually the tree parent, but needn't be: compact items
+moved under "Other Programs" keep their own program in their names.
+"""
+
+from typing import Any, Dict, List, Optional
+
+SEPARATOR = ' → '
+
+# Amounts are summed as exact integer cents and only turned into float
+# billions when the JSON is written.
+CENTS_PER_BILLION = 100 * 10**9
+
+class Labels:
+    """Intern table: each distinct label string is stored once and named by its index."""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.ids: Dict[str, int] = {}
+
+    def __call__(self, text: str) -> int:
+        label = self.ids.get(text)
+        if label is None:
+            label = self.ids[text] = len(self.strings)
+            self.strings.append(text)
+        return label
+
+    def __getitem__(self, label: int) -> str:
+        return self.strings[label]
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+class Node:
+    """One Sankey node.
+
+    label is None for a level that has no value of its own; such a node is
+    shown under its name parent's name.
+    Leaves carry amount (cents) and no children; a node may have both.
+    """
+    __slots__ = ('label', 'parent', 'children', 'amount')
+
+    def __init__(self, label: Optional[int], parent: Optional['Node'] = None, *,
+                 children: Optional[List['Node']] = None, amount: Optional[int] = None):
+        self.label = label
+        self.parent = parent
+        self.children = [] if children is None and amount is None else children
+        self.amount = amount
+
+    def total(self) -> int:
+        if self.amount is not None:
+            return self.amount
+        return sum(child.total() for child in self.children or ())
+
+    def count(self) -> int:
+        return 1 + sum(child.count() for child in self.children or ())
+
+def to_json(root: Node, labels: Labels) -> Dict[str, Any]:
+    """The tree as nested {'name', 'children', 'amount'} dicts, amounts in billions.
+
+    Each name is built from its name parent's rendered name, so every
+    node costs one string join however deep it sits.
+    """
+    names: Dict[Node, str] = {}
+
+    def name(node: Node) -> str:
+        rendered = names.get(node)
+        if rendered is None:
+            parent = node.parent
+            if node.label is None:
+                rendered = name(parent)
+            elif parent is None:
+                rendered = labels[node.label]
+            else:
+                rendered = name(parent) + SEPARATOR + labels[node.label]
+            names[node] = rendered
+        return rendered
+
+    def render(node: Node) -> Dict[str, Any]:
+        out: Dict[str, Any] = {'name': name(node)}
+        if node.children is not None:
+            out['children'] = [render(child) for child in node.children]
+        if node.amount is not None:
+            out['amount'] = node.amount / CENTS_PER_BILLION
+        return out
+
+    return render(root)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+The cleaned 2024 spending and revenue, loaded once and shared by every
+Sankey view (full, strategic and compact).
+
+SpendingModel reduces the expense rows to one row per distinct leaf:
+ministry, program, activity, sub item, account, account details and
+expenditure category, with amounts summed, in the order each leaf first
+appears, with each leaf's account classified (Operations or not, and the
+substantive category name) once per distinct account. Each builder is a
+projection of that table. create_sankeys.py builds all three views from
+one load; the per-view scripts still run on their own.
+
+The account rules the strategic and compact views share (what counts as
+operational spending, and how substantive spending is named) live here too.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from clean_public_accounts_2024 import read_clean
+from sankey_flat import flat_path, write_flat
+from sankey_lod import write_lod
+from sankey_tree import CENTS_PER_BILLION, Labels, Node, to_json
+
+EXPENSES_CSV = 'clean_expenses_2024.csv'
+REVENUE_CSV = 'clean_revenue_2024.csv'
+
+# Spending hierarchy, outermost first; the last two together name an account
+HIERARCHY_LEVELS = [
+    'Ministry Name',
+    'Program Name',
+    'Activity / Item',
+    'Sub Item',
+    'Standard Account (Expense/Asset Name)',
+    'Account Details (Expense/Asset Details)',
+]
+ACCOUNT, DETAILS = HIERARCHY_LEVELS[-2:]
+# What tells two expense rows apart in any view
+LEAF_COLUMNS = HIERARCHY_LEVELS + ['Expenditure Category (Operating / Capital)']
+
+# Categories to consolidate into "Operations"
+OPERATIONAL_CATEGORIES = {
+    'Salaries and wages',
+    'Employee benefits',
+    'Transportation and communication',
+    'Services',
+    'Supplies and equipment',
+    'Recoveries',  # Usually operational adjustments
+    'Other transactions',  # Often administrative
+    'Amortization',
+    'Bad Debt Expense'
+}
+
+# Keywords that indicate Treasury interest-on-debt payments, which we
+# want to surface instead of hiding under Operations.
+INTEREST_KEYWORDS = {
+    'interest on',        # Interest on Ontario Securities, etc.
+    'interest capitalized',
+    'interest payable'
+}
+
+# Words in account details that suggest substantive program spending
+SUBSTANTIVE_KEYWORDS = [
+    'program', 'grant', 'fund', 'transfer', 'payment',
+    'subsidy', 'benefit', 'insurance', 'pension'
+]
+CAPITAL_ACCOUNTS = {'capital expense', 'capital'}
+
+def keyword_pattern(keywords) -> re.Pattern:
+    """One compiled alternation matching any of the (lower-case) keywords."""
+    return re.compile('|'.join(re.escape(keyword.lower()) for keyword in sorted(keywords)))
+
+OPERATIONAL_PATTERN = keyword_pattern(OPERATIONAL_CATEGORIES)
+INTEREST_PATTERN = keyword_pattern(INTEREST_KEYWORDS)
+SUBSTANTIVE_PATTERN = keyword_pattern(SUBSTANTIVE_KEYWORDS)
+
+def should_consolidate_category(account_name: str, account_details: str) -> bool:
+    """Determine if this should be consolidated into Operations.
+
+    The rules, in order of precedence: operational accounts are
+    consolidated, except "Other transactions" lines whose details name
+    interest on debt (Treasury), which are kept separate so they don't
+    get merged into the generic Operations node; transfer payments and
+    capital accounts are kept; so is anything whose details suggest a
+    program or grant. The rest is consolidated.
+    """
+    account_lc = account_name.lower()
+    has_details = pd.notna(account_details) and account_details != ''
+    details_lc = account_details.lower() if has_details else ''
+
+    if OPERATIONAL_PATTERN.search(account_lc):
+        return not ('other transactions' in account_lc and INTEREST_PATTERN.search(details_lc))
+    if 'transfer payments' in account_lc or account_lc in CAPITAL_ACCOUNTS:
+        return False
+    return not SUBSTANTIVE_PATTERN.search(details_lc)
+
+def substantive_category(account_name: str, account_details: str) -> str:
+    """Name under which substantive (non-Operations) spending is shown."""
+    if 'transfer payments' in account_name.lower() and pd.notna(account_details) and account_details != '':
+        # Transfer payments - use the program/recipient name
+        return account_details
+    if pd.notna(account_details) and account_details != '':
+        # Other substantive spending with details
+        return f"{account_name}: {account_details}"
+    # Use the account name
+    return account_name
+
+def classify_accounts(frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-row Operations flag and substantive category name for a frame.
+
+    The rules run once per distinct (account, details) pair; rows get
+    their pair's result by index, so the cost hardly grows with the row
+    count. Category is None for operational rows.
+    """
+    account_codes, accounts = pd.factorize(frame[ACCOUNT], use_na_sentinel=False)
+    details_codes, details = pd.factorize(frame[DETAILS], use_na_sentinel=False)
+    pairs, inverse = np.unique(account_codes.astype(np.int64) * len(details) + details_codes,
+                               return_inverse=True)
+
+    operational = np.empty(len(pairs), dtype=bool)
+    categories = np.empty(len(pairs), dtype=object)
+    for i, pair in enumerate(pairs.tolist()):
+        account_name, account_details = accounts[pair // len(details)], details[pair % len(details)]
+        operational[i] = should_consolidate_category(account_name, account_details)
+        categories[i] = None if operational[i] else substantive_category(account_name, account_details)
+    return operational[inverse], categories[inverse]
+
+class SpendingModel:
+    """Expense leaves and revenue rows for one fiscal year."""
+
+    def __init__(self, expenses: pd.DataFrame, revenue: pd.DataFrame):
+        self.expense_rows = len(expenses)
+        # Leaves in first-appearance order, so per-program loops over them
+        # meet categories in the same order as over the raw rows
+        self.expenses = (
+            expenses.groupby(LEAF_COLUMNS, dropna=False, observed=True, sort=False)['amount_cents']
+            .sum()
+            .reset_index()
+        )
+        self.expenses['operational'], self.expenses['category'] = classify_accounts(self.expenses)
+        self.revenue = revenue
+
+    @classmethod
+    def load(cls, expenses_path: str = EXPENSES_CSV, revenue_path: str = REVENUE_CSV) -> 'SpendingModel':
+        return cls(read_clean(expenses_path), read_clean(revenue_path))
+
+def spending_by_program(df: pd.DataFrame, keys: List[str],
+                        dropna_programs: bool = True) -> List[Tuple[Any, List[Tuple[Any, List[tuple]]]]]:
+    """Expense amounts summed per ministry, program and keys, in one reduction.
+
+    Returns [(ministry, [(program, rows), ...]), ...] with ministries and
+    programs in the order nested groupby loops would meet them (sorted,
+    a missing program last unless dropped), and each program's rows, as
+    (*keys, amount_cents) tuples, in the order their keys first appear.
+    """
+    levels = HIERARCHY_LEVELS[:2]
+    spending = df.dropna(subset=levels if dropna_programs else levels[:1])
+    totals = (
+        spending.groupby(levels + keys, dropna=False, observed=True, sort=False)['amount_cents']
+        .sum()
+        .reset_index()
+    )
+    program_codes = totals.groupby(levels, dropna=False, observed=True).ngroup().to_numpy()
+    order = np.argsort(program_codes, kind='stable')
+    columns = [totals[column].to_numpy()[order].tolist() for column in levels + keys + ['amount_cents']]
+
+    ministries = []
+    previous = None
+    for code, ministry, program, *row in zip(program_codes[order].tolist(), *columns):
+        if code != previous:
+            if not ministries or ministries[-1][0] != ministry:
+                ministries.append((ministry, []))
+            ministries[-1][1].append((program, []))
+            previous = code
+        ministries[-1][1][-1][1].append(tuple(row))
+    return ministries
+
+def build_revenue_tree(df: pd.DataFrame, labels: Labels) -> Node:
+    """Revenue type → detail, as the full and strategic views show it."""
+
+    # Group by revenue type
+    revenue_types = {}
+
+    for revenue_type, type_group in df.groupby('revenue_type', observed=True):
+        type_node = Node(labels(revenue_type))
+
+        # Group by revenue detail within type
+        for revenue_detail, detail_group in type_group.groupby('revenue_detail', observed=True):
+            if revenue_detail == revenue_type:
+                # No sub-category, create direct amount node
+                type_node.amount = int(detail_group['amount_cents'].sum())
+            else:
+                # Has sub-category - use hierarchical naming
+                type_node.children.append(
+                    Node(labels(revenue_detail), type_node, amount=int(detail_group['amount_cents'].sum())))
+
+        revenue_types[revenue_type] = type_node
+
+    return Node(labels('Revenue'), children=list(revenue_types.values()))
+
+def write_sankey(output_file: str, spending: Node, revenue: Node, labels: Labels) -> Dict[str, Any]:
+    """Write a view as sankey JSON plus its flat and LOD files; returns the document."""
+    spending_total = spending.total()
+    revenue_total = revenue.total()
+    sankey_data = {
+        'total': max(spending_total, revenue_total) / CENTS_PER_BILLION,
+        'spending': spending_total / CENTS_PER_BILLION,
+        'revenue': revenue_total / CENTS_PER_BILLION,
+        'spending_data': to_json(spending, labels),
+        'revenue_data': to_json(revenue, labels)
+    }
+    with open(output_file, 'w') as f:
+        json.dump(sankey_data, f, indent=2)
+    write_flat(sankey_data, flat_path(output_file))
+    write_lod(sankey_data, output_file)
+    return sankey_data
@@ -7,244 +7,93 @@ unique node names based on the full hierarchical path.
 """
 
 import pandas as pd
-import json
-import sys
-from typing import Dict, List, Any
+from typing import Dict, Optional, Tuple
 
-def create_hierarchical_name(row: pd.Series, level: str) -> str:
-    """Create a unique hierarchical name based on the full path."""
-    parts = []
-    
-    if level == 'ministry':
-        return row['Ministry Name']
-    
-    parts.append(row['Ministry Name'])
-    
-    if level == 'program':
-        return f"{parts[0]} → {row['Program Name']}"
-    
-    parts.append(row['Program Name'])
-    
-    if level == 'activity' and pd.notna(row['Activity / Item']) and row['Activity / Item'] != '':
-        return f"{parts[0]} → {parts[1]} → {row['Activity / Item']}"
-    
-    if level == 'sub_item' and pd.notna(row['Sub Item']) and row['Sub Item'] != '':
-        if pd.notna(row['Activity / Item']) and row['Activity / Item'] != '':
-            return f"{parts[0]} → {parts[1]} → {row['Activity / Item']} → {row['Sub Item']}"
-        else:
-            return f"{parts[0]} → {parts[1]} → {row['Sub Item']}"
-    
-    if level == 'account':
-        path_parts = [parts[0], parts[1]]
-        
-        if pd.notna(row['Activity / Item']) and row['Activity / Item'] != '':
-            path_parts.append(row['Activity / Item'])
-        
-        if pd.notna(row['Sub Item']) and row['Sub Item'] != '':
-            path_parts.append(row['Sub Item'])
-        
-        # Add the account name
-        account_name = row['Standard Account (Expense/Asset Name)']
-        if pd.notna(row['Account Details (Expense/Asset Details)']) and row['Account Details (Expense/Asset Details)'] != '':
-            account_name = f"{account_name}: {row['Account Details (Expense/Asset Details)']}"
-        
-        path_parts.append(account_name)
-        return ' → '.join(path_parts)
-    
-    return row['Ministry Name']  # fallback
+from sankey_tree import CENTS_PER_BILLION, Labels, Node
+from spending_model import HIERARCHY_LEVELS, SpendingModel, build_revenue_tree, write_sankey
 
-def build_hierarchy_tree(df: pd.DataFrame) -> Dict[str, Any]:
-    """Build a hierarchical tree structure for the Sankey diagram."""
-    
-    # Group by ministry
-    ministries = {}
-    
-    for ministry_name, ministry_group in df.groupby('Ministry Name'):
-        ministry_node = {
-            'name': ministry_name,
-            'children': []
-        }
-        
-        # Group by program within ministry
-        for program_name, program_group in ministry_group.groupby('Program Name'):
-            program_node = {
-                'name': create_hierarchical_name(program_group.iloc[0], 'program'),
-                'children': []
-            }
-            
-            # Group by activity within program
-            activity_groups = program_group.groupby(['Activity / Item'], dropna=False)
-            
-            for activity_name, activity_group in activity_groups:
-                # Handle cases where Activity / Item might be NaN or empty
-                if pd.isna(activity_name) or activity_name == '' or activity_name == 'No Value':
-                    # No activity level, group by sub item
-                    sub_item_groups = activity_group.groupby(['Sub Item'], dropna=False)
-                    
-                    for sub_item_name, sub_item_group in sub_item_groups:
-                        if pd.isna(sub_item_name) or sub_item_name == '' or sub_item_name == 'No Value':
-                            # No sub item level, go directly to accounts
-                            account_groups = sub_item_group.groupby(['Standard Account (Expense/Asset Name)', 'Account Details (Expense/Asset Details)'], dropna=False)
-                            
-                            for (account_name, account_details), account_group in account_groups:
-                                account_node = {
-                                    'name': create_hierarchical_name(account_group.iloc[0], 'account'),
-                                    'amount': float(account_group['amount_dollars'].sum()) / 1e9  # Convert to billions
-                                }
-                                program_node['children'].append(account_node)
-                        else:
-                            # Has sub item level
-                            sub_item_node = {
-                                'name': create_hierarchical_name(sub_item_group.iloc[0], 'sub_item'),
-                                'children': []
-                            }
-                            
-                            account_groups = sub_item_group.groupby(['Standard Account (Expense/Asset Name)', 'Account Details (Expense/Asset Details)'], dropna=False)
-                            
-                            for (account_name, account_details), account_group in account_groups:
-                                account_node = {
-                                    'name': create_hierarchical_name(account_group.iloc[0], 'account'),
-                                    'amount': float(account_group['amount_dollars'].sum()) / 1e9  # Convert to billions
-                                }
-                                sub_item_node['children'].append(account_node)
-                            
-                            program_node['children'].append(sub_item_node)
-                else:
-                    # Has activity level
-                    activity_node = {
-                        'name': create_hierarchical_name(activity_group.iloc[0], 'activity'),
-                        'children': []
-                    }
-                    
-                    # Group by sub item within activity
-                    sub_item_groups = activity_group.groupby(['Sub Item'], dropna=False)
-                    
-                    for sub_item_name, sub_item_group in sub_item_groups:
-                        if pd.isna(sub_item_name) or sub_item_name == '' or sub_item_name == 'No Value':
-                            # No sub item level, go directly to accounts
-                            account_groups = sub_item_group.groupby(['Standard Account (Expense/Asset Name)', 'Account Details (Expense/Asset Details)'], dropna=False)
-                            
-                            for (account_name, account_details), account_group in account_groups:
-                                account_node = {
-                                    'name': create_hierarchical_name(account_group.iloc[0], 'account'),
-                                    'amount': float(account_group['amount_dollars'].sum()) / 1e9  # Convert to billions
-                                }
-                                activity_node['children'].append(account_node)
-                        else:
-                            # Has sub item level
-                            sub_item_node = {
-                                'name': create_hierarchical_name(sub_item_group.iloc[0], 'sub_item'),
-                                'children': []
-                            }
-                            
-                            account_groups = sub_item_group.groupby(['Standard Account (Expense/Asset Name)', 'Account Details (Expense/Asset Details)'], dropna=False)
-                            
-                            for (account_name, account_details), account_group in account_groups:
-                                account_node = {
-                                    'name': create_hierarchical_name(account_group.iloc[0], 'account'),
-                                    'amount': float(account_group['amount_dollars'].sum()) / 1e9  # Convert to billions
-                                }
-                                sub_item_node['children'].append(account_node)
-                            
-                            activity_node['children'].append(sub_item_node)
-                    
-                    program_node['children'].append(activity_node)
-            
-            ministry_node['children'].append(program_node)
-        
-        ministries[ministry_name] = ministry_node
-    
-    return {
-        'name': 'Spending',
-        'children': list(ministries.values())
-    }
-
-def load_revenue_data() -> Dict[str, Any]:
-    """Load and transform revenue data with hierarchical names."""
-    df = pd.read_csv('clean_revenue_2024.csv')
-    
-    # Group by revenue type
-    revenue_types = {}
-    
-    for revenue_type, type_group in df.groupby('revenue_type'):
-        type_node = {
-            'name': revenue_type,
-            'children': []
-        }
-        
-        # Group by revenue detail within type
-        for revenue_detail, detail_group in type_group.groupby('revenue_detail'):
-            if revenue_detail == revenue_type:
-                # No sub-category, create direct amount node
-                type_node['amount'] = float(detail_group['amount_dollars'].sum()) / 1e9
-            else:
-                # Has sub-category
-                detail_node = {
-                    'name': f"{revenue_type} → {revenue_detail}",
-                    'amount': float(detail_group['amount_dollars'].sum()) / 1e9
-                }
-                type_node['children'].append(detail_node)
-        
-        revenue_types[revenue_type] = type_node
-    
-    return {
-        'name': 'Revenue',
-        'children': list(revenue_types.values())
-    }
+OUTPUT_FILE = 'public/data/sankey_2024_fixed.json'
+
+def is_blank(value) -> bool:
+    """An absent level: NaN, or empty in CSVs that kept the empty string."""
+    return pd.isna(value) or value == ''
+
+def build_hierarchy_tree(df: pd.DataFrame, labels: Labels) -> Node:
+    """Build a hierarchical tree structure for the Sankey diagram.
+
+    Rows are sorted once by the hierarchy columns (blanks last) and streamed
+    into a path trie Ministry → Program → Activity → Sub Item → account, so
+    children come out in the same order the per-level groupbys gave them.
+    Node names are the full path with blank levels left out; a blank
+    activity or sub item node is named after its ministry, as before.
+    Rows with the same account path are summed.
+    """
+    df = df.dropna(subset=['Ministry Name', 'Program Name'])
+    df = df.sort_values(HIERARCHY_LEVELS, na_position='last', kind='stable')
+
+    root = Node(labels('Spending'))
+    nodes: Dict[tuple, Node] = {}
+
+    def child(parent: Node, key: tuple, label: Optional[str], named_after: Optional[Node] = None) -> Node:
+        node = nodes.get(key)
+        if node is None:
+            node = nodes[key] = Node(None if label is None else labels(label), named_after)
+            parent.children.append(node)
+        return node
+
+    columns = [df[col].tolist() for col in HIERARCHY_LEVELS] + [df['amount_cents'].tolist()]
+    for ministry, program, activity, sub_item, account, details, cents in zip(*columns):
+        activity = None if is_blank(activity) else activity
+        sub_item = None if is_blank(sub_item) else sub_item
+        details = None if is_blank(details) else details
+
+        # named: the deepest non-blank level, which the next name extends
+        key = (ministry,)
+        ministry_node = child(root, key, ministry)
+        key += (program,)
+        node = named = child(ministry_node, key, program, ministry_node)
+        key += (activity,)
+        node = child(node, key, activity, named if activity is not None else ministry_node)
+        if activity is not None:
+            named = node
+        key += (sub_item,)
+        node = child(node, key, sub_item, named if sub_item is not None else ministry_node)
+        if sub_item is not None:
+            named = node
+
+        key += (account, details)
+        leaf = nodes.get(key)
+        if leaf is None:
+            account_name = account if details is None else f"{account}: {details}"
+            leaf = nodes[key] = Node(labels(account_name), named, amount=0)
+            node.children.append(leaf)
+        leaf.amount += int(cents)
+
+    return root
+
+def build_view(model: SpendingModel) -> Tuple[Node, Node, Labels]:
+    """The full view: every level down to the account, plus revenue by type and detail."""
+    labels = Labels()
+    return build_hierarchy_tree(model.expenses, labels), build_revenue_tree(model.revenue, labels), labels
 
 def main():
-    print("Loading expense data...")
-    df = pd.read_csv('clean_expenses_2024.csv')
-    
-    print("Building spending hierarchy...")
-    spending_data = build_hierarchy_tree(df)
-    
-    print("Loading revenue data...")
-    revenue_data = load_revenue_data()
-    
-    # Calculate totals
-    def calculate_total(node):
-        if 'amount' in node:
-            return node['amount']
-        elif 'children' in node:
-            return sum(calculate_total(child) for child in node['children'])
-        else:
-            return 0
+    print("Loading expense and revenue data...")
+    model = SpendingModel.load()
     
-    spending_total = calculate_total(spending_data)
-    revenue_total = calculate_total(revenue_data)
+    print("Building spending and revenue hierarchies...")
+    spending_data, revenue_data, labels = build_view(model)
     
-    print(f"Spending total: ${spending_total:.2f}B")
-    print(f"Revenue total: ${revenue_total:.2f}B")
-    
-    # Create final Sankey data structure
-    sankey_data = {
-        'total': max(spending_total, revenue_total),
-        'spending': spending_total,
-        'revenue': revenue_total,
-        'spending_data': spending_data,
-        'revenue_data': revenue_data
-    }
+    print(f"Spending total: ${spending_data.total() / CENTS_PER_BILLION:.2f}B")
+    print(f"Revenue total: ${revenue_data.total() / CENTS_PER_BILLION:.2f}B")
     
     # Write to file
-    output_file = 'public/data/sankey_2024_fixed.json'
-    print(f"Writing Sankey data to {output_file}...")
-    
-    with open(output_file, 'w') as f:
-        json.dump(sankey_data, f, indent=2)
+    print(f"Writing Sankey data to {OUTPUT_FILE}...")
+    write_sankey(OUTPUT_FILE, spending_data, revenue_data, labels)
     
     print("✅ Sankey data transformation complete!")
-    print(f"   • Revenue nodes: {count_nodes(revenue_data)}")
-    print(f"   • Spending nodes: {count_nodes(spending_data)}")
+    print(f"   • Revenue nodes: {revenue_data.count()}")
+    print(f"   • Spending nodes: {spending_data.count()}")
     print(f"   • All nodes now have unique hierarchical names")
 
-def count_nodes(node):
-    """Count total nodes in tree."""
-    count = 1
-    if 'children' in node:
-        for child in node['children']:
-            count += count_nodes(child)
-    return count
-
 if __name__ == '__main__':
     main() 
\ No newline at end of file
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Run the Python data pipelines that produce the Sankey JSON, skipping work
+that is already done.
+
+Each jurisdiction is a list of stages in dependency order (Ontario:
+clean → sankeys, which writes the full, strategic and compact views).
+The "site" pipeline writes the flat twin (sankey.flat.json) and the LOD
+root and detail file (sankey.lod.json, sankey.shards/) of every
+data/**/sankey.json the site serves, so it runs last. A
+stage's key is a hash of its input files, its code and its parameters;
+when the key matches the last successful run and the recorded outputs
+are still in place, the stage is skipped. When a stage does run, outputs
+whose bytes come out unchanged are put back untouched, so file times only
+move when content does.
+
+    python scripts/run_pipelines.py               # every jurisdiction
+    python scripts/run_pipelines.py ontario       # one jurisdiction
+    python scripts/run_pipelines.py --force       # ignore recorded keys
+    python scripts/run_pipelines.py --dry-run     # list stages that would run
+
+Stages run with their own working directory, as the scripts expect, and
+with SOURCE_DATE_EPOCH set to the newest input's mtime so timestamps
+written into outputs (Toronto's generatedAt) do not change on reruns.
+File hashes are cached by size and mtime in .pipeline_state.json at the
+repository root.
+"""
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+REPO = Path(__file__).resolve().parent.parent
+STATE_PATH = REPO / ".pipeline_state.json"
+
+ONTARIO = REPO / "data/provincial/ontario/2023/JESSE_DATA_PRUNING_SCRIPTS/Ontario"
+ONTARIO_SCRIPTS = ONTARIO / "scripts"
+ONTARIO_CLEAN = ONTARIO_SCRIPTS / "clean_public_accounts_2024.py"
+ONTARIO_CLEANED = ("clean_expenses_2024.csv", "clean_revenue_2024.csv")
+ONTARIO_COLUMNAR = ("clean_expenses_2024.parquet", "clean_revenue_2024.parquet")
+ONTARIO_VIEWS = ("sankey_2024_fixed", "sankey_2024_strategic", "sankey_2024_compact")
+# Modules create_sankeys.py imports: one per view plus the shared ones
+ONTARIO_VIEW_CODE = tuple(ONTARIO_SCRIPTS / name for name in (
+    "transform_sankey_data.py", "create_strategic_sankey.py", "create_compact_sankey.py",
+    "spending_model.py", "sankey_tree.py", "sankey_flat.py", "sankey_lod.py", "clean_public_accounts_2024.py"))
+# Files written per view: nested, flat, and the LOD root with its detail file
+ONTARIO_VIEW_FILES = (".json", ".flat.json", ".lod.json", ".shards/*.json")
+TORONTO_SCRIPT = REPO / "data/municipal/ontario/toronto/2024/scripts/convert_toronto_sankey.py"
+# Nested Sankey files the site reads, relative to REPO
+SITE_SANKEYS = tuple(str(path.relative_to(REPO)) for path in sorted(REPO.glob("data/**/sankey.json")))
+
+
+@dataclass(frozen=True)
+class Stage:
+    """One script run. Paths in inputs/outputs are relative to cwd; outputs may be globs."""
+    name: str
+    cwd: Path
+    script: Path
+    inputs: tuple[str, ...]
+    outputs: tuple[str, ...]
+    optional_inputs: tuple[str, ...] = ()  # hashed when present, e.g. the Parquet twins
+    code: tuple[Path, ...] = ()  # local modules the script imports
+    args: tuple[str, ...] = ()
+
+
+PIPELINES: dict[str, list[Stage]] = {
+    "ontario": [
+        Stage("clean", ONTARIO, ONTARIO_CLEAN,
+              inputs=("PublicAccountsPDFs/2024/tbs-public-accounts-annual-report-revenue-by-source-2023-24-en-fr.csv",
+                      "PublicAccountsPDFs/2024/f4801adb-b00a-4798-9802-005231e275ee (1).json"),
+              outputs=(*ONTARIO_CLEANED, *ONTARIO_COLUMNAR,
+                       "clean_expenses/year=*/data.*", "clean_revenue/year=*/data.*")),
+        # All three views from one load of the cleaned tables
+        Stage("sankeys", ONTARIO, ONTARIO_SCRIPTS / "create_sankeys.py",
+              inputs=ONTARIO_CLEANED, optional_inputs=ONTARIO_COLUMNAR,
+              outputs=tuple(f"public/data/{view}{ext}" for view in ONTARIO_VIEWS for ext in ONTARIO_VIEW_FILES),
+              code=ONTARIO_VIEW_CODE),
+    ],
+    "toronto": [
+        Stage("convert", REPO, TORONTO_SCRIPT,
+              inputs=("2024_sankeymatic.txt", "City_of_Toronto_2024_Actuals - Cleaned.xlsx"),
+              outputs=("data/municipal/ontario/toronto/sankey.json",
+                       "data/municipal/ontario/toronto/summary.json")),
+    ],
+    "site": [
+        Stage("flat", REPO, ONTARIO_SCRIPTS / "sankey_flat.py",
+              inputs=SITE_SANKEYS,
+              outputs=tuple(name[:-len(".json")] + ".flat.json" for name in SITE_SANKEYS),
+              code=(ONTARIO_SCRIPTS / "sankey_tree.py",), args=SITE_SANKEYS),
+        Stage("lod", REPO, ONTARIO_SCRIPTS / "sankey_lod.py",
+              inputs=SITE_SANKEYS,
+              outputs=tuple(name[:-len(".json")] + ext for name in SITE_SANKEYS
+                            for ext in (".lod.json", ".shards/*.json")),
+              args=SITE_SANKEYS),
+    ],
+}
+
+
+class FileHashes:
+    """SHA-256 of files, reused while a file's size and mtime are unchanged."""
+
+    def __init__(self, cache: dict):
+        self.cache = cache
+
+    def __call__(self, path: Path) -> str | None:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        key = str(path)
+        cached = self.cache.get(key)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            return cached[2]
+        digest = hashlib.sha256()
+        with path.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.cache[key] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+
+def stage_key(stage: Stage, file_hash: FileHashes) -> str:
+    """Hash of everything a stage's outputs depend on."""
+    parts = {
+        "script": file_hash(stage.script),
+        "code": [file_hash(path) for path in stage.code],
+        "inputs": {name: file_hash(stage.cwd / name) for name in stage.inputs + stage.optional_inputs},
+        "args": list(stage.args),
+        "python": sys.version,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def expand_outputs(stage: Stage) -> list[Path]:
+    paths = []
+    for pattern in stage.outputs:
+        if any(ch in pattern for ch in "*?["):
+            paths.extend(path for path in sorted(stage.cwd.glob(pattern)) if path.suffix != ".prev")
+        elif (stage.cwd / pattern).exists():
+            paths.append(stage.cwd / pattern)
+    return paths
+
+
+def run_stage(stage: Stage, file_hash: FileHashes) -> dict[str, str]:
+    """Runs one stage, keeping outputs whose bytes did not change. Returns output hashes."""
+    # Move current outputs aside; they are restored if the new bytes match
+    previous = {}
+    for path in expand_outputs(stage):
+        backup = path.with_name(path.name + ".prev")
+        os.replace(path, backup)
+        previous[path] = (backup, file_hash(backup))
+    for pattern in stage.outputs:
+        (stage.cwd / pattern).parent.mkdir(parents=True, exist_ok=True)
+
+    inputs = [stage.cwd / name for name in stage.inputs]
+    env = dict(os.environ, SOURCE_DATE_EPOCH=str(int(max(p.stat().st_mtime for p in inputs))))
+    result = subprocess.run([sys.executable, str(stage.script), *stage.args], cwd=stage.cwd, env=env)
+    if result.returncode != 0:
+        for path, (backup, _) in previous.items():
+            os.replace(backup, path)
+        raise RuntimeError(f"{stage.name} failed with exit status {result.returncode}")
+
+    outputs, unchanged = {}, 0
+    for path in expand_outputs(stage):
+        digest = file_hash(path)
+        backup, old_digest = previous.pop(path, (None, None))
+        if backup is not None:
+            file_hash.cache.pop(str(backup), None)
+            if digest == old_digest:
+                os.replace(backup, path)
+                unchanged += 1
+            else:
+                backup.unlink()
+        outputs[str(path.relative_to(stage.cwd))] = file_hash(path)
+    for backup, _ in previous.values():  # outputs the stage no longer produces
+        file_hash.cache.pop(str(backup), None)
+        backup.unlink()
+    print(f"  {len(outputs) - unchanged} outputs changed, {unchanged} unchanged")
+    return outputs
+
+
+def up_to_date(record: dict | None, key: str, stage: Stage, file_hash: FileHashes) -> bool:
+    if not record or record.get("key") != key:
+        return False
+    return all(file_hash(stage.cwd / name) == digest for name, digest in record["outputs"].items())
+
+
+def load_state() -> dict:
+    try:
+        with STATE_PATH.open(encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_state(state: dict) -> None:
+    tmp = STATE_PATH.with_name(STATE_PATH.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, STATE_PATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Sankey data pipelines, skipping unchanged stages.")
+    parser.add_argument("jurisdictions", nargs="*", metavar="jurisdiction",
+                        help=f"Pipelines to run (default: all of {', '.join(PIPELINES)})")
+    parser.add_argument("--force", action="store_true", help="Run every stage regardless of recorded keys")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which stages would run")
+    args = parser.parse_args()
+    unknown = [name for name in args.jurisdictions if name not in PIPELINES]
+    if unknown:
+        parser.error(f"unknown jurisdiction {unknown[0]!r} (choose from {', '.join(PIPELINES)})")
+
+    started = time.perf_counter()
+    state = load_state()
+    file_hash = FileHashes(state.setdefault("files", {}))
+    stages_state = state.setdefault("stages", {})
+    ran = skipped = blocked = 0
+    try:
+        for jurisdiction in args.jurisdictions or PIPELINES:
+            for stage in PIPELINES[jurisdiction]:
+                label = f"{jurisdiction}/{stage.name}"
+                missing = [name for name in stage.inputs if not (stage.cwd / name).exists()]
+                if missing:
+                    print(f"{label}: missing input {missing[0]}, skipped")
+                    blocked += 1
+                    continue
+                key = stage_key(stage, file_hash)
+                if not args.force and up_to_date(stages_state.get(label), key, stage, file_hash):
+                    skipped += 1
+                    continue
+                if args.dry_run:
+                    print(f"{label}: would run")
+                    continue
+                print(f"{label}: running {stage.script.name}")
+                outputs = run_stage(stage, file_hash)
+                stages_state[label] = {"key": key, "outputs": outputs}
+                ran += 1
+    finally:
+        if not args.dry_run:
+            save_state(state)
+    print(f"{ran} stages run, {skipped} up to date, {blocked} missing inputs "
+          f"({time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -67,7 +67,7 @@ export default async function ProvinceIndex({
   const { jurisdiction: slug, lang } = await params;
   initLingui(lang);
 
-  const { jurisdiction, sankey } = getJurisdictionData(slug);
+  const { jurisdiction, sankey, sankeyDetailUrl } = getJurisdictionData(slug);
 
   const departments = getExpandedDepartments(jurisdiction.slug);
 
@@ -327,6 +327,7 @@ export default async function ProvinceIndex({
         <div className="sankey-chart-container relative overflow-hidden sm:(mr-0 ml-0) md:(min-h-[776px] min-w-[1280px] w-screen -ml-[50vw] -mr-[50vw] left-1/2 right-1/2)">
           <JurisdictionSankey
             data={sankey}
+            detailUrl={sankeyDetailUrl}
             jurisdictionSlug={jurisdiction.slug}
           />
           <div className="absolute bottom-3 left-6">
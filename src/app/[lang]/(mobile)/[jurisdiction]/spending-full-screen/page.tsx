@@ -14,13 +14,14 @@ export default async function FullPageSpending({
   params: Promise<{ jurisdiction: string }>;
 }) {
   const { jurisdiction: slug } = await params;
-  const { jurisdiction, sankey } = getJurisdictionData(slug);
+  const { jurisdiction, sankey, sankeyDetailUrl } = getJurisdictionData(slug);
 
   return (
     <div className="min-h-screen bg-white">
       <div className="sankey-chart-container relative overflow-hidden min-h-screen min-w-[1280px]">
         <JurisdictionSankey
           data={sankey}
+          detailUrl={sankeyDetailUrl}
           jurisdictionSlug={jurisdiction.slug}
         />
         <div className="absolute bottom-3 left-6">
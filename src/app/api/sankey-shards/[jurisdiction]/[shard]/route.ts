@@ -0,0 +1,27 @@
+import { NextResponse } from "next/server";
+import { readSankeyShard } from "@/lib/jurisdictions";
+
+// Named by a hash of their content, so a URL never changes meaning
+const CACHE_CONTROL = "public, max-age=31536000, immutable";
+
+export async function GET(
+  _request: Request,
+  { params }: { params: Promise<{ jurisdiction: string; shard: string }> },
+) {
+  const { jurisdiction, shard } = await params;
+  const data = readSankeyShard(jurisdiction, shard.replace(/\.json$/, ""));
+
+  if (data === null) {
+    return NextResponse.json(
+      { message: "Sankey detail not found" },
+      { status: 404 },
+    );
+  }
+
+  return new NextResponse(data, {
+    headers: {
+      "Content-Type": "application/json",
+      "Cache-Control": CACHE_CONTROL,
+    },
+  });
+}
@@ -1,13 +1,48 @@
 "use client";
+import { useEffect, useState } from "react";
 import { SankeyChart } from "./SankeyChart";
 import { SankeyData } from "./SankeyChartD3";
+import { graftSankeyShards, SankeyShards } from "@/lib/sankeyShards";
 
 export function JurisdictionSankey({
   data,
+  detailUrl,
   // jurisdictionSlug,
 }: {
   data: SankeyData;
+  // Set when data holds only the top levels; the rest is one file at this URL
+  detailUrl?: string;
   // jurisdictionSlug?: string;
 }) {
-  return <SankeyChart data={data} />;
+  const [sankey, setSankey] = useState(data);
+
+  useEffect(() => {
+    setSankey(data);
+    if (!detailUrl) {
+      return;
+    }
+    // Render the top levels first, then swap in the whole tree
+    let cancelled = false;
+    fetch(detailUrl)
+      .then((response) => {
+        if (!response.ok) {
+          throw new Error(`Failed to load Sankey detail ${detailUrl}`);
+        }
+        return response.json() as Promise<SankeyShards>;
+      })
+      .then((shards) => {
+        if (!cancelled) {
+          setSankey(graftSankeyShards(data, shards));
+        }
+      })
+      .catch((error) => {
+        // Keep showing the top levels
+        console.error(error);
+      });
+    return () => {
+      cancelled = true;
+    };
+  }, [data, detailUrl]);
+
+  return <SankeyChart data={sankey} />;
 }
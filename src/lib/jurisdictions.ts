@@ -2,6 +2,8 @@ import { SankeyData } from "@/components/Sankey/SankeyChartD3";
 import fs from "fs";
 import path from "path";
 import { provinceNames } from "./provinceNames";
+import { expandFlatSankey, isFlatSankey } from "./sankeyFlat";
+import { isSankeyLod, sankeyLodRoot, SHARD_KEY_PATTERN } from "./sankeyShards";
 
 const dataDir = path.join(process.cwd(), "data");
 
@@ -168,6 +170,9 @@ export type Department = {
 type Data = {
   jurisdiction: Jurisdiction;
   sankey: SankeyData;
+  // Set when sankey holds only the top levels (from sankey.lod.json): the
+  // URL of the one file with every subtree cut from it
+  sankeyDetailUrl?: string;
 };
 
 /**
@@ -292,6 +297,25 @@ export function getJurisdictionSlugs(): string[] {
   return slugs;
 }
 
+function readSankeyLod(lodSankeyPath: string): {
+  sankey: SankeyData;
+  detail?: string;
+} {
+  const lod = JSON.parse(fs.readFileSync(lodSankeyPath, "utf8"));
+  if (!isSankeyLod(lod)) {
+    throw new Error(`Unsupported LOD Sankey file: ${lodSankeyPath}`);
+  }
+  return { sankey: sankeyLodRoot(lod), detail: lod.shards };
+}
+
+function readFlatSankey(flatSankeyPath: string): SankeyData {
+  const flat = JSON.parse(fs.readFileSync(flatSankeyPath, "utf8"));
+  if (!isFlatSankey(flat)) {
+    throw new Error(`Unsupported flat Sankey file: ${flatSankeyPath}`);
+  }
+  return expandFlatSankey(flat);
+}
+
 /**
  * Get jurisdiction data, supporting both provincial and municipal paths.
  * @param jurisdiction - Slug in format "province" (provincial), "province/municipality" (municipal), or just "municipality" (will search)
@@ -307,22 +331,37 @@ export function getJurisdictionData(jurisdiction: string): Data {
 
   const summaryPath = path.join(jurisdictionPath, "summary.json");
   const sankeyPath = path.join(jurisdictionPath, "sankey.json");
+  // Smaller, faster to parse columnar copy of sankey.json, when generated
+  const flatSankeyPath = path.join(jurisdictionPath, "sankey.flat.json");
+  const hasFlatSankey = fs.existsSync(flatSankeyPath);
+  // Top levels only, with the rest in one file loaded by the client
+  const lodSankeyPath = path.join(jurisdictionPath, "sankey.lod.json");
+  const hasLodSankey = fs.existsSync(lodSankeyPath);
 
   if (!fs.existsSync(summaryPath)) {
     throw new Error(`Jurisdiction data not found: ${jurisdiction}`);
   }
 
-  if (!fs.existsSync(sankeyPath)) {
+  if (!hasLodSankey && !hasFlatSankey && !fs.existsSync(sankeyPath)) {
     throw new Error(`Sankey data not found for jurisdiction: ${jurisdiction}`);
   }
 
   try {
     const jurisdictionData = JSON.parse(fs.readFileSync(summaryPath, "utf8"));
-    const sankeyData = JSON.parse(fs.readFileSync(sankeyPath, "utf8"));
+    const slug = parts[parts.length - 1];
+    const lod = hasLodSankey ? readSankeyLod(lodSankeyPath) : null;
+    const sankeyData = lod
+      ? lod.sankey
+      : hasFlatSankey
+        ? readFlatSankey(flatSankeyPath)
+        : JSON.parse(fs.readFileSync(sankeyPath, "utf8"));
 
     return {
-      jurisdiction: { slug: parts[parts.length - 1], ...jurisdictionData },
+      jurisdiction: { slug, ...jurisdictionData },
       sankey: sankeyData,
+      ...(lod?.detail && {
+        sankeyDetailUrl: `/api/sankey-shards/${slug}/${lod.detail}.json`,
+      }),
     };
   } catch (error) {
     throw new Error(
@@ -331,6 +370,27 @@ export function getJurisdictionData(jurisdiction: string): Data {
   }
 }
 
+/**
+ * Read the Sankey detail file (sankey.shards/<key>.json) of a jurisdiction.
+ * Returns the file's text, or null if the key is malformed or unknown.
+ * @param jurisdiction - Slug in format "province" (provincial), "province/municipality" (municipal), or just "municipality" (will search)
+ * @param key - Detail file key, as under "shards" in sankey.lod.json
+ */
+export function readSankeyShard(
+  jurisdiction: string,
+  key: string,
+): string | null {
+  if (!SHARD_KEY_PATTERN.test(key)) {
+    return null;
+  }
+  const jurisdictionPath = findJurisdictionDataPath(jurisdiction);
+  if (!jurisdictionPath) {
+    return null;
+  }
+  const shardPath = path.join(jurisdictionPath, "sankey.shards", `${key}.json`);
+  return fs.existsSync(shardPath) ? fs.readFileSync(shardPath, "utf8") : null;
+}
+
 /**
  * Get department data for a specific jurisdiction and department.
  * @param jurisdiction - Slug in format "province" (provincial), "province/municipality" (municipal), or just "municipality" (will search)
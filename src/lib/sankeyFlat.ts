@@ -0,0 +1,89 @@
+import { SankeyData } from "@/components/Sankey/SankeyChartD3";
+
+/**
+ * Reader for the columnar ("flat") Sankey files written next to sankey.json
+ * as sankey.flat.json. Each tree is stored as parallel arrays in preorder
+ * over a shared string table, so repeated "A → B → C" name prefixes are
+ * stored once. The Python writer and the format description live in
+ * data/provincial/ontario/2023/JESSE_DATA_PRUNING_SCRIPTS/Ontario/scripts/sankey_flat.py.
+ */
+
+const SEPARATOR = " → ";
+
+type FlatTree = {
+  label: number[];
+  parent: number[];
+  depth: number[];
+  name_parent: number[];
+  amount: (number | null)[];
+  empty?: number[];
+};
+
+export type FlatSankey = {
+  format: "sankey-flat";
+  version: 1;
+  labels: string[];
+  [key: string]: unknown;
+};
+
+type NestedNode = {
+  name: string;
+  children?: NestedNode[];
+  amount?: number;
+};
+
+export function isFlatSankey(data: unknown): data is FlatSankey {
+  return (
+    typeof data === "object" &&
+    data !== null &&
+    (data as FlatSankey).format === "sankey-flat" &&
+    (data as FlatSankey).version === 1
+  );
+}
+
+function expandTree(tree: FlatTree, labels: string[]): NestedNode {
+  const nodes: NestedNode[] = [];
+  const names: string[] = [];
+  const internal = new Set<number>([...tree.parent, ...(tree.empty ?? [])]);
+
+  for (let i = 0; i < tree.label.length; i++) {
+    const namedAfter = tree.name_parent[i];
+    const name =
+      namedAfter < 0
+        ? labels[tree.label[i]]
+        : names[namedAfter] + SEPARATOR + labels[tree.label[i]];
+    // Same key order as the nested files: name, children, amount
+    const node: NestedNode = { name };
+    if (internal.has(i)) {
+      node.children = [];
+    }
+    const amount = tree.amount[i];
+    if (amount !== null) {
+      node.amount = amount;
+    }
+    names.push(name);
+    nodes.push(node);
+    if (tree.parent[i] >= 0) {
+      nodes[tree.parent[i]].children!.push(node);
+    }
+  }
+  return nodes[0];
+}
+
+/**
+ * Rebuild the nested sankey.json document from its flat form.
+ */
+export function expandFlatSankey(flat: FlatSankey): SankeyData {
+  const { labels } = flat;
+  const nested: Record<string, unknown> = {};
+  for (const [key, value] of Object.entries(flat)) {
+    if (key === "format" || key === "version" || key === "labels") {
+      continue;
+    }
+    nested[key] =
+      typeof value === "object" && value !== null
+        ? expandTree(value as FlatTree, labels)
+        : value;
+  }
+  return nested as unknown as SankeyData;
+}
@@ -0,0 +1,94 @@
+import { SankeyData } from "@/components/Sankey/SankeyChartD3";
+
+/**
+ * Reader for the level-of-detail ("LOD") Sankey files written next to
+ * sankey.json: sankey.lod.json holds the top levels of each tree, and
+ * sankey.shards/<key>.json, named by a hash of its content, holds every
+ * subtree left out of it. A left-out subtree is a stub,
+ * { name, amount, shard }, whose amount is the subtree's total, so the
+ * root renders on its own; the root names its detail file under "shards".
+ * The Python writer and the format description live in
+ * data/provincial/ontario/2023/JESSE_DATA_PRUNING_SCRIPTS/Ontario/scripts/sankey_lod.py.
+ */
+
+export const SHARD_KEY_PATTERN = /^[0-9a-f]{16}$/;
+
+type LodNode = {
+  name: string;
+  children?: LodNode[];
+  amount?: number;
+  shard?: string;
+};
+
+export type SankeyLod = {
+  format: "sankey-lod";
+  version: 2;
+  levels: number;
+  shards?: string;
+  [key: string]: unknown;
+};
+
+// Subtrees cut from the root, by stub key
+export type SankeyShards = Record<string, LodNode>;
+
+export function isSankeyLod(data: unknown): data is SankeyLod {
+  return (
+    typeof data === "object" &&
+    data !== null &&
+    (data as SankeyLod).format === "sankey-lod" &&
+    (data as SankeyLod).version === 2
+  );
+}
+
+/**
+ * The top of the Sankey document, ready to render: stubs show as leaves
+ * carrying their subtree totals.
+ */
+export function sankeyLodRoot(lod: SankeyLod): SankeyData {
+  const document: Record<string, unknown> = {};
+  for (const [key, value] of Object.entries(lod)) {
+    if (
+      key !== "format" &&
+      key !== "version" &&
+      key !== "levels" &&
+      key !== "shards"
+    ) {
+      document[key] = value;
+    }
+  }
+  return document as unknown as SankeyData;
+}
+
+function graft(node: LodNode, shards: SankeyShards): LodNode {
+  if (node.shard !== undefined) {
+    const full = shards[node.shard];
+    if (!full) {
+      throw new Error(`Sankey shard ${node.shard} is missing`);
+    }
+    return full;
+  }
+  if (!node.children) {
+    return node;
+  }
+  return {
+    ...node,
+    children: node.children.map((child) => graft(child, shards)),
+  };
+}
+
+/**
+ * The whole sankey.json document: the top from sankeyLodRoot with every
+ * stub replaced by its subtree from the detail file.
+ */
+export function graftSankeyShards(
+  top: SankeyData,
+  shards: SankeyShards,
+): SankeyData {
+  const document: Record<string, unknown> = { ...top };
+  for (const [key, value] of Object.entries(document)) {
+    if (typeof value === "object" && value !== null) {
+      document[key] = graft(value as LodNode, shards);
+    }
+  }
+  return document as unknown as SankeyData;
+}